@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+#
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Compares the throughput of the examples/testapp application running with
+the asyncio and the uvloop event loops, set by app.loop. The hello world
+handler writes a string, the template handler is the testapp index page,
+rendering templates and ui modules with a file session.
+
+The testapp runs with file sessions and without its redis and mysql data
+sources, served by a single process. Requests are sent by wrk if installed,
+keeping the connections alive, or by a Tornado client in a separate process,
+opening a connection per request. On machines with few cores the client
+competes with the application for the cpu, use wrk from another machine for
+meaningful numbers.
+
+Run from the project root:
+
+    PYTHONPATH=. python benchmarks/event_loop.py
+"""
+
+import os
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+EXAMPLES_PATH = os.path.join(PROJECT_ROOT, "examples")
+REQUESTS = 5000
+CONCURRENCY = 32
+DURATION = 10
+
+CONF = """app:
+  component: testapp
+  pythonpath: %(pythonpath)s
+  loop: %(loop)s
+  settings:
+    cookie_secret: "event-loop-benchmark"
+  watchdog:
+    enabled: false
+components:
+  - id: testapp
+    class: testapp.app.TestappComponent
+    enabled: true
+  - id: internal
+    class: testapp.components.internal.component.TestappInternalComponent
+    enabled: true
+  - id: hello
+    class: hello.HelloComponent
+    enabled: true
+log:
+  level: WARNING
+session:
+  enabled: true
+  type: file
+  path: %(directory)s
+"""
+
+APP = """import asyncio
+import firenado.tornadoweb
+
+
+class HelloHandler(firenado.tornadoweb.TornadoHandler):
+
+    session_enabled = False
+
+    def get(self):
+        loop = asyncio.get_running_loop()
+        self.set_header("X-Event-Loop", type(loop).__module__)
+        self.write("Hello world!!!")
+
+
+class HelloComponent(firenado.tornadoweb.TornadoComponent):
+
+    def get_handlers(self):
+        return [(r"/hello", HelloHandler)]
+"""
+
+LAUNCH = """from firenado.launcher import TornadoLauncher
+launcher = TornadoLauncher(dir=%r, port=%s)
+launcher.load()
+launcher.launch()
+"""
+
+CLIENT = """import sys
+import time
+from tornado.httpclient import AsyncHTTPClient
+from tornado.ioloop import IOLoop
+import tornado.gen
+
+url, cookie, requests, concurrency = sys.argv[1:]
+requests, concurrency = int(requests), int(concurrency)
+
+
+async def worker(client, count):
+    for _ in range(count):
+        await client.fetch(url, headers={'Cookie': cookie})
+
+
+async def main():
+    client = AsyncHTTPClient(max_clients=concurrency)
+    # Warm up
+    await worker(client, 100)
+    start = time.perf_counter()
+    await tornado.gen.multi([worker(client, requests // concurrency)
+                             for _ in range(concurrency)])
+    print(requests / (time.perf_counter() - start))
+
+IOLoop.current().run_sync(main)
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("Application didn't start at port %s." % port)
+
+
+def event_loop(port):
+    """ Returns the module of the event loop running the application. """
+    from urllib.request import urlopen
+    with urlopen("http://127.0.0.1:%s/hello" % port) as response:
+        return response.headers['X-Event-Loop']
+
+
+def session_cookie(port):
+    """ Returns the session cookie set by the index page, so the template
+    requests read the same session instead of creating one per request.
+    """
+    from urllib.request import urlopen
+    with urlopen("http://127.0.0.1:%s/" % port) as response:
+        return response.headers['Set-Cookie'].split(";")[0]
+
+
+def throughput(url, cookie):
+    wrk = shutil.which("wrk")
+    if wrk is not None:
+        output = subprocess.check_output(
+            [wrk, "-t2", "-c%s" % CONCURRENCY, "-d%ss" % DURATION,
+             "-H", "Cookie: %s" % cookie, url], text=True)
+        return float(re.search(r"Requests/sec:\s+([\d.]+)", output).group(1))
+    output = subprocess.check_output(
+        [sys.executable, "-c", CLIENT, url, cookie, str(REQUESTS),
+         str(CONCURRENCY)], text=True)
+    return float(output)
+
+
+def run(loop):
+    with tempfile.TemporaryDirectory() as directory:
+        os.mkdir(os.path.join(directory, "conf"))
+        with open(os.path.join(directory, "conf", "firenado.yml"), "w") as f:
+            f.write(CONF % {'directory': directory, 'loop': loop,
+                            'pythonpath': EXAMPLES_PATH})
+        with open(os.path.join(directory, "hello.py"), "w") as f:
+            f.write(APP)
+        port = free_port()
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+            [PROJECT_ROOT, directory]))
+        process = subprocess.Popen([sys.executable, "-c",
+                                    LAUNCH % (directory, port)], env=env,
+                                   stderr=subprocess.DEVNULL,
+                                   start_new_session=True)
+        try:
+            wait_port(port)
+            running_loop = event_loop(port)
+            if not running_loop.startswith(loop):
+                raise RuntimeError("Expected the %s loop, the application "
+                                   "is running %s." % (loop, running_loop))
+            cookie = session_cookie(port)
+            results = {}
+            for name, path in (("hello world", "/hello"), ("template", "/")):
+                results[name] = throughput(
+                    "http://127.0.0.1:%s%s" % (port, path), cookie)
+        finally:
+            os.killpg(process.pid, signal.SIGTERM)
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+    return results
+
+
+def main():
+    try:
+        import uvloop  # noqa: F401
+    except ImportError:
+        print("Install uvloop to run this benchmark.")
+        sys.exit(1)
+    print("examples/testapp, 1 process, %s concurrent connections, %s" % (
+        CONCURRENCY, "wrk" if shutil.which("wrk") else
+        "%s requests from a tornado client" % REQUESTS))
+    results = {}
+    for loop in ("asyncio", "uvloop"):
+        results[loop] = run(loop)
+    for name in ("hello world", "template"):
+        asyncio_result = results['asyncio'][name]
+        uvloop_result = results['uvloop'][name]
+        print("  %-11s: asyncio %.0f req/s, uvloop %.0f req/s (%.2fx)" % (
+            name, asyncio_result, uvloop_result,
+            uvloop_result / asyncio_result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+#
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Measures TemplateHandler.render_string rendering a page with 50 ui
+modules, each one rendering its own template through the handler. The
+legacy handler builds the template namespace and variables on every
+render_string call, like TemplateHandler did before building them once per
+request.
+
+Run from the project root:
+
+    PYTHONPATH=. python benchmarks/render_string.py
+"""
+
+from firenado.security import Secured
+from firenado.tornadoweb import TornadoComponent, TornadoHandler
+import os
+import tempfile
+import timeit
+from tornado.httputil import HTTPServerRequest
+import tornado.web
+
+MODULES = 50
+REQUESTS = 2000
+
+
+class FakeConnection:
+
+    def set_close_callback(self, callback):
+        pass
+
+
+class Item(tornado.web.UIModule):
+
+    def render(self, index):
+        return self.render_string("item.html", index=index)
+
+
+class BenchmarkComponent(TornadoComponent):
+
+    template_path = None
+
+    def get_template_path(self):
+        return self.template_path
+
+
+class PageHandler(TornadoHandler, Secured):
+    pass
+
+
+class LegacyPageHandler(PageHandler):
+
+    def get_template_namespace(self):
+        return tornado.web.RequestHandler.get_template_namespace(self)
+
+    def render_string(self, template_name, **kwargs):
+        kwargs['user_agent'] = self.user_agent if hasattr(
+            self, 'user_agent') else None
+        kwargs['credential'] = self.credential if hasattr(
+            self, 'credential') else None
+        for name, variable in self.template_variables.items():
+            kwargs[name] = variable
+        return tornado.web.RequestHandler.render_string(
+            self, template_name, **kwargs)
+
+
+def request_time(application, component, handler_class):
+    def render():
+        request = HTTPServerRequest(uri="/", connection=FakeConnection())
+        handler = handler_class(application, request, component=component)
+        handler.add_variable_to_template("title", "Benchmark")
+        handler.render_string("page.html")
+    render()
+    return timeit.timeit(render, number=REQUESTS) / REQUESTS
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "page.html"), "w") as f:
+            f.write("<h1>{{ title }}</h1>{%% for i in range(%s) %%}"
+                    "{%% module Item(i) %%}{%% end %%}" % MODULES)
+        with open(os.path.join(directory, "item.html"), "w") as f:
+            f.write("<p>{{ title }} {{ index }}</p>")
+        application = tornado.web.Application(ui_modules={'Item': Item})
+        component = BenchmarkComponent("benchmark", application)
+        component.template_path = directory
+        legacy_time = request_time(application, component, LegacyPageHandler)
+        current_time = request_time(application, component, PageHandler)
+    print("Page with %s ui modules, per request:" % MODULES)
+    print("  legacy:  %8.1f us" % (legacy_time * 1000000))
+    print("  current: %8.1f us" % (current_time * 1000000))
+    print("  speedup: %8.2fx" % (legacy_time / current_time))
+
+
+if __name__ == "__main__":
+    main()
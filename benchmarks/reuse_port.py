@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+#
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Shows how requests are distributed between forked workers when they share
+the sockets bound by the parent and when each worker binds its own sockets
+with SO_REUSEPORT. Each request opens a new connection and is answered with
+the pid of the worker handling it.
+
+Run from the project root:
+
+    PYTHONPATH=. python benchmarks/reuse_port.py
+"""
+
+from collections import Counter
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from tornado.httpclient import AsyncHTTPClient
+from tornado.ioloop import IOLoop
+import tornado.gen
+
+WORKERS = 4
+REQUESTS = 4000
+CONCURRENCY = 64
+
+CONF = """app:
+  component: pidapp
+  pythonpath: %(directory)s
+  process:
+    num_processes: %(workers)s
+    reuse_port: %(reuse_port)s
+  watchdog:
+    enabled: false
+components:
+  - id: pidapp
+    class: pidapp.PidComponent
+    enabled: true
+log:
+  level: WARNING
+"""
+
+APP = """import firenado.tornadoweb
+import os
+
+
+class PidHandler(firenado.tornadoweb.TornadoHandler):
+
+    session_enabled = False
+
+    def get(self):
+        self.write(str(os.getpid()))
+
+    def log_exception(self, *args):
+        pass
+
+
+class PidComponent(firenado.tornadoweb.TornadoComponent):
+
+    def get_handlers(self):
+        return [(r"/", PidHandler)]
+"""
+
+LAUNCH = """from firenado.launcher import TornadoLauncher
+launcher = TornadoLauncher(dir=%r, port=%s)
+launcher.load()
+launcher.launch()
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("Application didn't start at port %s." % port)
+
+
+async def fetch_pids(port):
+    client = AsyncHTTPClient(force_instance=True, max_clients=CONCURRENCY)
+    url = "http://127.0.0.1:%s/" % port
+    pids = Counter()
+    for _ in range(REQUESTS // CONCURRENCY):
+        responses = await tornado.gen.multi([
+            client.fetch(url, headers={'Connection': "close"})
+            for _ in range(CONCURRENCY)])
+        pids.update(response.body.decode() for response in responses)
+    client.close()
+    return pids
+
+
+def run(reuse_port):
+    with tempfile.TemporaryDirectory() as directory:
+        os.mkdir(os.path.join(directory, "conf"))
+        with open(os.path.join(directory, "conf", "firenado.yml"), "w") as f:
+            f.write(CONF % {'directory': directory, 'workers': WORKERS,
+                            'reuse_port': str(reuse_port).lower()})
+        with open(os.path.join(directory, "pidapp.py"), "w") as f:
+            f.write(APP)
+        port = free_port()
+        # The workers are in the launcher session to be terminated with it
+        process = subprocess.Popen([sys.executable, "-c",
+                                    LAUNCH % (directory, port)],
+                                   stderr=subprocess.DEVNULL,
+                                   start_new_session=True)
+        try:
+            wait_port(port)
+            # Let every worker start listening
+            time.sleep(1)
+            start = time.perf_counter()
+            pids = IOLoop.current().run_sync(lambda: fetch_pids(port))
+            elapsed = time.perf_counter() - start
+        finally:
+            os.killpg(process.pid, signal.SIGTERM)
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+    return pids, elapsed
+
+
+def main():
+    print("%s workers, %s requests, %s concurrent, new connection per "
+          "request" % (WORKERS, REQUESTS, CONCURRENCY))
+    for reuse_port in (False, True):
+        pids, elapsed = run(reuse_port)
+        counts = sorted(pids.values(), reverse=True)
+        counts += [0] * (WORKERS - len(counts))
+        print("  reuse_port %-5s: per worker %s, stdev %.1f, max/min %s, "
+              "%.0f req/s" % (reuse_port, counts, statistics.pstdev(counts),
+                              "%.2f" % (counts[0] / counts[-1]) if counts[-1]
+                              else "inf", REQUESTS / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+#
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Compares the dispatch time of Tornado's router and the prefix trie router
+by route count. Routes are spread across components like a firenado
+application does, and requests are sent to the first, middle and last
+routes.
+
+Run from the project root:
+
+    PYTHONPATH=. python benchmarks/route_dispatch.py
+"""
+
+from firenado.routing import install_router
+from tornado.httputil import HTTPServerRequest
+import tornado.web
+import timeit
+
+ROUTE_COUNTS = (10, 100, 600, 1000)
+ROUTES_PER_COMPONENT = 10
+DISPATCHES = 2000
+
+
+class BenchmarkHandler(tornado.web.RequestHandler):
+    pass
+
+
+def build_routes(count):
+    routes = []
+    for i in range(count):
+        component = i // ROUTES_PER_COMPONENT
+        routes.append((r"/component%s/resource%s/(\d+)" % (component, i),
+                       BenchmarkHandler))
+    return routes
+
+
+def dispatch_time(application, paths):
+    requests = [HTTPServerRequest(uri=path) for path in paths]
+
+    def dispatch():
+        for request in requests:
+            application.find_handler(request)
+    return timeit.timeit(dispatch, number=DISPATCHES) / (
+        DISPATCHES * len(requests))
+
+
+def main():
+    print("%8s %14s %14s %9s" % ("routes", "tornado (us)", "trie (us)",
+                                 "speedup"))
+    for count in ROUTE_COUNTS:
+        routes = build_routes(count)
+        paths = []
+        for i in (0, count // 2, count - 1):
+            paths.append("/component%s/resource%s/1" % (
+                i // ROUTES_PER_COMPONENT, i))
+        tornado_application = tornado.web.Application(routes)
+        trie_application = tornado.web.Application(routes)
+        install_router(trie_application, "trie")
+        tornado_time = dispatch_time(tornado_application, paths)
+        trie_time = dispatch_time(trie_application, paths)
+        print("%8s %14.2f %14.2f %8.1fx" % (
+            count, tornado_time * 1000000, trie_time * 1000000,
+            tornado_time / trie_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+#
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Compares the CPU used by an idle scheduler with 10k jobs, none of them
+due during the measure, between the heap scheduler and the previous one
+polling the jobs every interval and keeping a periodic callback per job.
+Half of the jobs are interval based and half are cron based.
+
+Run from the project root:
+
+    PYTHONPATH=. python benchmarks/schedule_idle.py
+"""
+
+from firenado.schedule import ScheduledJob, Scheduler
+import time
+from tornado.ioloop import IOLoop, PeriodicCallback
+
+JOBS = 10000
+IDLE_SECONDS = 5
+POLLING_INTERVAL = 1000
+
+
+class FakeComponent:
+
+    application = None
+
+
+class HeapScheduler(Scheduler):
+
+    def load_jobs(self):
+        pass
+
+
+class PollingScheduler(HeapScheduler):
+    """ The scheduler managing the jobs with a periodic callback, as it was
+    before the heap.
+    """
+
+    def run(self):
+        self.load_jobs()
+        self._periodic_callback = PeriodicCallback(self._manage_jobs,
+                                                   self._interval)
+        self._periodic_callback.start()
+
+    def stop(self):
+        self._periodic_callback.stop()
+        for job in self.jobs:
+            if job._periodic_callback is not None:
+                job._periodic_callback.stop()
+
+    def _manage_jobs(self):
+        self._periodic_callback.stop()
+        for job in self.jobs:
+            if not job.already_scheduled:
+                if job.must_schedule:
+                    job.schedule()
+        self._periodic_callback.start()
+
+
+class PollingJob(ScheduledJob):
+    """ The job scheduled with its own periodic callback. """
+
+    def __init__(self, scheduler, **kwargs):
+        super().__init__(scheduler, **kwargs)
+        self._periodic_callback = None
+
+    @property
+    def already_scheduled(self):
+        return self._periodic_callback is not None
+
+    def schedule(self):
+        self._periodic_callback = PeriodicCallback(self._run_job,
+                                                   self.next_interval)
+        self._periodic_callback.start()
+
+
+def add_jobs(scheduler, job_class):
+    for index in range(JOBS):
+        if index % 2:
+            job = job_class(scheduler, id="job%s" % index,
+                            interval=3600000 + index)
+        else:
+            job = job_class(scheduler, id="job%s" % index,
+                            cron="%s 3 1 1 *" % (index % 60))
+        scheduler.add_job(job)
+
+
+async def measure(scheduler_class, job_class):
+    scheduler = scheduler_class(FakeComponent(), interval=POLLING_INTERVAL)
+    add_jobs(scheduler, job_class)
+    start = time.process_time()
+    scheduler.run()
+    # The polling scheduler only schedules the jobs at the first interval
+    await IOLoop.current().run_in_executor(
+        None, time.sleep, POLLING_INTERVAL / 1000 * 1.5)
+    scheduled = time.process_time() - start
+    start = time.process_time()
+    await IOLoop.current().run_in_executor(None, time.sleep, IDLE_SECONDS)
+    idle = time.process_time() - start
+    scheduler.stop()
+    return scheduled, idle
+
+
+def main():
+    print("%s jobs, idle for %ss, polling interval of %sms." % (
+        JOBS, IDLE_SECONDS, POLLING_INTERVAL))
+    for name, scheduler_class, job_class in (
+            ("polling", PollingScheduler, PollingJob),
+            ("heap", HeapScheduler, ScheduledJob)):
+        scheduled, idle = IOLoop.current().run_sync(
+            lambda: measure(scheduler_class, job_class))
+        print("%-8s scheduling: %8.2fms cpu, idle: %8.2fms cpu "
+              "(%.3f%% of a core)" % (name, scheduled * 1000, idle * 1000,
+                                      idle / IDLE_SECONDS * 100))
+
+
+if __name__ == "__main__":
+    main()
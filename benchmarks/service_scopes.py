@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+#
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Compares request and application scoped services. Each iteration creates
+a new consumer, like Tornado does creating a handler per request, and calls a
+method decorated with with_service.
+
+Run from the project root:
+
+    PYTHONPATH=. python benchmarks/service_scopes.py
+"""
+
+from firenado.data import DataConnectedMixin
+from firenado import service
+import re
+import timeit
+
+REQUESTS = 20000
+
+
+class ExpensiveService(service.FirenadoService):
+
+    configured = 0
+
+    def configure_service(self):
+        self.__class__.configured += 1
+        self.patterns = [re.compile(r"^/item/%s/(\d+)$" % i, re.IGNORECASE)
+                         for i in range(20)]
+        self.lookup = {i: str(i) for i in range(500)}
+
+
+class RequestScopedService(ExpensiveService):
+    scope = service.SCOPE_REQUEST
+
+
+class ApplicationScopedService(ExpensiveService):
+    scope = service.SCOPE_APPLICATION
+
+
+class Application(DataConnectedMixin):
+    pass
+
+
+class Handler:
+
+    request_scoped_service: RequestScopedService
+    application_scoped_service: ApplicationScopedService
+
+    def __init__(self, application):
+        self.application = application
+
+    def get_data_connected(self):
+        return self.application
+
+    @service.with_service(RequestScopedService)
+    def get_request_scoped(self):
+        return self.request_scoped_service.lookup[1]
+
+    @service.with_service(ApplicationScopedService)
+    def get_application_scoped(self):
+        return self.application_scoped_service.lookup[1]
+
+
+def run(name, method):
+    application = Application()
+
+    def request():
+        getattr(Handler(application), method)()
+
+    elapsed = timeit.timeit(request, number=REQUESTS)
+    print("%-12s %8.2f us/request" % (name, elapsed / REQUESTS * 1000000))
+
+
+if __name__ == "__main__":
+    re.purge()
+    run("request", "get_request_scoped")
+    print("%-12s %8d service instances" % ("",
+                                           RequestScopedService.configured))
+    run("application", "get_application_scoped")
+    print("%-12s %8d service instances" % (
+        "", ApplicationScopedService.configured))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+#
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Compares the application startup time and memory allocated registering
+ui modules by component count. The list approach appends firenado's
+uimodules module for every component, like TornadoApplication did, and lets
+Tornado scan it every time. The map approach resolves a deduplicated name to
+class map with build_ui_modules.
+
+Run from the project root:
+
+    PYTHONPATH=. python benchmarks/ui_modules.py
+"""
+
+from firenado import uimodules
+from firenado.tornadoweb import build_ui_modules, TornadoComponent
+import timeit
+import tornado.web
+import tracemalloc
+import types
+
+COMPONENT_COUNTS = (10, 100, 1000)
+STARTUPS = 20
+SHARED_MODULES = 5
+
+
+def create_shared_module(index):
+    module = types.ModuleType("benchmark_ui_modules_%s" % index)
+    for i in range(20):
+        name = "Module%s_%s" % (index, i)
+        setattr(module, name, type(name, (tornado.web.UIModule,), {}))
+    return module
+
+
+SHARED = [create_shared_module(i) for i in range(SHARED_MODULES)]
+
+
+class BenchmarkComponent(TornadoComponent):
+
+    def get_ui_modules(self):
+        return SHARED[hash(self.name) % SHARED_MODULES]
+
+
+def list_startup(components):
+    ui_modules = []
+    for component in components.values():
+        ui_modules.append(uimodules)
+        if component.get_ui_modules():
+            ui_modules.append(component.get_ui_modules())
+    return tornado.web.Application(ui_modules=ui_modules)
+
+
+def map_startup(components):
+    return tornado.web.Application(ui_modules=build_ui_modules(components))
+
+
+def measure(startup, components):
+    elapsed = timeit.timeit(lambda: startup(components), number=STARTUPS)
+    tracemalloc.start()
+    application = startup(components)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert "RootedPath" in application.ui_modules
+    return elapsed / STARTUPS, peak
+
+
+def main():
+    print("%10s %12s %12s %14s %14s" % ("components", "list (ms)",
+                                        "map (ms)", "list peak (KB)",
+                                        "map peak (KB)"))
+    for count in COMPONENT_COUNTS:
+        components = {"component%s" % i: BenchmarkComponent(
+            "component%s" % i, None) for i in range(count)}
+        list_time, list_peak = measure(list_startup, components)
+        map_time, map_peak = measure(map_startup, components)
+        print("%10s %12.2f %12.2f %14.1f %14.1f" % (
+            count, list_time * 1000, map_time * 1000, list_peak / 1024,
+            map_peak / 1024))
+
+
+if __name__ == "__main__":
+    main()
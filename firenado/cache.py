@@ -0,0 +1,550 @@
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import base64
+from collections import OrderedDict
+import functools
+import hashlib
+import json
+import logging
+import threading
+import time
+from tornado.web import OutputTransform
+
+logger = logging.getLogger(__name__)
+
+BACKEND_LRU = "lru"
+BACKEND_REDIS = "redis"
+
+CACHE_STATUS_HEADER = "X-Firenado-Cache"
+
+# Headers not stored with cached responses, they are set by each response
+_UNCACHED_HEADERS = frozenset(["Content-Length", "Date", "Etag", "Server",
+                               "Set-Cookie", "Transfer-Encoding",
+                               CACHE_STATUS_HEADER])
+
+# Request headers identifying the user, not copied to the requests
+# refreshing stale responses unless they are part of the cache key
+_CREDENTIAL_HEADERS = ("Authorization", "Cookie", "Proxy-Authorization")
+
+_DEFAULT_SETTINGS = {
+    'ttl': 60,
+    'stale_while_revalidate': 0,
+    'vary_headers': (),
+    'vary_query': True,
+    'vary_session': False,
+}
+
+
+class CacheEntry:
+    """ A cached value, with the response status, headers and etag when it
+    is a response.
+    """
+
+    __slots__ = ("value", "created", "ttl", "stale_ttl", "status", "headers",
+                 "etag")
+
+    def __init__(self, value, ttl, stale_ttl=0, created=None, status=None,
+                 headers=None, etag=None):
+        self.value = value
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.created = time.time() if created is None else created
+        self.status = status
+        self.headers = headers
+        self.etag = etag
+
+    @property
+    def expire(self):
+        """ Seconds the entry is kept in the backend, fresh or stale.
+        """
+        return self.ttl + self.stale_ttl
+
+    def is_fresh(self, now=None):
+        now = time.time() if now is None else now
+        return now - self.created < self.ttl
+
+    def is_usable(self, now=None):
+        now = time.time() if now is None else now
+        return now - self.created < self.expire
+
+    def dump(self):
+        value = self.value
+        is_bytes = isinstance(value, bytes)
+        if is_bytes:
+            value = base64.b64encode(value).decode("ascii")
+        return json.dumps([value, is_bytes, self.ttl, self.stale_ttl,
+                           self.created, self.status, self.headers,
+                           self.etag])
+
+    @classmethod
+    def load(cls, data):
+        (value, is_bytes, ttl, stale_ttl, created, status, headers,
+         etag) = json.loads(data)
+        if is_bytes:
+            value = base64.b64decode(value)
+        return cls(value, ttl, stale_ttl, created, status, headers, etag)
+
+
+class LruCacheBackend:
+    """ In process least recently used cache backend.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry.is_usable():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.locks.clear()
+
+    def acquire(self, key, timeout):
+        """ Acquire a lock for the key, expiring after timeout seconds.
+
+        :return bool: True if the lock was acquired
+        """
+        now = time.time()
+        with self.lock:
+            if self.locks.get(key, 0) > now:
+                return False
+            self.locks[key] = now + timeout
+            return True
+
+    def release(self, key):
+        with self.lock:
+            self.locks.pop(key, None)
+
+
+class RedisCacheBackend:
+    """ Cache backend storing entries in a redis data source, shared between
+    processes.
+    """
+
+    def __init__(self, connection, prefix="firenado:cache:"):
+        self.connection = connection
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        data = self.connection.get("%s%s" % (self.prefix, key))
+        if data is not None:
+            entry = CacheEntry.load(data)
+            if entry.is_usable():
+                self.hits += 1
+                return entry
+        self.misses += 1
+        return None
+
+    def set(self, key, entry):
+        self.connection.set("%s%s" % (self.prefix, key), entry.dump(),
+                            ex=max(int(entry.expire), 1))
+
+    def delete(self, key):
+        self.connection.delete("%s%s" % (self.prefix, key))
+
+    def acquire(self, key, timeout):
+        return bool(self.connection.set("%slock:%s" % (self.prefix, key), 1,
+                                        nx=True, ex=max(int(timeout), 1)))
+
+    def release(self, key):
+        self.connection.delete("%slock:%s" % (self.prefix, key))
+
+
+default_backend = LruCacheBackend()
+
+
+def get_backend(component):
+    """ Return the cache backend of the component, created from the
+    component cache conf on the first call. Handlers without component use
+    the default in process backend.
+
+    :param component: The handler component
+    :return: The cache backend
+    """
+    if component is None:
+        return default_backend
+    backend = getattr(component, "__cache_backend", None)
+    if backend is None:
+        conf = get_component_settings(component)
+        backend_type = conf.get("backend", BACKEND_LRU)
+        if backend_type == BACKEND_LRU:
+            backend = LruCacheBackend(conf.get("max_size", 1024))
+        elif backend_type == BACKEND_REDIS:
+            data_source = component.application.get_data_source(
+                conf['data_source'])
+            backend = RedisCacheBackend(
+                data_source.get_connection(),
+                conf.get("prefix", "firenado:cache:%s:" % component.name))
+        else:
+            raise ValueError("Invalid cache backend %s, expected %s or %s." %
+                             (backend_type, BACKEND_LRU, BACKEND_REDIS))
+        setattr(component, "__cache_backend", backend)
+    return backend
+
+
+def get_component_settings(component):
+    if component is None or not isinstance(component.conf, dict):
+        return {}
+    return component.conf.get("cache") or {}
+
+
+def resolve_settings(component, settings):
+    """ Merge the cache defaults, the component cache conf and the settings
+    informed to the decorator, in this order.
+    """
+    resolved = dict(_DEFAULT_SETTINGS)
+    component_settings = get_component_settings(component)
+    for key in _DEFAULT_SETTINGS:
+        if key in component_settings:
+            resolved[key] = component_settings[key]
+    resolved.update(settings)
+    return resolved
+
+
+def response_cache_key(handler, settings):
+    """ Build the response cache key from the request host and path, and,
+    as set, the query, the vary headers and the session id.
+
+    :param handler: The request handler
+    :param dict settings: The resolved cache settings
+    :return str: The cache key
+    """
+    request = handler.request
+    parts = [request.method, request.host, request.path]
+    if settings['vary_query']:
+        parts.append(request.query)
+    for header in settings['vary_headers']:
+        parts.append(request.headers.get(header, ""))
+    if settings['vary_session']:
+        from .session import SessionHandler
+        parts.append(SessionHandler.get_session_id_cookie(handler) or "")
+    key = hashlib.sha1("\n".join(parts).encode()).hexdigest()
+    return "response:%s" % key
+
+
+@functools.lru_cache(maxsize=None)
+def _tornado_authenticated_code():
+    # Every method decorated by tornado.web.authenticated runs this code
+    import tornado.web
+    return tornado.web.authenticated(lambda handler: None).__code__
+
+
+def requires_authentication(handler, method):
+    """ Returns if the handler authenticates the requests of the method,
+    through an authenticate method or the method being decorated by
+    firenado.security.authenticated or tornado.web.authenticated.
+
+    :param handler: The request handler
+    :param method: The handler method
+    :return bool: True if the method requires authentication
+    """
+    if callable(getattr(handler, "authenticate", None)):
+        return True
+    while method is not None:
+        if getattr(method, "_firenado_authenticated", False):
+            return True
+        if getattr(method, "__code__", None) is _tornado_authenticated_code():
+            return True
+        method = getattr(method, "__wrapped__", None)
+    return False
+
+
+class RefreshConnection:
+    """ Connection of the requests refreshing a stale response in process,
+    discarding the response written by the handler.
+
+    :param context: The context of the connection of the stale request
+    """
+
+    def __init__(self, context=None):
+        from tornado.concurrent import Future
+        self.context = context
+        self.finished = Future()
+
+    def _written(self):
+        from tornado.concurrent import Future
+        future = Future()
+        future.set_result(None)
+        return future
+
+    def set_close_callback(self, callback):
+        pass
+
+    def write_headers(self, start_line, headers, chunk=None):
+        return self._written()
+
+    def write(self, chunk):
+        return self._written()
+
+    def finish(self):
+        if not self.finished.done():
+            self.finished.set_result(None)
+
+
+def is_refresh(request):
+    """ Returns if the request is refreshing a stale response in process.
+    Refresh requests aren't counted as requests served by the application.
+
+    :param request: The request
+    :return bool: True if the request is refreshing a stale response
+    """
+    return isinstance(request.connection, RefreshConnection)
+
+
+class ResponseCacheTransform(OutputTransform):
+    """ Output transform storing the responses of the requests marked by
+    serve_cached_response, once they are finished with status 200. It is
+    the first application transform, so it receives the response as written
+    by the handler, before it is compressed.
+
+    :param request: The request
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.chunks = None
+        self.headers = None
+        self.etag = None
+
+    def transform_first_chunk(self, status_code, headers, chunk, finishing):
+        if (getattr(self.request, "response_cache", None) is not None and
+                status_code == 200):
+            self.chunks = [chunk]
+            self.headers = [[name, value] for name, value in
+                            headers.get_all()
+                            if name not in _UNCACHED_HEADERS]
+            self.etag = headers.get("Etag")
+            if finishing:
+                self.store()
+        return status_code, headers, chunk
+
+    def transform_chunk(self, chunk, finishing):
+        if self.chunks is not None:
+            self.chunks.append(chunk)
+            if finishing:
+                self.store()
+        return chunk
+
+    def store(self):
+        backend, key, settings = self.request.response_cache
+        self.request.response_cache = None
+        backend.set(key, CacheEntry(b"".join(self.chunks), settings['ttl'],
+                                    settings['stale_while_revalidate'],
+                                    status=200, headers=self.headers,
+                                    etag=self.etag))
+        self.chunks = None
+
+
+def cached(ttl=None, **kwargs):
+    """ Decorate a GET or HEAD handler method to have its responses cached.
+    The settings informed override the handler component cache conf.
+
+    :param int ttl: Seconds the response is fresh
+    :key int stale_while_revalidate: Seconds a response is still served after
+    expired while it is refreshed in background. Default 0.
+    :key list vary_headers: Request headers added to the cache key
+    :key bool vary_query: If the query is added to the cache key. Default
+    True.
+    :key bool vary_session: If the session id is added to the cache key.
+    Default False.
+    """
+    settings = dict(kwargs)
+    if ttl is not None:
+        settings['ttl'] = ttl
+
+    def f_wrapper(method):
+        method._firenado_cache = settings
+        return method
+    return f_wrapper
+
+
+def serve(method):
+    """ Decorate the handler prepare method serving the cached response of
+    the requested handler method, if any, before running it.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if not serve_cached_response(self):
+            result = method(self, *args, **kwargs)
+            if result is not None:
+                await result
+    return wrapper
+
+
+def serve_cached_response(handler):
+    """ Finish the request with the cached response if the handler method
+    is cached. On a miss the request is marked to have its response stored
+    by the ResponseCacheTransform when finished.
+
+    :param handler: The request handler
+    :return bool: True if the request was finished with a cached response
+    """
+    request = handler.request
+    if request.method not in ("GET", "HEAD"):
+        return False
+    method = getattr(handler, request.method.lower(), None)
+    settings = getattr(method, "_firenado_cache", None)
+    if settings is None:
+        return False
+    component = getattr(handler, "component", None)
+    settings = resolve_settings(component, settings)
+    if requires_authentication(handler, method):
+        # Cached responses are served before the authentication, so only
+        # the session the response was cached for can be served with it
+        from .session import SessionHandler
+        if (not settings['vary_session'] or
+                not SessionHandler.get_session_id_cookie(handler)):
+            return False
+    backend = get_backend(component)
+    key = response_cache_key(handler, settings)
+    if is_refresh(request):
+        request.response_cache = (backend, key, settings)
+        return False
+    entry = backend.get(key)
+    if entry is None:
+        handler.set_header(CACHE_STATUS_HEADER, "MISS")
+        request.response_cache = (backend, key, settings)
+        return False
+    handler.response_cache_hit = True
+    if entry.is_fresh():
+        handler.set_header(CACHE_STATUS_HEADER, "HIT")
+    else:
+        handler.set_header(CACHE_STATUS_HEADER, "STALE")
+        if backend.acquire(key, entry.stale_ttl or 1):
+            from tornado.ioloop import IOLoop
+            IOLoop.current().spawn_callback(refresh_response, handler,
+                                            backend, key, settings)
+    handler.set_status(entry.status)
+    replaced = set()
+    for name, value in entry.headers:
+        if name not in replaced:
+            handler.clear_header(name)
+            replaced.add(name)
+        handler.add_header(name, value)
+    if entry.etag is not None:
+        handler.set_header("Etag", entry.etag)
+    if entry.etag is not None and handler.check_etag_header():
+        handler.set_status(304)
+        handler.finish()
+        return True
+    handler.finish(entry.value)
+    return True
+
+
+async def refresh_response(handler, backend, key, settings):
+    """ Run the handler of the stale request again in this process, with a
+    copy of the request, bypassing the cache so the new response is stored.
+
+    The cookies and authorization headers of the stale request are removed
+    from the copy, unless they are part of the cache key, so the response of
+    a shared key isn't personalized for the user who got the stale response.
+    """
+    from tornado.httputil import HTTPHeaders, HTTPServerRequest
+    request = handler.request
+    connection = RefreshConnection(getattr(request.connection, "context",
+                                           None))
+    headers = HTTPHeaders(request.headers)
+    vary_headers = {header.lower() for header in settings['vary_headers']}
+    if settings['vary_session']:
+        vary_headers.add("cookie")
+    for header in _CREDENTIAL_HEADERS:
+        if header.lower() not in vary_headers and header in headers:
+            del headers[header]
+    refresh = HTTPServerRequest(method=request.method, uri=request.uri,
+                                version=request.version, headers=headers,
+                                host=request.host, connection=connection)
+    try:
+        handler.application.find_handler(refresh).execute()
+        await connection.finished
+    except Exception:
+        logger.exception("Failed to refresh the cached response of %s.",
+                         request.uri)
+    finally:
+        backend.release(key)
+
+
+def fragment(ttl=None, **kwargs):
+    """ Decorate an ui module render method to have its output cached,
+    keyed by the module class and the render arguments.
+
+    :param int ttl: Seconds the fragment is cached
+    :key list vary_headers: Request headers added to the cache key
+    :key bool vary_session: If the session id is added to the cache key.
+    Default False.
+    """
+    settings = dict(kwargs)
+    if ttl is not None:
+        settings['ttl'] = ttl
+
+    def f_wrapper(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            component = getattr(self.handler, "component", None)
+            resolved = resolve_settings(component, settings)
+            backend = get_backend(component)
+            key = fragment_cache_key(self, resolved, args, kwargs)
+            entry = backend.get(key)
+            if entry is not None:
+                return entry.value
+            value = method(self, *args, **kwargs)
+            if isinstance(value, bytes):
+                value = value.decode()
+            backend.set(key, CacheEntry(value, resolved['ttl']))
+            return value
+        return wrapper
+    return f_wrapper
+
+
+def fragment_cache_key(module, settings, args, kwargs):
+    parts = ["%s.%s" % (module.__class__.__module__,
+                        module.__class__.__qualname__),
+             repr(args), repr(sorted(kwargs.items()))]
+    request = module.request
+    for header in settings['vary_headers']:
+        parts.append(request.headers.get(header, ""))
+    if settings['vary_session']:
+        from .session import SessionHandler
+        parts.append(SessionHandler.get_session_id_cookie(module.handler) or
+                     "")
+    key = hashlib.sha1("\n".join(parts).encode()).hexdigest()
+    return "fragment:%s" % key
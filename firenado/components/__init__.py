@@ -15,5 +15,6 @@
 # limitations under the License.
 
 from .firenado.component import FirenadoComponent
+from .metrics.component import MetricsComponent
 from .static_maps.component import StaticMapsComponent
 from .toolbox.component import ToolboxComponent
@@ -0,0 +1,66 @@
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import firenado.conf
+import firenado.tornadoweb
+from firenado.components.metrics.handlers import MetricsHandler
+from firenado.metrics import MetricsRegistry
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsComponent(firenado.tornadoweb.TornadoComponent):
+    """ Exposes the application metrics in the Prometheus text format.
+
+    The component is configured by the metrics.yml file at the app config
+    directory, with the path the metrics are served and the MetricsRegistry
+    parameters:
+
+    path: /firenado/metrics
+    directory: /var/run/myapp/metrics
+    flush_interval: 5
+    """
+
+    def __init__(self, name, application):
+        super().__init__(name, application)
+        self.registry = None
+
+    def get_config_filename(self):
+        return "metrics"
+
+    def get_handlers(self):
+        return [
+            (self.conf.get('path', r'/firenado/metrics'), MetricsHandler),
+        ]
+
+    def initialize(self):
+        kwargs = dict(self.conf)
+        kwargs.pop('path', None)
+        directory = kwargs.get('directory')
+        if directory is not None and not os.path.isabs(directory):
+            kwargs['directory'] = os.path.join(firenado.conf.APP_ROOT_PATH,
+                                               directory)
+        self.registry = MetricsRegistry(self.application, **kwargs)
+        # Workers create the application after being forked, only the
+        # metrics dumped by previous runs are removed
+        self.registry.clear()
+        self.application.metrics = self.registry
+        logger.debug("Metrics enabled with the dump directory %s.",
+                     self.registry.directory)
+
+    def shutdown(self):
+        if self.registry is not None:
+            self.registry.stop()
@@ -0,0 +1,26 @@
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import firenado.tornadoweb
+from firenado.metrics import CONTENT_TYPE
+
+
+class MetricsHandler(firenado.tornadoweb.TornadoHandler):
+    """ Serves the application metrics aggregated from every worker. """
+
+    session_enabled = False
+
+    def get(self):
+        self.set_header("Content-Type", CONTENT_TYPE)
+        self.write(self.component.registry.render())
@@ -14,11 +14,28 @@
 
 from cartola.pagination import Paginator
 import tornado.web
+from urllib.parse import urlencode
 
 
 class Paginate(tornado.web.UIModule):
 
     def render(self, count, **kwargs):
+        """ Render the pagination of a listing with count items.
+
+        The count can be an int or a callable returning the count, like a
+        function calling firenado.sqlalchemy.fast_count with cache or
+        estimate_threshold, so the count can be served without a table scan
+        on every page view.
+
+        If a firenado.sqlalchemy.KeysetPage is informed instead of the count,
+        the pagination will be rendered with cursor links. The cursor is sent
+        in the argument, "cursor" by default, keeping the other arguments of
+        the request query.
+        """
+        if hasattr(count, "next_cursor"):
+            return self.render_keyset(count, **kwargs)
+        if callable(count):
+            count = count()
         name = kwargs.get("name", "paginator")
         template = kwargs.get("template", "toolbox:uimodules/pagination.html")
         parameters = {}
@@ -46,3 +63,30 @@ class Paginate(tornado.web.UIModule):
         setattr(self.handler, name, paginator)
         return self.render_string(template, argument=argument,
                                   paginator=paginator)
+
+    def render_keyset(self, page, **kwargs):
+        template = kwargs.get(
+            "template", "toolbox:uimodules/keyset_pagination.html")
+        argument = kwargs.get("argument", "cursor")
+        return self.render_string(
+            template, argument=argument, page=page,
+            first_url=self.cursor_url(argument),
+            previous_url=self.cursor_url(argument, page.previous_cursor),
+            next_url=self.cursor_url(argument, page.next_cursor))
+
+    def cursor_url(self, argument, cursor=None):
+        """ Return the request path with the query arguments of the request,
+        replacing the cursor argument by the cursor informed.
+
+        :param str argument: The cursor argument
+        :param str cursor: The cursor. If None the cursor argument is removed.
+        :return str: The url
+        """
+        arguments = [(name, value)
+                     for name, values in self.request.query_arguments.items()
+                     if name != argument for value in values]
+        if cursor is not None:
+            arguments.append((argument, cursor))
+        if not arguments:
+            return self.request.path
+        return "%s?%s" % (self.request.path, urlencode(arguments))
@@ -124,6 +124,9 @@ session['file'] = {}
 session['file']['path'] = ""
 session['handlers'] = {}
 session['id_generators'] = {}
+# If True handlers get a session proxy reading the session from the backend
+# only when it is accessed for the first time
+session['lazy'] = False
 # Default session life time is 30 minutes or 1800 seconds
 # If set to 0 the session will not expire
 session['life_time'] = 1800
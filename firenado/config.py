@@ -35,10 +35,24 @@ def get_app_defaults():
     app['id'] = None
     app['pythonpath'] = None
     app['port'] = 8888
+    # Router dispatching requests, tornado or trie. None means tornado
+    app['router'] = None
     app['process'] = {
         'num_processes': None,
-        'max_restarts': 100
+        'max_restarts': 100,
+        # Forked workers bind their own sockets with SO_REUSEPORT
+        'reuse_port': False,
+        # Worker recycling, used by the supervisor launcher
+        'max_recycling': 1,
+        'max_requests': None,
+        'max_requests_jitter': 0,
+        'max_rss': None,
+        'ping_interval': 5,
+        'ping_timeout': 30,
     }
+    # Event loop run by the launcher, asyncio or uvloop. None keeps the
+    # current event loop policy
+    app['loop'] = None
     app['login'] = {}
     app['login']['urls'] = {}
     app['login']['urls']['default'] = "/login"
@@ -50,6 +64,18 @@ def get_app_defaults():
     app['socket'] = None
     app['static_path'] = None
     app['static_url_prefix'] = "/static"
+    app['templates'] = {
+        'cache_path': None,
+        'cache_size': 1000,
+        'extensions': [".html"],
+        'precompile': False,
+    }
+    # Request timing per handler lifecycle phase
+    app['timing'] = {
+        'enabled': False,
+        'log': True,
+        'server_timing': True,
+    }
     app['type'] = "tornado"
     app['types'] = {}
     app['types']['tornado'] = {}
@@ -57,10 +83,23 @@ def get_app_defaults():
     app['types']['tornado']['launcher'] = {}
     app['types']['tornado']['launcher']['class'] = "TornadoLauncher"
     app['types']['tornado']['launcher']['module'] = "firenado.launcher"
+    app['types']['tornado_supervisor'] = {}
+    app['types']['tornado_supervisor']['name'] = "tornado_supervisor"
+    app['types']['tornado_supervisor']['launcher'] = {}
+    app['types']['tornado_supervisor']['launcher']['class'] = (
+        "SupervisorLauncher")
+    app['types']['tornado_supervisor']['launcher']['module'] = (
+        "firenado.launcher")
     app['url_root_path'] = None
     app['xheaders'] = None
     # Wait before shutdown is on seconds
     app['wait_before_shutdown'] = 0
+    # IOLoop lag and blocking callbacks watchdog, times in milliseconds
+    app['watchdog'] = {
+        'enabled': False,
+        'interval': 100,
+        'threshold': 500,
+    }
     return app
 
 
@@ -244,6 +283,8 @@ def process_app_config_section(config, app_config):
             config.app['data']['sources'] = app_config['data']['sources']
     if 'id' in app_config:
         config.app['id'] = app_config['id']
+    if 'loop' in app_config:
+        config.app['loop'] = app_config['loop']
     if 'login' in app_config:
         if 'urls' in app_config['login']:
             if app_config['login']['urls']:
@@ -254,9 +295,13 @@ def process_app_config_section(config, app_config):
     if 'port' in app_config:
         config.app['port'] = app_config['port']
     if 'process' in app_config:
-        if 'num_processes' in app_config['process']:
-            config.app['process']['num_processes'] = app_config[
-                'process']['num_processes']
+        for key in ['max_recycling', 'max_requests', 'max_requests_jitter',
+                    'max_restarts', 'max_rss', 'num_processes',
+                    'ping_interval', 'ping_timeout', 'reuse_port']:
+            if key in app_config['process']:
+                config.app['process'][key] = app_config['process'][key]
+    if 'router' in app_config:
+        config.app['router'] = app_config['router']
     if 'url_root_path' in app_config:
         root_url = app_config['url_root_path'].strip()
         if root_url[0] == "/":
@@ -272,6 +317,14 @@ def process_app_config_section(config, app_config):
         config.app['static_path'] = app_config['static_path']
     if 'static_url_prefix' in app_config:
         config.app['static_url_prefix'] = app_config['static_url_prefix']
+    if 'templates' in app_config:
+        for key in ['cache_path', 'cache_size', 'extensions', 'precompile']:
+            if key in app_config['templates']:
+                config.app['templates'][key] = app_config['templates'][key]
+    if 'timing' in app_config:
+        for key in ['buckets', 'enabled', 'log', 'server_timing']:
+            if key in app_config['timing']:
+                config.app['timing'][key] = app_config['timing'][key]
     if 'type' in app_config:
         config.app['type'] = app_config['type']
     if 'types' in app_config:
@@ -279,6 +332,10 @@ def process_app_config_section(config, app_config):
             app_type['launcher'] = get_config_from_package(
                 app_type['launcher'])
             config.app['types'][app_type['name']] = app_type
+    if 'watchdog' in app_config:
+        for key in ['enabled', 'interval', 'threshold']:
+            if key in app_config['watchdog']:
+                config.app['watchdog'][key] = app_config['watchdog'][key]
     if 'xheaders' in app_config:
         config.app['xheaders'] = app_config['xheaders']
     if 'wait_before_shutdown' in app_config:
@@ -416,6 +473,8 @@ def process_session_config_section(config, session_config):
             del config.session['id_generators'][generator['name']]['name']
     if 'name' in session_config:
         config.session['name'] = session_config['name']
+    if 'lazy' in session_config:
+        config.session['lazy'] = session_config['lazy']
     if 'life_time' in session_config:
         config.session['life_time'] = session_config['life_time']
     if 'callback_hiccup' in session_config:
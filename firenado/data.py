@@ -73,12 +73,40 @@ class Connector(object):
 
     def __init__(self, data_connected):
         self.__data_connected = data_connected
+        self.instrumentation = None
+
+    def configure_instrumentation(self, name, conf):
+        """ Create the data source query instrumentation if it is enabled in
+        the data source instrumentation configuration.
+
+        :param str name: The data source name
+        :param dict conf: The data source configuration
+        :return: The query instrumentation or None if not enabled
+        """
+        instrumentation_conf = conf.get("instrumentation")
+        if not instrumentation_conf or not instrumentation_conf.get(
+                "enabled", False):
+            return None
+        from .instrumentation import QueryInstrumentation
+        logger.debug("Enabling the instrumentation of the data source %s.",
+                     name)
+        self.instrumentation = QueryInstrumentation(name,
+                                                    **instrumentation_conf)
+        return self.instrumentation
 
     def get_connection(self):
         """ Returns the configured and connected database connection.
         """
         return None
 
+    def get_pool_usage(self):
+        """ Returns the connections of the data source pool in use and idle,
+        or None if the connector has no pool.
+
+        :return dict: The in_use and idle connections
+        """
+        return None
+
     def process_config(self, conf):
         """ Parse the configuration data provided by the firenado.conf engine.
         """
@@ -107,8 +135,12 @@ class RedisConnector(Connector):
         redis_conf = dict()
         redis_conf.update(conf)
         redis_conf.pop("connector")
+        redis_conf.pop("instrumentation", None)
         # TODO Handle connection error
         self.__connection = redis.Redis(**redis_conf)
+        if self.configure_instrumentation(name, conf) is not None:
+            from .instrumentation import instrument_redis_client
+            instrument_redis_client(self.__connection, self.instrumentation)
         try:
             self.__connection.ping()
         except redis.ConnectionError as error:
@@ -118,6 +150,16 @@ class RedisConnector(Connector):
     def get_connection(self):
         return self.__connection
 
+    def get_pool_usage(self):
+        if self.__connection is None:
+            return None
+        pool = self.__connection.connection_pool
+        in_use = len(getattr(pool, "_in_use_connections", ()))
+        return {
+            'in_use': in_use,
+            'idle': getattr(pool, "_created_connections", in_use) - in_use,
+        }
+
     def process_config(self, conf):
         db_conf = {
             'connector': 'redis',
@@ -126,7 +168,9 @@ class RedisConnector(Connector):
             'db': 0,
         }
         for key in conf:
-            if key in ['db', 'host', 'port']:
+            if key == "instrumentation":
+                db_conf[key] = conf[key]
+            elif key in ['db', 'host', 'port']:
                 if key in ['db', 'port']:
                     db_conf[key] = int(conf[key])
                 db_conf[key] = conf[key]
@@ -207,6 +251,9 @@ class SqlalchemyConnector(Connector):
                          "for %s datasource. Configuration: %s.", self.__name,
                          conf)
         self.__engine = create_engine(conf['url'], **engine_params)
+        if self.configure_instrumentation(name, conf) is not None:
+            from .instrumentation import instrument_sqlalchemy_engine
+            instrument_sqlalchemy_engine(self.__engine, self.instrumentation)
 
         @event.listens_for(self.__engine, "engine_connect")
         def ping_connection(connection, branch):
@@ -260,6 +307,17 @@ class SqlalchemyConnector(Connector):
     def get_connection(self):
         return self.__connection
 
+    def get_pool_usage(self):
+        if self.__engine is None:
+            return None
+        pool = self.__engine.pool
+        if not hasattr(pool, "checkedout"):
+            return None
+        return {
+            'in_use': pool.checkedout(),
+            'idle': pool.checkedin(),
+        }
+
     def connect_engine(self):
         from sqlalchemy.exc import OperationalError
         try:
@@ -306,8 +364,8 @@ class SqlalchemyConnector(Connector):
         for key in conf:
             # TODO Handle other properties and create the url if needed.
             if key in ["db", "database", "dialect", "driver", "future", "host",
-                       "pass", "password", "pool", "port", "session", "url",
-                       "user", "username"]:
+                       "instrumentation", "pass", "password", "pool", "port",
+                       "session", "url", "user", "username"]:
                 index = key
                 if index == "db":
                     index = "database"
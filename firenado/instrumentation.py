@@ -0,0 +1,652 @@
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from .cache import is_refresh
+from bisect import bisect_left
+from contextvars import ContextVar
+import functools
+import logging
+import re
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+QUERY_STATS_HEADER = "X-Query-Stats"
+SERVER_TIMING_HEADER = "Server-Timing"
+
+# Default histogram buckets upper bounds in milliseconds
+DEFAULT_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000,
+                   10000)
+
+# Query stats of the request being handled in the current context. Set by
+# the ComponentHandler during the prepare if the application has
+# instrumented data sources.
+current_query_stats = ContextVar("firenado_query_stats", default=None)
+
+# Timing of the request being handled in the current context. Set by the
+# ComponentHandler during the prepare if the application timing is enabled.
+current_request_timing = ContextVar("firenado_request_timing", default=None)
+
+# Modules skipped while looking for the call site of a repeated statement
+_CALL_SITE_SKIPPED_MODULES = ("contextlib", "firenado.instrumentation",
+                              "firenado.service", "firenado.sqlalchemy",
+                              "redis", "sqlalchemy")
+
+_FINGERPRINT_REPLACEMENTS = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\s+"), " "),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(?+)"),
+    (re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+"), "(?+)+"),
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(statement):
+    """ Return a normalized version of a sql statement, with literals
+    replaced by ? and parameter lists collapsed, so statements differing
+    only by values have the same fingerprint.
+
+    :param str statement: The sql statement
+    :return str: The statement fingerprint
+    """
+    for regex, replacement in _FINGERPRINT_REPLACEMENTS:
+        statement = regex.sub(replacement, statement)
+    return statement.strip()
+
+
+class Histogram:
+    """ Histogram with buckets preallocated from their upper bounds. Values
+    bigger than the last bound are counted in an extra bucket.
+    """
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class StatementStats:
+    """ Aggregated executions of statements with the same fingerprint.
+    """
+
+    __slots__ = ("fingerprint", "count", "errors", "rows", "histogram")
+
+    def __init__(self, statement_fingerprint):
+        self.fingerprint = statement_fingerprint
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.histogram = Histogram()
+
+
+class NPlusOneQueryError(Exception):
+    """ Raised when a statement is repeated more times than the n+1 threshold
+    in the same request and the instrumentation is set to raise.
+    """
+    pass
+
+
+class RepeatedStatement:
+    """ Executions of a statement fingerprint in the same request, with the
+    call site where it crossed the n+1 threshold.
+    """
+
+    __slots__ = ("data_source", "fingerprint", "threshold", "count",
+                 "call_site")
+
+    def __init__(self, data_source, statement_fingerprint, threshold):
+        self.data_source = data_source
+        self.fingerprint = statement_fingerprint
+        self.threshold = threshold
+        self.count = 0
+        self.call_site = None
+
+    @property
+    def exceeded(self):
+        return self.count > self.threshold
+
+
+class RequestQueryStats:
+    """ Queries executed while handling a request.
+    """
+
+    __slots__ = ("handler", "queries", "time_ns", "response_header",
+                 "repeated")
+
+    def __init__(self, handler, response_header=False):
+        self.handler = handler
+        self.queries = 0
+        self.time_ns = 0
+        self.response_header = response_header
+        self.repeated = {}
+
+    @property
+    def time_ms(self):
+        return self.time_ns / 1000000
+
+    def header_value(self):
+        return "%s queries, %.2f ms" % (self.queries, self.time_ms)
+
+
+def call_site():
+    """ Return the first frame outside firenado data and service modules and
+    the data source libraries, as file:line in function.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        if not frame.f_globals.get("__name__", "").startswith(
+                _CALL_SITE_SKIPPED_MODULES):
+            return "%s:%s in %s" % (frame.f_code.co_filename, frame.f_lineno,
+                                    frame.f_code.co_name)
+        frame = frame.f_back
+    return "unknown call site"
+
+
+def handler_description(handler):
+    """ Describe a handler by its request and class to be used in logs.
+    """
+    return "%s %s (%s.%s)" % (handler.request.method, handler.request.path,
+                              handler.__class__.__module__,
+                              handler.__class__.__name__)
+
+
+def start_request_query_stats(handler, instrumentations):
+    """ Set the query stats of the request being handled by the handler in
+    the current context.
+
+    :param handler: The request handler
+    :param list instrumentations: The application query instrumentations
+    :return RequestQueryStats: The request query stats
+    """
+    stats = RequestQueryStats(
+        handler_description(handler),
+        any(instrumentation.response_header for instrumentation in
+            instrumentations))
+    current_query_stats.set(stats)
+    return stats
+
+
+def finish_request_query_stats(stats):
+    """ Log the statements repeated more times than the n+1 threshold of
+    their data sources and clear the query stats from the current context.
+
+    :param RequestQueryStats stats: The request query stats
+    """
+    for repeated in stats.repeated.values():
+        if repeated.exceeded:
+            logger.warning("Possible n+1 query on data source %s at %s: "
+                           "statement executed %s times (threshold %s) from "
+                           "%s: %s", repeated.data_source, stats.handler,
+                           repeated.count, repeated.threshold,
+                           repeated.call_site, repeated.fingerprint)
+    if current_query_stats.get() is stats:
+        current_query_stats.set(None)
+
+
+class QueryInstrumentation:
+    """ Collects statistics of statements or commands executed by a data
+    source, grouped by fingerprint. Statements taking more than
+    slow_query_threshold milliseconds are logged with the handler that
+    executed them.
+
+    With n_plus_one_threshold set, statements with the same fingerprint
+    executed more times than the threshold in the same request are reported
+    at the end of the request with the handler and call site. If
+    n_plus_one_raise is True a NPlusOneQueryError is raised instead, making
+    tests fail at the offending statement.
+    """
+
+    def __init__(self, name, **kwargs):
+        self.name = name
+        self.slow_query_threshold = kwargs.get("slow_query_threshold")
+        self.response_header = kwargs.get("response_header", False)
+        # Limits the number of fingerprints kept, protecting the memory from
+        # statements generated with inlined values.
+        self.max_statements = kwargs.get("max_statements", 1000)
+        self.n_plus_one_threshold = kwargs.get("n_plus_one_threshold")
+        self.n_plus_one_raise = kwargs.get("n_plus_one_raise", False)
+        self.statements = {}
+
+    def record(self, statement, elapsed_ns, rows=None, error=False,
+               statement_fingerprint=None):
+        """ Record a statement execution.
+
+        :param str statement: The executed statement
+        :param int elapsed_ns: The execution time in nanoseconds
+        :param int rows: Rows returned or affected by the statement
+        :param bool error: If the execution failed
+        :param str statement_fingerprint: The statement fingerprint. Default
+        is the fingerprint computed from the statement.
+        """
+        if statement_fingerprint is None:
+            statement_fingerprint = fingerprint(statement)
+        stats = self.statements.get(statement_fingerprint)
+        if stats is None:
+            if len(self.statements) >= self.max_statements:
+                statement_fingerprint = "<other>"
+                stats = self.statements.get(statement_fingerprint)
+            if stats is None:
+                stats = StatementStats(statement_fingerprint)
+                self.statements[statement_fingerprint] = stats
+        elapsed_ms = elapsed_ns / 1000000
+        stats.count += 1
+        stats.histogram.observe(elapsed_ms)
+        if error:
+            stats.errors += 1
+        if rows is not None and rows > 0:
+            stats.rows += rows
+        request_stats = current_query_stats.get()
+        if request_stats is not None:
+            request_stats.queries += 1
+            request_stats.time_ns += elapsed_ns
+            if self.n_plus_one_threshold is not None and not error:
+                self.track_repeated(request_stats, statement_fingerprint)
+        if (self.slow_query_threshold is not None and
+                elapsed_ms >= self.slow_query_threshold):
+            logger.warning("Slow query on data source %s took %.2fms at %s: "
+                           "%s", self.name, elapsed_ms,
+                           "no request" if request_stats is None else
+                           request_stats.handler, statement)
+
+    def track_repeated(self, request_stats, statement_fingerprint):
+        """ Count the statement execution in the request, capturing the call
+        site when the n+1 threshold is crossed.
+
+        :param RequestQueryStats request_stats: The request query stats
+        :param str statement_fingerprint: The statement fingerprint
+        """
+        key = (self.name, statement_fingerprint)
+        repeated = request_stats.repeated.get(key)
+        if repeated is None:
+            repeated = RepeatedStatement(self.name, statement_fingerprint,
+                                         self.n_plus_one_threshold)
+            request_stats.repeated[key] = repeated
+        repeated.count += 1
+        if repeated.count == repeated.threshold + 1:
+            repeated.call_site = call_site()
+            if self.n_plus_one_raise:
+                raise NPlusOneQueryError(
+                    "Statement executed more than %s times on data source "
+                    "%s at %s from %s: %s" % (
+                        repeated.threshold, self.name, request_stats.handler,
+                        repeated.call_site, statement_fingerprint))
+
+    def reset(self):
+        self.statements = {}
+
+
+def instrument_sqlalchemy_engine(engine, instrumentation):
+    """ Listen to the engine cursor executions recording them into the
+    instrumentation.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        if context is not None:
+            context._firenado_start_ns = time.perf_counter_ns()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context,
+                             executemany):
+        start_ns = getattr(context, "_firenado_start_ns", None)
+        if start_ns is not None:
+            instrumentation.record(statement,
+                                   time.perf_counter_ns() - start_ns,
+                                   cursor.rowcount)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        if isinstance(exception_context.original_exception,
+                      NPlusOneQueryError):
+            return
+        context = exception_context.execution_context
+        start_ns = getattr(context, "_firenado_start_ns", None)
+        if start_ns is not None:
+            instrumentation.record(exception_context.statement,
+                                   time.perf_counter_ns() - start_ns,
+                                   error=True)
+
+
+def instrument_redis_client(client, instrumentation):
+    """ Wrap the redis client execute_command method recording commands into
+    the instrumentation. Commands are fingerprinted by their names.
+    """
+    execute_command = client.execute_command
+
+    @functools.wraps(execute_command)
+    def instrumented_execute_command(*args, **options):
+        start_ns = time.perf_counter_ns()
+        error = False
+        try:
+            return execute_command(*args, **options)
+        except Exception:
+            error = True
+            raise
+        finally:
+            command = str(args[0]).upper()
+            instrumentation.record(command,
+                                   time.perf_counter_ns() - start_ns,
+                                   error=error,
+                                   statement_fingerprint=command)
+
+    client.execute_command = instrumented_execute_command
+    return client
+
+
+class TimingSpan:
+    """ Context manager adding the time spent in its block to a request
+    timing span.
+    """
+
+    __slots__ = ("timing", "name", "start_ns")
+
+    def __init__(self, timing, name):
+        self.timing = timing
+        self.name = name
+        self.start_ns = None
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.timing.add(self.name, time.perf_counter_ns() - self.start_ns)
+        return False
+
+
+class NullTimingSpan:
+    """ Context manager used as span when there is no request timing.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_TIMING_SPAN = NullTimingSpan()
+
+
+class RequestTiming:
+    """ Time spent by a request in each phase of the handler lifecycle and in
+    spans added by components. Spans with the same name are summed.
+
+    Phases running after the response is sent, like after_request and the
+    session write, are not in the Server-Timing header. The timing is
+    recorded once the handler is closed and every hold is released.
+    """
+
+    __slots__ = ("registry", "handler", "start_ns", "handler_start_ns",
+                 "spans", "holds", "closed", "total_ns")
+
+    def __init__(self, registry, handler):
+        self.registry = registry
+        self.handler = handler
+        self.start_ns = time.perf_counter_ns()
+        self.handler_start_ns = None
+        self.spans = {}
+        self.holds = 0
+        self.closed = False
+        self.total_ns = None
+
+    def span(self, name):
+        """ Return a context manager timing its block into the span.
+
+        :param str name: The span name
+        :return TimingSpan: The span context manager
+        """
+        return TimingSpan(self, name)
+
+    def add(self, name, elapsed_ns):
+        """ Add the elapsed time to the span.
+
+        :param str name: The span name
+        :param int elapsed_ns: The elapsed time in nanoseconds
+        """
+        self.spans[name] = self.spans.get(name, 0) + elapsed_ns
+
+    def start_handler(self):
+        """ Mark the start of the handler method, at the end of prepare. """
+        self.handler_start_ns = time.perf_counter_ns()
+
+    def finish_handler(self):
+        """ Add the time since the end of prepare to the handler span. """
+        if self.handler_start_ns is not None:
+            self.add("handler",
+                     time.perf_counter_ns() - self.handler_start_ns)
+            self.handler_start_ns = None
+
+    def elapsed_ns(self):
+        return time.perf_counter_ns() - self.start_ns
+
+    def header_value(self):
+        """ Return the Server-Timing header value with the spans timed so
+        far and the total time in milliseconds.
+        """
+        metrics = ["%s;dur=%.3f" % (name, elapsed_ns / 1000000)
+                   for name, elapsed_ns in self.spans.items()]
+        metrics.append("total;dur=%.3f" % (self.elapsed_ns() / 1000000))
+        return ", ".join(metrics)
+
+    def hold(self):
+        """ Delay the timing record until release is called, used by phases
+        running after the handler is closed.
+        """
+        self.holds += 1
+
+    def release(self):
+        self.holds -= 1
+        if self.closed and self.holds == 0:
+            self.registry.record(self)
+
+    def close(self):
+        """ Close the timing at the end of the handler on_finish, recording
+        it if there are no holds.
+        """
+        self.closed = True
+        self.total_ns = self.elapsed_ns()
+        if current_request_timing.get() is self:
+            current_request_timing.set(None)
+        if self.holds == 0:
+            self.registry.record(self)
+
+
+def iter_rules(application):
+    """ Iterate the rules of the application routers, including the rules of
+    the routers added per host.
+
+    :param tornado.web.Application application: The application
+    """
+    routers = [getattr(application, "wildcard_router", None),
+               getattr(application, "default_router", None)]
+    seen = set()
+    while routers:
+        router = routers.pop(0)
+        if router is None or id(router) in seen:
+            continue
+        seen.add(id(router))
+        for rule in getattr(router, "rules", ()):
+            if hasattr(rule.target, "rules"):
+                routers.append(rule.target)
+            else:
+                yield rule
+
+
+class TimingRegistry:
+    """ Collects the request timings of an application in histograms per
+    route and span, logging each request timing if set.
+
+    Components add their own spans to the request being handled using the
+    span context manager or add_span:
+
+    >>> with self.application.timing.span("ldap"):
+    >>>     user = self.ldap.search(user_name)
+    """
+
+    def __init__(self, application=None, **kwargs):
+        self.application = application
+        self.enabled = kwargs.get("enabled", False)
+        self.log = kwargs.get("log", True)
+        self.server_timing = kwargs.get("server_timing", True)
+        self.buckets = tuple(kwargs.get("buckets", DEFAULT_BUCKETS))
+        self.histograms = {}
+        self._routes = {}
+
+    def start(self, handler):
+        """ Start the timing of the request being handled by the handler,
+        setting it in the current context.
+
+        :param handler: The request handler
+        :return RequestTiming: The request timing
+        """
+        timing = RequestTiming(self, handler)
+        current_request_timing.set(timing)
+        return timing
+
+    def span(self, name):
+        """ Return a context manager timing its block into a span of the
+        request being handled, if timed.
+
+        :param str name: The span name
+        """
+        timing = current_request_timing.get()
+        if timing is None:
+            return NULL_TIMING_SPAN
+        return timing.span(name)
+
+    def add_span(self, name, elapsed_ns):
+        """ Add the elapsed time to a span of the request being handled, if
+        timed.
+
+        :param str name: The span name
+        :param int elapsed_ns: The elapsed time in nanoseconds
+        """
+        timing = current_request_timing.get()
+        if timing is not None:
+            timing.add(name, elapsed_ns)
+
+    def route(self, handler):
+        """ Return the route pattern of the handler class, or its name when
+        the class is routed by more than one pattern. Patterns are resolved
+        from the application rules the first time a handler class is timed.
+
+        :param handler: The request handler
+        :return str: The route
+        """
+        handler_class = handler.__class__
+        route = self._routes.get(handler_class)
+        if route is None:
+            from tornado.routing import PathMatches
+            patterns = {}
+            for rule in iter_rules(self.application):
+                if isinstance(rule.matcher, PathMatches):
+                    patterns.setdefault(rule.target, set()).add(
+                        rule.matcher.regex.pattern.rstrip("$"))
+            for target, target_patterns in patterns.items():
+                if len(target_patterns) == 1:
+                    self._routes[target] = next(iter(target_patterns))
+            route = self._routes.setdefault(handler_class, "%s.%s" % (
+                handler_class.__module__, handler_class.__name__))
+        return route
+
+    def observe(self, route, span, elapsed_ns):
+        key = (route, span)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = Histogram(self.buckets)
+            self.histograms[key] = histogram
+        histogram.observe(elapsed_ns / 1000000)
+
+    def record(self, timing):
+        """ Observe the spans and total time of a closed request timing and
+        log it.
+
+        :param RequestTiming timing: The request timing
+        """
+        handler = timing.handler
+        route = self.route(handler)
+        for name, elapsed_ns in timing.spans.items():
+            self.observe(route, name, elapsed_ns)
+        self.observe(route, "total", timing.total_ns)
+        if self.log:
+            spans = ["%s=%.3f" % (name, elapsed_ns / 1000000)
+                     for name, elapsed_ns in timing.spans.items()]
+            spans.append("total=%.3f" % (timing.total_ns / 1000000))
+            logger.info("request_timing method=%s route=%s status=%s %s",
+                        handler.request.method, route, handler.get_status(),
+                        " ".join(spans))
+
+    def stats(self):
+        """ Return the histograms as a dict by route and span, with the
+        count, sum in milliseconds and counts per bucket upper bound.
+        """
+        stats = {}
+        for (route, span), histogram in self.histograms.items():
+            stats.setdefault(route, {})[span] = {
+                'count': histogram.count,
+                'sum': histogram.sum,
+                'buckets': dict(zip(histogram.buckets + (float("inf"),),
+                                    histogram.counts)),
+            }
+        return stats
+
+    def reset(self):
+        self.histograms = {}
+
+
+def timed(method):
+    """ Decorate the handler prepare method starting the request timing, if
+    the application timing is enabled, and marking the start of the handler
+    method when prepare is done.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        registry = getattr(self.application, "timing", None)
+        if (registry is not None and registry.enabled and
+                not is_refresh(self.request)):
+            self.request_timing = registry.start(self)
+        result = method(self, *args, **kwargs)
+        if result is not None:
+            await result
+        if getattr(self, "request_timing", None) is not None:
+            self.request_timing.start_handler()
+    return wrapper
+
+
+def timing_span(handler, name):
+    """ Return a context manager timing its block into a span of the handler
+    request timing, or a null span if the request is not timed.
+
+    :param handler: The request handler
+    :param str name: The span name
+    """
+    timing = getattr(handler, "request_timing", None)
+    if timing is None:
+        return NULL_TIMING_SPAN
+    return timing.span(name)
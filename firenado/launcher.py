@@ -21,6 +21,67 @@ import sys
 
 logger = logging.getLogger(__name__)
 
+WORKER_ENV = "FIRENADO_WORKER"
+
+LOOP_ASYNCIO = "asyncio"
+LOOP_UVLOOP = "uvloop"
+LOOPS = (LOOP_ASYNCIO, LOOP_UVLOOP)
+
+
+def is_supervisor_worker():
+    """ Returns if the current process is a worker forked by the
+    SupervisorLauncher.
+
+    :return bool: True if the process is a supervisor worker
+    """
+    return WORKER_ENV in os.environ
+
+
+def install_event_loop(loop):
+    """ Install the event loop policy of the loop set in the app config. The
+    policy is installed once, before the application or any IOLoop is
+    created, as anything bound to the current IOLoop would be left on the
+    loop of the previous policy.
+
+    If uvloop isn't installed the asyncio loop is used.
+
+    :param str loop: The loop name
+    :return str: The loop installed, None if the policy wasn't changed
+    """
+    import asyncio
+    if loop is None:
+        return None
+    if loop not in LOOPS:
+        raise ValueError("Invalid loop %s, expected one of: %s." % (
+            loop, ", ".join(LOOPS)))
+    if loop == LOOP_UVLOOP:
+        try:
+            import uvloop
+        except ImportError:
+            logger.warning("The uvloop module isn't installed. Consider "
+                           "installing it in order to run the application "
+                           "with uvloop. Using the asyncio loop.")
+            loop = LOOP_ASYNCIO
+        else:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    if loop == LOOP_ASYNCIO:
+        asyncio.set_event_loop_policy(None)
+    logger.debug("Running the %s event loop.", loop)
+    return loop
+
+
+def current_task_id():
+    """ Returns the id of the current worker, forked by Tornado or by the
+    SupervisorLauncher, or None if not a worker.
+
+    :return int: The worker id
+    """
+    from tornado.process import task_id
+    tid = task_id()
+    if tid is None and is_supervisor_worker():
+        tid = int(os.environ[WORKER_ENV])
+    return tid
+
 
 class FirenadoLauncher:
 
@@ -153,11 +214,15 @@ class ProcessLauncher(FirenadoLauncher):
 
 
 class TornadoLauncher(FirenadoLauncher):
+    # Seconds between checks for pending requests while draining
+    DRAIN_INTERVAL = 0.05
 
     def __init__(self, **settings):
         super().__init__(**settings)
         self.http_server = None
         self.application = None
+        self.sockets = []
+        self.watchdog = None
         self.MAX_WAIT_SECONDS_BEFORE_SHUTDOWN = firenado.conf.app[
             'wait_before_shutdown']
         self.addresses = firenado.conf.app['default_addresses']
@@ -168,20 +233,60 @@ class TornadoLauncher(FirenadoLauncher):
             self.port = firenado.conf.app['port']
 
     def load(self):
-        from .tornadoweb import TornadoApplication
         # TODO: Resolve module if doesn't exists
         if firenado.conf.app['pythonpath']:
             sys.path.append(firenado.conf.app['pythonpath'])
+        install_event_loop(firenado.conf.app['loop'])
+        # Forked processes create the application after the fork, otherwise
+        # callbacks set by the application and its components would be bound
+        # to the IOLoop of the parent, never started in the children
+        if firenado.conf.app['process']['num_processes'] is None:
+            self.create_application()
+
+    def create_application(self):
+        from .tornadoweb import TornadoApplication
         self.application = TornadoApplication(**firenado.conf.app['settings'])
+        return self.application
 
     def launch(self):
         import signal
         from tornado.ioloop import IOLoop
-        import tornado.httpserver
+        from .metrics import start_run
+        start_run()
         signal.signal(signal.SIGTERM, self.sig_handler)
         signal.signal(signal.SIGINT, self.sig_handler)
         if os.name == "posix":
             signal.signal(signal.SIGTSTP, self.sig_handler)
+        num_processes = firenado.conf.app['process']['num_processes']
+        reuse_port = self.reuse_port
+        if reuse_port:
+            # Each worker binds its own sockets, the kernel balances the
+            # connections between them.
+            self.fork_processes()
+            self.create_application()
+        if num_processes is None or reuse_port:
+            self.create_http_server()
+        listening_count, listening_what = self.listen(reuse_port)
+        if listening_count:
+            if listening_count > 1:
+                listening_what = f"{listening_what}s"
+            logger.info("Firenado server started successfully. Listening at %s"
+                        " %s.", listening_count, listening_what)
+            if num_processes is not None and not reuse_port:
+                self.fork_processes()
+                # Sockets bound by the parent are served by the application
+                # created by each child
+                self.create_application()
+                self.create_http_server()
+                self.http_server.add_sockets(self.sockets)
+            self.start_watchdog()
+            IOLoop.current().start()
+        else:
+            logger.critical("Firenado unable to start.")
+            sysexits.exit_fatal(sysexits.EX_SOFTWARE)
+
+    def create_http_server(self):
+        import tornado.httpserver
         self.http_server = tornado.httpserver.HTTPServer(self.application)
         if firenado.conf.app['xheaders'] is not None and isinstance(
                 firenado.conf.app['xheaders'], bool):
@@ -194,6 +299,49 @@ class TornadoLauncher(FirenadoLauncher):
                            "must be bool instead of %s. Ignoring the "
                            "configuration item.",
                            type(firenado.conf.app['xheaders']).__name__)
+        return self.http_server
+
+    @property
+    def reuse_port(self):
+        """ Returns if forked workers bind their own sockets with
+        SO_REUSEPORT. It requires num_processes and addresses to listen, as
+        unix sockets can't be shared that way, and a platform supporting
+        SO_REUSEPORT.
+
+        :return bool: True if workers bind their own sockets
+        """
+        if not firenado.conf.app['process']['reuse_port']:
+            return False
+        if firenado.conf.app['process']['num_processes'] is None:
+            return False
+        if firenado.conf.app['socket'] or self.socket:
+            logger.warning("Ignoring the process reuse_port as Firenado is "
+                           "listening at an unix socket.")
+            return False
+        import socket
+        if not hasattr(socket, "SO_REUSEPORT"):
+            logger.warning("Ignoring the process reuse_port as this platform "
+                           "doesn't support SO_REUSEPORT.")
+            return False
+        return True
+
+    def fork_processes(self):
+        from tornado.process import cpu_count, fork_processes
+        num_processes = firenado.conf.app['process']['num_processes']
+        max_restarts = firenado.conf.app['process']['max_restarts']
+        num_processes_alert = num_processes
+        if num_processes == 0:
+            num_processes_alert = f"0 (assuming {cpu_count()} as cpu count)"
+        logger.info("Tornado set to start %s processes with %s max "
+                    "restarts.", num_processes_alert, max_restarts)
+        fork_processes(num_processes, max_restarts)
+
+    def listen(self, reuse_port=False):
+        """ Bind the http server to the unix socket or addresses set.
+
+        :param bool reuse_port: If sockets are bound with SO_REUSEPORT
+        :return tuple: The count of sockets listening and what they are
+        """
         listening_count = 0
         listening_what = "socket"
         if firenado.conf.app['socket'] or self.socket:
@@ -202,7 +350,7 @@ class TornadoLauncher(FirenadoLauncher):
             if self.socket:
                 socket_path = self.socket
             socket = bind_unix_socket(socket_path)
-            self.http_server.add_socket(socket)
+            self.serve_sockets([socket])
             logger.info("Firenado listening at socket %s",
                         socket.getsockname())
             listening_count += 1
@@ -210,32 +358,28 @@ class TornadoLauncher(FirenadoLauncher):
             listening_what = "addresses:port"
             if len(self.addresses):
                 for address in self.addresses:
-                    if self.add_sockets(self.port, address):
+                    if self.add_sockets(self.port, address, reuse_port):
                         listening_count += 1
             else:
-                if self.add_sockets(self.port):
+                if self.add_sockets(self.port, reuse_port=reuse_port):
                     listening_count += 1
-        if listening_count:
-            if listening_count > 1:
-                listening_what = f"{listening_what}s"
-            logger.info("Firenado server started successfully. Listening at %s"
-                        " %s.", listening_count, listening_what)
-            if firenado.conf.app['process']['num_processes'] is not None:
-                from tornado.process import fork_processes
-                num_processes = firenado.conf.app['process']['num_processes']
-                max_restarts = firenado.conf.app['process']['max_restarts']
-                num_processes_alert = num_processes
-                if num_processes == 0:
-                    num_processes_alert = (
-                        f"0 (assuming {tornado.process.cpu_count()} as cpu "
-                        "count)")
-                logger.info("Tornado set to start %s processes with %s max "
-                            "restarts.", num_processes_alert, max_restarts)
-                fork_processes(num_processes, max_restarts)
-            IOLoop.current().start()
-        else:
-            logger.critical("Firenado unable to start.")
-            sysexits.exit_fatal(sysexits.EX_SOFTWARE)
+        return listening_count, listening_what
+
+    def start_watchdog(self):
+        """ Start the IOLoop watchdog of the current process, if enabled in
+        the app config, feeding the application metrics if any.
+        """
+        watchdog_conf = firenado.conf.app['watchdog']
+        if not watchdog_conf['enabled']:
+            return
+        from .watchdog import IOLoopWatchdog
+        self.watchdog = IOLoopWatchdog(**watchdog_conf)
+        metrics = getattr(self.application, "metrics", None)
+        if metrics is not None:
+            self.watchdog.lag_observers.append(metrics.observe_ioloop_lag)
+            self.watchdog.block_observers.append(
+                metrics.observe_ioloop_block)
+        self.watchdog.start()
 
     def sig_handler(self, sig, _):
         """ Handle the signal sent to the process
@@ -243,24 +387,39 @@ class TornadoLauncher(FirenadoLauncher):
         :param _: Frame is not being used
         """
         from tornado.ioloop import IOLoop
-        from tornado.process import task_id
-        tid = task_id()
+        tid = current_task_id()
         pid = os.getpid()
         if tid is None:
             logger.warning("main process (pid %s) caught signal: %s", pid, sig)
+            if self.application is None:
+                # The parent of forked processes has no IOLoop, it exits
+                # once the children are down
+                return
         else:
             logger.warning("child %s (pid %s) caught signal: %s", tid, pid,
                            sig)
         IOLoop.current().add_callback_from_signal(self.shutdown)
 
-    def add_sockets(self, port: int, address: str = None):
+    def serve_sockets(self, sockets):
+        """ Keep the sockets bound by the launcher, adding them to the http
+        server if created.
+
+        :param list sockets: The bound sockets
+        """
+        self.sockets.extend(sockets)
+        if self.http_server is not None:
+            self.http_server.add_sockets(sockets)
+
+    def add_sockets(self, port: int, address: str = None,
+                    reuse_port: bool = False):
         from socket import gaierror
         from tornado.netutil import bind_sockets
         try:
             if address is None:
                 address = "127.0.0.1"
-            sockets = bind_sockets(port, address.strip())
-            self.http_server.add_sockets(sockets)
+            sockets = bind_sockets(port, address.strip(),
+                                   reuse_port=reuse_port)
+            self.serve_sockets(sockets)
             logger.info("Firenado listening at http://%s:%s.", address.strip(),
                         port)
             return True
@@ -277,8 +436,6 @@ class TornadoLauncher(FirenadoLauncher):
 
     def shutdown(self):
         from tornado.ioloop import IOLoop
-        from tornado.process import task_id
-        import time
 
         def log_message(message: str, pid: int, tid: int = None):
             if tid is None:
@@ -286,29 +443,664 @@ class TornadoLauncher(FirenadoLauncher):
                 return
             logger.info("child %s (pid %s): %s", tid, pid, message)
 
-        tid = task_id()
+        tid = current_task_id()
         pid = os.getpid()
         log_message("stopping http server", pid, tid)
-        for key, component in self.application.components.items():
-            component.shutdown()
+        if self.watchdog is not None:
+            self.watchdog.stop()
         self.http_server.stop()
 
         io_loop: IOLoop = IOLoop.current()
 
+        def shutdown_components():
+            for key, component in self.application.components.items():
+                component.shutdown()
+
         if self.MAX_WAIT_SECONDS_BEFORE_SHUTDOWN == 0:
+            shutdown_components()
             io_loop.stop()
             log_message("application is down", pid, tid)
             return
 
-        log_message(f"shutdown in {self.MAX_WAIT_SECONDS_BEFORE_SHUTDOWN}s"
-                    " seconds", pid, tid)
-        deadline = time.time() + self.MAX_WAIT_SECONDS_BEFORE_SHUTDOWN
+        log_message("draining connections, shutdown in at most "
+                    f"{self.MAX_WAIT_SECONDS_BEFORE_SHUTDOWN} seconds", pid,
+                    tid)
 
-        def stop_loop():
-            now = time.time()
-            if now < deadline:
-                io_loop.add_timeout(now + 1, stop_loop)
-                return
+        async def stop_loop():
+            await self.drain(self.MAX_WAIT_SECONDS_BEFORE_SHUTDOWN)
+            # Components are shut down once the requests using them finished
+            shutdown_components()
             io_loop.stop()
             log_message("application is down", pid, tid)
-        stop_loop()
+        io_loop.add_callback(stop_loop)
+
+    async def drain(self, timeout):
+        """ Wait for the requests being handled and the websockets open to
+        finish, closing the idle keep-alive connections, up to the timeout.
+        The connections left are closed after that.
+
+        :param float timeout: Maximum seconds to wait
+        :return int: The count of requests and websockets still pending
+        """
+        import asyncio
+        import time
+        deadline = time.monotonic() + timeout
+        self.application.drain()
+        pending = self.application.pending()
+        while pending and time.monotonic() < deadline:
+            await self.close_idle_connections()
+            await asyncio.sleep(min(self.DRAIN_INTERVAL,
+                                    max(deadline - time.monotonic(), 0)))
+            pending = self.application.pending()
+        if pending:
+            logger.warning("Closing %s pending requests and websockets after "
+                           "waiting %s seconds.", pending, timeout)
+        await self.http_server.close_all_connections()
+        return pending
+
+    async def close_idle_connections(self):
+        """ Close the keep-alive connections without a request being handled
+        or a response being written. The connections are the ones the
+        application started requests from.
+
+        :return int: The count of connections closed
+        """
+        active_streams = self.application.active_streams()
+        idle = []
+        for connection in list(self.application.server_connections):
+            stream = connection.stream
+            if (stream in active_streams or stream.closed() or
+                    stream.writing()):
+                continue
+            idle.append(connection)
+        for connection in idle:
+            await connection.close()
+        return len(idle)
+
+
+class Worker:
+    """ A worker process forked by the supervisor, with the pipes it talks
+    to the supervisor through.
+
+    :param int pid: The worker pid
+    :param int index: The worker index at its generation
+    :param int generation: The generation the worker was forked at
+    :param int fd: The read end of the pipe the worker reports through
+    :param int control_fd: The write end of the pipe the worker is pinged
+    through
+    """
+
+    def __init__(self, pid, index, generation, fd, control_fd=None):
+        self.pid = pid
+        self.index = index
+        self.generation = generation
+        self.fd = fd
+        self.control_fd = control_fd
+        self.buffer = b""
+        self.ready = False
+        self.terminated = False
+        self.terminated_at = None
+        self.killed = False
+        # Requests handled before the worker is recycled, None for no limit
+        self.max_requests = None
+        self.requests = 0
+        self.rss = 0
+        self.pinged_at = None
+        self.ping_sent_at = None
+        # Set while a replacement is starting or the worker is draining
+        self.recycling = False
+        self.recycle_after = 0
+        # The worker replaced by this one, once ready
+        self.replaces = None
+        self.ready_at = None
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        if self.control_fd is not None:
+            os.close(self.control_fd)
+            self.control_fd = None
+
+    def read(self):
+        """ Read the messages sent by the worker through the pipe.
+
+        :return list: The messages read
+        """
+        data = os.read(self.fd, 4096)
+        if not data:
+            self.close()
+            return []
+        self.buffer += data
+        lines = self.buffer.split(b"\n")
+        self.buffer = lines.pop()
+        return [line.decode() for line in lines if line]
+
+    def ping(self, now):
+        """ Send a health ping to the worker, answered with its rss and
+        requests handled. No ping is sent while the previous one isn't
+        answered, and the control pipe doesn't block, so a hung worker
+        can't block the supervisor.
+
+        :param float now: The current monotonic time
+        """
+        self.pinged_at = now
+        if self.ping_sent_at is not None:
+            return
+        self.ping_sent_at = now
+        try:
+            os.write(self.control_fd, b"ping\n")
+        except BlockingIOError:
+            logger.debug("Worker %s (pid %s) control pipe is full, missed "
+                         "the ping.", self.index, self.pid)
+        except OSError:
+            pass
+
+    def pong(self, rss, requests):
+        self.ping_sent_at = None
+        self.rss = rss
+        self.requests = requests
+
+    def terminate(self):
+        import signal
+        import time
+        self.terminated = True
+        self.terminated_at = time.monotonic()
+        try:
+            os.kill(self.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def kill(self):
+        import signal
+        self.killed = True
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def current_rss():
+    """ Returns the resident set size of the current process in bytes. Where
+    /proc isn't available the peak resident set size is returned.
+
+    :return int: The resident set size in bytes
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            return rss
+        return rss * 1024
+
+
+class SupervisorLauncher(TornadoLauncher):
+    """ Launcher running a master process that holds the listening sockets
+    and supervises workers forked from it.
+
+    The master doesn't load the application, each worker loads it, with
+    the app config, after being forked, and reports to the master when it
+    is serving. On SIGHUP or SIGUSR2 the master forks a new generation of
+    workers and, once all of them are ready, sends SIGTERM to the previous
+    generation, draining their connections as set by wait_before_shutdown.
+    As the sockets are never closed, no connection is refused during a
+    reload. If a new worker exits before being ready the reload is aborted
+    and the previous generation keeps serving.
+
+    Workers exiting unexpectedly are replaced after a backoff, doubled at
+    each crash in a row of the same worker, up to max_restarts times, when
+    the supervisor gives up and stops. Workers are pinged through a
+    pipe every ping_interval seconds, answering with their resident set
+    size and requests handled, and are recycled when they don't answer for
+    ping_timeout seconds, go over max_rss megabytes or handle max_requests,
+    plus a random jitter up to max_requests_jitter. A replacement worker is
+    forked first and the recycled worker is drained once the replacement is
+    ready, no more than max_recycling workers at once.
+
+    On SIGTERM or SIGINT the master terminates the workers and exits when
+    all of them are down. Workers not down wait_before_shutdown plus
+    KILL_TIMEOUT seconds after being terminated are killed.
+    """
+    READY_MESSAGE = "ready"
+    PONG_MESSAGE = "pong"
+    # Seconds the master waits for worker messages between checks
+    POLL_INTERVAL = 0.1
+    # Seconds to wait before recycling a worker again, if its replacement
+    # failed to start
+    RECYCLE_BACKOFF = 5
+    # Seconds, past wait_before_shutdown, to wait for a terminated worker
+    # before killing it
+    KILL_TIMEOUT = 5
+    # Seconds to wait before replacing a crashed worker, doubled at each
+    # crash in a row of the same worker up to MAX_RESTART_BACKOFF
+    RESTART_BACKOFF = 1
+    MAX_RESTART_BACKOFF = 30
+
+    def __init__(self, **settings):
+        super().__init__(**settings)
+        self.generation = 0
+        self.next_generation = None
+        self.signals = []
+        self.stopping = False
+        self.workers = {}
+        self.restarts = 0
+        # Crashes in a row by worker index
+        self.crashes = {}
+        # Workers to be replaced, as tuples with the monotonic time to fork
+        # the replacement, the worker index and generation
+        self.pending_restarts = []
+
+    @property
+    def num_workers(self):
+        from tornado.process import cpu_count
+        num_processes = firenado.conf.app['process']['num_processes']
+        if num_processes is None:
+            return 1
+        if num_processes == 0:
+            return cpu_count()
+        return num_processes
+
+    def load(self):
+        """ The application is loaded by each worker after being forked, so
+        workers forked at a reload run the new code.
+        """
+        if firenado.conf.app['pythonpath']:
+            sys.path.append(firenado.conf.app['pythonpath'])
+
+    def launch(self):
+        import signal
+        from .metrics import start_run
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP,
+                    signal.SIGUSR2):
+            signal.signal(sig, self.sig_handler)
+        start_run()
+        if firenado.conf.app['process']['reuse_port']:
+            logger.warning("Ignoring the process reuse_port as the "
+                           "supervisor holds the sockets shared by the "
+                           "workers.")
+        listening_count, listening_what = self.listen()
+        if not listening_count:
+            logger.critical("Firenado unable to start.")
+            sysexits.exit_fatal(sysexits.EX_SOFTWARE)
+        if listening_count > 1:
+            listening_what = f"{listening_what}s"
+        logger.info("Firenado supervisor (pid %s) listening at %s %s.",
+                    os.getpid(), listening_count, listening_what)
+        if self.MAX_WAIT_SECONDS_BEFORE_SHUTDOWN == 0:
+            logger.warning("The wait_before_shutdown is 0, workers replaced "
+                           "at a reload won't drain their connections.")
+        self.spawn_generation(self.generation)
+        self.supervise()
+        for sock in self.sockets:
+            sock.close()
+        logger.info("Firenado supervisor (pid %s) is down.", os.getpid())
+
+    def sig_handler(self, sig, _):
+        """ Queue the signal to be handled by the supervisor loop.
+
+        :param sig: Signal set to the process
+        :param _: Frame is not being used
+        """
+        self.signals.append(sig)
+
+    def supervise(self):
+        """ Supervisor loop, handling signals and worker messages and exits
+        until the supervisor is stopped and all workers are down.
+        """
+        import select
+        import time
+        while self.workers or not self.stopping:
+            while self.signals:
+                self.handle_signal(self.signals.pop(0))
+            fds = {worker.fd: worker for worker in self.workers.values()
+                   if worker.fd is not None}
+            if fds:
+                readable, _, _ = select.select(list(fds), [], [],
+                                               self.POLL_INTERVAL)
+            else:
+                time.sleep(self.POLL_INTERVAL)
+                readable = []
+            for fd in readable:
+                worker = fds[fd]
+                for message in worker.read():
+                    self.handle_message(worker, message)
+            self.reap_workers()
+            self.check_reload()
+            now = time.monotonic()
+            self.restart_workers(now)
+            self.ping_workers(now)
+            for worker, reason in self.workers_to_recycle(now):
+                self.recycle(worker, reason)
+            self.kill_workers(now)
+
+    def handle_signal(self, sig):
+        import signal
+        if sig in (signal.SIGHUP, signal.SIGUSR2):
+            self.reload()
+            return
+        logger.warning("Firenado supervisor (pid %s) caught signal: %s, "
+                       "stopping the workers.", os.getpid(), sig)
+        self.stop_workers()
+
+    def stop_workers(self):
+        """ Stop the supervisor, terminating the workers. """
+        self.stopping = True
+        self.pending_restarts = []
+        for worker in self.workers.values():
+            worker.terminate()
+
+    def handle_message(self, worker, message):
+        import time
+        if message == self.READY_MESSAGE:
+            worker.ready = True
+            worker.ready_at = time.monotonic()
+            logger.info("Worker %s (pid %s) of generation %s is ready.",
+                        worker.index, worker.pid, worker.generation)
+            if worker.replaces is not None:
+                worker.replaces.terminate()
+                worker.replaces = None
+            return
+        if message.startswith(self.PONG_MESSAGE):
+            _, rss, requests = message.split()
+            worker.pong(int(rss), int(requests))
+
+    def ping_workers(self, now):
+        """ Ping the ready workers not pinged for ping_interval seconds.
+
+        :param float now: The current monotonic time
+        """
+        interval = firenado.conf.app['process']['ping_interval']
+        if not interval:
+            return
+        for worker in self.workers.values():
+            if not worker.ready or worker.terminated:
+                continue
+            if (worker.pinged_at is None or
+                    now - worker.pinged_at >= interval):
+                worker.ping(now)
+
+    def recycle_reason(self, worker, now):
+        """ Returns why the worker must be recycled or None if it must not.
+
+        :param Worker worker: The worker
+        :param float now: The current monotonic time
+        :return str: The reason to recycle the worker
+        """
+        process_conf = firenado.conf.app['process']
+        if (process_conf['ping_timeout'] and
+                worker.ping_sent_at is not None and
+                now - worker.ping_sent_at > process_conf['ping_timeout']):
+            return "not answering pings for %.2f seconds" % (
+                now - worker.ping_sent_at)
+        max_rss = process_conf['max_rss']
+        if max_rss and worker.rss > max_rss * 1024 * 1024:
+            return "resident set size of %sMB over %sMB" % (
+                worker.rss // (1024 * 1024), max_rss)
+        if (worker.max_requests is not None and
+                worker.requests >= worker.max_requests):
+            return "%s requests handled" % worker.requests
+        return None
+
+    def workers_to_recycle(self, now):
+        """ Returns the workers to be recycled, with the reason, keeping no
+        more than max_recycling workers recycled at once. Workers aren't
+        recycled during a reload.
+
+        :param float now: The current monotonic time
+        :return list: Tuples with the worker and the reason
+        """
+        if self.stopping or self.next_generation is not None:
+            return []
+        available = firenado.conf.app['process']['max_recycling'] - len(
+            [worker for worker in self.workers.values()
+             if worker.recycling])
+        to_recycle = []
+        for worker in self.workers.values():
+            if available <= 0:
+                break
+            if (not worker.ready or worker.terminated or worker.recycling or
+                    worker.recycle_after > now):
+                continue
+            reason = self.recycle_reason(worker, now)
+            if reason is not None:
+                to_recycle.append((worker, reason))
+                available -= 1
+        return to_recycle
+
+    def recycle(self, worker, reason):
+        """ Fork the replacement of the worker, draining the worker once the
+        replacement is ready.
+
+        :param Worker worker: The worker being recycled
+        :param str reason: Why the worker is recycled
+        """
+        logger.info("Recycling worker %s (pid %s), %s.", worker.index,
+                    worker.pid, reason)
+        worker.recycling = True
+        pid = self.spawn_worker(worker.index, worker.generation)
+        self.workers[pid].replaces = worker
+
+    def kill_workers(self, now):
+        """ Kill the workers not down long after being terminated.
+
+        :param float now: The current monotonic time
+        """
+        timeout = self.MAX_WAIT_SECONDS_BEFORE_SHUTDOWN + self.KILL_TIMEOUT
+        for worker in self.workers.values():
+            if (worker.terminated and not worker.killed and
+                    now - worker.terminated_at > timeout):
+                logger.warning("Killing worker %s (pid %s), not down %s "
+                               "seconds after being terminated.",
+                               worker.index, worker.pid, timeout)
+                worker.kill()
+
+    def reload(self):
+        """ Fork a new generation of workers, replacing the current one
+        once all new workers are ready.
+        """
+        if self.stopping:
+            return
+        if self.next_generation is not None:
+            logger.warning("Ignoring the reload as the generation %s is "
+                           "still starting.", self.next_generation)
+            return
+        self.next_generation = self.generation + 1
+        logger.info("Reloading, forking the workers of generation %s.",
+                    self.next_generation)
+        self.spawn_generation(self.next_generation)
+
+    def check_reload(self):
+        """ Terminate the workers of the previous generation when all
+        workers of the new generation are ready.
+        """
+        if self.next_generation is None:
+            return
+        new_workers = [worker for worker in self.workers.values()
+                       if worker.generation == self.next_generation]
+        if not all(worker.ready for worker in new_workers):
+            return
+        for worker in self.workers.values():
+            if worker.generation != self.next_generation:
+                worker.terminate()
+        logger.info("Reloaded, generation %s is serving.",
+                    self.next_generation)
+        self.generation = self.next_generation
+        self.next_generation = None
+
+    def reap_workers(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            worker.close()
+            if os.WIFSIGNALED(status):
+                exit_code = -os.WTERMSIG(status)
+            else:
+                exit_code = os.WEXITSTATUS(status)
+            self.handle_exit(worker, exit_code)
+
+    def handle_exit(self, worker, exit_code):
+        import time
+        if self.stopping or worker.terminated:
+            logger.info("Worker %s (pid %s) of generation %s exited with "
+                        "code %s.", worker.index, worker.pid,
+                        worker.generation, exit_code)
+            return
+        if worker.generation == self.next_generation:
+            logger.error("Worker %s (pid %s) of generation %s exited with "
+                         "code %s before being ready, aborting the reload. "
+                         "Generation %s keeps serving.", worker.index,
+                         worker.pid, worker.generation, exit_code,
+                         self.generation)
+            for new_worker in self.workers.values():
+                if new_worker.generation == self.next_generation:
+                    new_worker.terminate()
+            self.next_generation = None
+            return
+        if worker.replaces is not None:
+            logger.error("Worker %s (pid %s) exited with code %s before "
+                         "being ready, worker %s (pid %s) keeps serving.",
+                         worker.index, worker.pid, exit_code,
+                         worker.replaces.index, worker.replaces.pid)
+            worker.replaces.recycling = False
+            worker.replaces.recycle_after = (time.monotonic() +
+                                             self.RECYCLE_BACKOFF)
+            return
+        if worker.recycling:
+            logger.warning("Worker %s (pid %s) being recycled exited with "
+                           "code %s.", worker.index, worker.pid, exit_code)
+            return
+        # Workers exiting before being ready, i.e. crashing at the startup
+        # after a restart, are replaced as well, or the supervisor would keep
+        # running fewer workers than configured
+        max_restarts = firenado.conf.app['process']['max_restarts']
+        if max_restarts is not None and self.restarts >= max_restarts:
+            logger.critical("Worker %s (pid %s) exited unexpectedly with "
+                            "code %s after %s workers restarted, stopping "
+                            "the supervisor.", worker.index, worker.pid,
+                            exit_code, self.restarts)
+            self.stop_workers()
+            return
+        self.restarts += 1
+        now = time.monotonic()
+        crashes = self.crashes.get(worker.index, 0)
+        if (worker.ready_at is not None and
+                now - worker.ready_at > self.MAX_RESTART_BACKOFF):
+            crashes = 0
+        backoff = min(self.RESTART_BACKOFF * 2 ** crashes,
+                      self.MAX_RESTART_BACKOFF)
+        self.crashes[worker.index] = crashes + 1
+        logger.warning("Worker %s (pid %s) exited unexpectedly with code "
+                       "%s%s, replacing it in %s seconds.", worker.index,
+                       worker.pid, exit_code,
+                       "" if worker.ready else " before being ready",
+                       backoff)
+        self.pending_restarts.append((now + backoff, worker.index,
+                                      worker.generation))
+
+    def restart_workers(self, now):
+        """ Fork the replacements of the crashed workers due. Workers of a
+        generation replaced by a reload meanwhile aren't replaced.
+
+        :param float now: The current monotonic time
+        """
+        pending_restarts = []
+        for restart_at, index, generation in self.pending_restarts:
+            if generation != self.generation:
+                continue
+            if restart_at > now:
+                pending_restarts.append((restart_at, index, generation))
+                continue
+            self.spawn_worker(index, generation)
+        self.pending_restarts = pending_restarts
+
+    def spawn_generation(self, generation):
+        for index in range(self.num_workers):
+            self.spawn_worker(index, generation)
+
+    def spawn_worker(self, index, generation):
+        import random
+        read_fd, write_fd = os.pipe()
+        control_read_fd, control_write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            os.close(control_write_fd)
+            exit_code = 0
+            try:
+                for worker in self.workers.values():
+                    worker.close()
+                self.workers = {}
+                self.run_worker(index, write_fd, control_read_fd)
+            except BaseException:
+                logger.exception("Worker %s failed.", index)
+                exit_code = 1
+            finally:
+                logging.shutdown()
+                os._exit(exit_code)
+        os.close(write_fd)
+        os.close(control_read_fd)
+        os.set_blocking(control_write_fd, False)
+        worker = Worker(pid, index, generation, read_fd, control_write_fd)
+        process_conf = firenado.conf.app['process']
+        if process_conf['max_requests']:
+            # The jitter keeps workers started together from being recycled
+            # together
+            worker.max_requests = process_conf['max_requests'] + (
+                random.randint(0, process_conf['max_requests_jitter']))
+        self.workers[pid] = worker
+        logger.info("Forked worker %s (pid %s) of generation %s.", index,
+                    pid, generation)
+        return pid
+
+    def run_worker(self, index, fd, control_fd):
+        """ Load the application and serve it through the supervisor
+        sockets, reporting to the supervisor when ready.
+
+        :param int index: The worker index
+        :param int fd: The write end of the pipe reporting to the supervisor
+        :param int control_fd: The read end of the pipe the supervisor pings
+        the worker through
+        """
+        import signal
+        from tornado.ioloop import IOLoop
+        for sig in (signal.SIGHUP, signal.SIGUSR2):
+            signal.signal(sig, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, super().sig_handler)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        os.environ[WORKER_ENV] = str(index)
+        # Picks the app config changed since the supervisor started
+        reload(firenado.conf)
+        self.MAX_WAIT_SECONDS_BEFORE_SHUTDOWN = firenado.conf.app[
+            'wait_before_shutdown']
+        super().load()
+        self.create_application()
+        self.create_http_server()
+        self.http_server.add_sockets(self.sockets)
+        self.start_watchdog()
+        io_loop = IOLoop.current()
+
+        def handle_control(control_fd, _):
+            data = os.read(control_fd, 4096)
+            if not data:
+                # The supervisor is gone, nobody will stop this worker
+                io_loop.remove_handler(control_fd)
+                logger.warning("Worker %s lost the supervisor.", index)
+                self.shutdown()
+                return
+            for _ in range(data.count(b"ping\n")):
+                os.write(fd, (f"{self.PONG_MESSAGE} {current_rss()} "
+                              f"{self.application.request_count}\n").encode())
+        io_loop.add_handler(control_fd, handle_control, IOLoop.READ)
+        io_loop.add_callback(
+            os.write, fd, f"{self.READY_MESSAGE}\n".encode())
+        io_loop.start()
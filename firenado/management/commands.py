@@ -25,6 +25,8 @@ loader = template.Loader(os.path.join(firenado.conf.ROOT,
 ManagementCommand(
     "app", "Application related commands", loader.load("app_command_help.txt"),
     category="Firenado", sub_commands=[
+        ManagementCommand("compile", "Compiles the application templates",
+                          "", tasks=tasks.CompileTemplatesTask),
         ManagementCommand("install", "Install a Firenado application", "",
                           tasks=tasks.InstallProjectTask),
         ManagementCommand("run", "Runs a Firenado application", "",
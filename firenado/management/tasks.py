@@ -24,6 +24,26 @@ import sys
 logger = logging.getLogger(__name__)
 
 
+def get_app_type(directory, default=None):
+    """ Return the app type set at the app config file of the application
+    directory, without loading the application config.
+
+    :param str directory: The application directory
+    :param str default: The type returned if not set at the app config
+    :return str: The app type
+    """
+    from cartola.config import load_yaml_file
+    config_path = os.getenv("FIRENADO_CURRENT_APP_CONFIG_PATH",
+                            os.path.join(directory, "conf"))
+    for extension in ("yml", "yaml"):
+        config_file = os.path.join(config_path, "%s.%s" % (
+            firenado.conf.FIRENADO_CONFIG_FILE, extension))
+        if os.path.isfile(config_file):
+            app_config = (load_yaml_file(config_file) or {}).get("app")
+            return (app_config or {}).get("type", default)
+    return default
+
+
 class CreateProjectTask(ManagementTask):
     def run(self, namespace):
         """
@@ -89,6 +109,39 @@ class CreateProjectTask(ManagementTask):
         return str(exception)
 
 
+class CompileTemplatesTask(ManagementTask):
+    """ Compiles the templates of all components registered in the
+    application into the template cache directory, so application processes
+    load them instead of compiling on their first requests.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("-c", "--cache-path", default=None)
+        parser.add_argument("-d", "--dir", default=None)
+
+    def run(self, namespace):
+        from firenado.launcher import FirenadoLauncher
+        # The launcher changes to the application directory, reloading the
+        # configuration, and configures the logging
+        FirenadoLauncher(dir=namespace.dir)
+        if firenado.conf.app['pythonpath']:
+            sys.path.append(firenado.conf.app['pythonpath'])
+        if namespace.cache_path is not None:
+            firenado.conf.app['templates']['cache_path'] = (
+                namespace.cache_path)
+        if firenado.conf.app['templates']['cache_path'] is None:
+            logger.error("Set the template cache path in the app templates "
+                         "configuration or with --cache-path.")
+            sys.exit(1)
+        # Precompilation will be done explicitly after the application load
+        firenado.conf.app['templates']['precompile'] = False
+        from firenado.tornadoweb import template_cache, TornadoApplication
+        application = TornadoApplication()
+        compiled = application.precompile_templates()
+        print("Compiled %s templates into %s." % (
+            compiled, template_cache.directory))
+
+
 class InstallProjectTask(ManagementTask):
     """ Triggers the install method of all components registered in the
     application.
@@ -136,7 +189,12 @@ class RunApplicationTask(ManagementTask):
                 parameters['port'] = namespace.port
         else:
             parameters['socket'] = namespace.socket
-        app_type = firenado.conf.app['types'][firenado.conf.app['type']]
+        app_type_name = firenado.conf.app['type']
+        if namespace.dir is not None:
+            # The launcher loads the config of the application directory,
+            # the app type is resolved from it before
+            app_type_name = get_app_type(namespace.dir, app_type_name)
+        app_type = firenado.conf.app['types'][app_type_name]
         launcher = get_class_from_config(app_type['launcher'])(**parameters)
         launcher.load()
         launcher.launch()
@@ -0,0 +1,491 @@
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from .instrumentation import Histogram
+import firenado.conf
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+# Default latency buckets upper bounds in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Environment variable with the run the metrics dumps belong to, set by the
+# launcher before forking the workers
+RUN_ENV = "FIRENADO_METRICS_RUN"
+
+
+def default_directory():
+    """ Return the default metrics directory of the application, in the
+    system temporary directory and named after the app id or, if not set,
+    the application directory, so applications running at the same host
+    don't share their dumps.
+
+    :return str: The metrics directory
+    """
+    app_key = firenado.conf.app['id']
+    if app_key is None:
+        app_key = os.path.abspath(firenado.conf.APP_ROOT_PATH)
+    return os.path.join(tempfile.gettempdir(), "firenado_metrics_%s" % (
+        hashlib.sha1(str(app_key).encode()).hexdigest()[:12]))
+
+
+def start_run():
+    """ Start a new metrics run, identified by the current process id. Called
+    by the launcher before forking the workers, that inherit the run.
+    """
+    os.environ[RUN_ENV] = str(os.getpid())
+
+
+def current_run():
+    """ Return the metrics run of the current process, the process itself if
+    no run was started by the launcher.
+
+    :return str: The metrics run
+    """
+    return os.environ.get(RUN_ENV, str(os.getpid()))
+
+
+class MetricFamily:
+    """ Metric values by label values. Counters and gauges keep a number per
+    labels, histograms keep a Histogram with buckets preallocated.
+
+    Values are only changed from the IOLoop thread, so there are no locks.
+    Gauges from different processes are aggregated by sum, or by max if
+    aggregate is max.
+    """
+
+    __slots__ = ("name", "kind", "help", "label_names", "buckets",
+                 "aggregate", "values")
+
+    def __init__(self, name, kind, help_text, label_names=(), **kwargs):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(kwargs.get("buckets", DEFAULT_BUCKETS))
+        self.aggregate = kwargs.get("aggregate", "sum")
+        self.values = {}
+
+    def inc(self, labels=(), value=1):
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def dec(self, labels=(), value=1):
+        self.values[labels] = self.values.get(labels, 0) - value
+
+    def set(self, labels=(), value=0):
+        self.values[labels] = value
+
+    def observe(self, labels=(), value=0):
+        histogram = self.values.get(labels)
+        if histogram is None:
+            histogram = Histogram(self.buckets)
+            self.values[labels] = histogram
+        histogram.observe(value)
+
+    def dump(self):
+        """ Return the family as a json serializable dict. """
+        if self.kind == HISTOGRAM:
+            values = [[list(labels), histogram.counts, histogram.sum]
+                      for labels, histogram in self.values.items()]
+        else:
+            values = [[list(labels), value]
+                      for labels, value in self.values.items()]
+        return {
+            'kind': self.kind,
+            'help': self.help,
+            'label_names': list(self.label_names),
+            'buckets': list(self.buckets),
+            'aggregate': self.aggregate,
+            'values': values,
+        }
+
+    @staticmethod
+    def load(name, data):
+        """ Create an empty family from a dumped family. """
+        return MetricFamily(name, data['kind'], data['help'],
+                            data['label_names'], buckets=data['buckets'],
+                            aggregate=data['aggregate'])
+
+    def merge(self, data, live=True):
+        """ Add the values of a dumped family from another process. Gauges
+        of processes not alive are skipped.
+
+        :param dict data: The dumped family
+        :param bool live: If the process dumping the family is alive
+        """
+        if self.kind == GAUGE and not live:
+            return
+        for value in data['values']:
+            labels = tuple(value[0])
+            if self.kind == HISTOGRAM:
+                histogram = self.values.get(labels)
+                if histogram is None:
+                    histogram = Histogram(self.buckets)
+                    self.values[labels] = histogram
+                for index, count in enumerate(value[1]):
+                    histogram.counts[index] += count
+                    histogram.count += count
+                histogram.sum += value[2]
+            elif self.kind == GAUGE and self.aggregate == "max":
+                self.values[labels] = max(self.values.get(labels, value[1]),
+                                          value[1])
+            else:
+                self.inc(labels, value[1])
+
+
+def escape_label_value(value):
+    return (str(value).replace("\\", "\\\\").replace("\n", "\\n")
+            .replace('"', '\\"'))
+
+
+def format_labels(label_names, labels, extra=None):
+    pairs = ['%s="%s"' % (name, escape_label_value(value))
+             for name, value in zip(label_names, labels)]
+    if extra is not None:
+        pairs.append('%s="%s"' % extra)
+    if not pairs:
+        return ""
+    return "{%s}" % ",".join(pairs)
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def render(families):
+    """ Render the metric families in the Prometheus text format.
+
+    :param list families: The metric families
+    :return str: The metrics text
+    """
+    lines = []
+    for family in families:
+        lines.append("# HELP %s %s" % (family.name, family.help))
+        lines.append("# TYPE %s %s" % (family.name, family.kind))
+        for labels in sorted(family.values):
+            value = family.values[labels]
+            if family.kind != HISTOGRAM:
+                lines.append("%s%s %s" % (
+                    family.name, format_labels(family.label_names, labels),
+                    format_value(value)))
+                continue
+            cumulative = 0
+            for bound, count in zip(family.buckets + (float("inf"),),
+                                    value.counts):
+                cumulative += count
+                lines.append("%s_bucket%s %s" % (
+                    family.name,
+                    format_labels(family.label_names, labels,
+                                  ("le", format_value(float(bound)))),
+                    cumulative))
+            labels_text = format_labels(family.label_names, labels)
+            lines.append("%s_sum%s %s" % (family.name, labels_text,
+                                          format_value(value.sum)))
+            lines.append("%s_count%s %s" % (family.name, labels_text,
+                                            value.count))
+    lines.append("")
+    return "\n".join(lines)
+
+
+def is_process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """ Application metrics, exposed in the Prometheus text format.
+
+    When the application runs forked processes each worker dumps its
+    metrics into a file named by the run and its pid in the metrics
+    directory, every flush_interval seconds and before serving the metrics.
+    Metrics are collected from every worker file of the current run,
+    counters and histograms from workers not alive anymore included.
+
+    :param application: The application
+    :key str directory: Directory where workers dump their metrics. Default
+    is the directory returned by default_directory.
+    :key int flush_interval: Seconds between each worker dump. Default 5.
+    :key list buckets: Latency buckets upper bounds in seconds
+    """
+
+    def __init__(self, application=None, **kwargs):
+        self.application = application
+        self.directory = kwargs.get("directory")
+        if self.directory is None:
+            self.directory = default_directory()
+        self.flush_interval = kwargs.get("flush_interval", 5)
+        buckets = kwargs.get("buckets", DEFAULT_BUCKETS)
+        self.families = {}
+        self.collectors = []
+        self._started_pid = None
+        self._flush_callback = None
+        self.requests = self.counter(
+            "firenado_http_requests_total", "Requests handled.",
+            ("route", "method", "status"))
+        self.request_duration = self.histogram(
+            "firenado_http_request_duration_seconds",
+            "Request handling latency.", ("route", "method", "status"),
+            buckets=buckets)
+        self.in_flight = self.gauge(
+            "firenado_http_requests_in_flight", "Requests being handled.")
+        self.session_duration = self.histogram(
+            "firenado_session_backend_duration_seconds",
+            "Session backend read and write latency.", ("operation",),
+            buckets=buckets)
+        self.job_runs = self.counter(
+            "firenado_scheduler_job_runs_total", "Scheduled job runs.",
+            ("job", "status"))
+        self.job_duration = self.histogram(
+            "firenado_scheduler_job_duration_seconds",
+            "Scheduled job run duration.", ("job",), buckets=buckets)
+        self.data_source_connections = self.gauge(
+            "firenado_data_source_connections",
+            "Data source pool connections.", ("data_source", "state"))
+        self.ioloop_lag = self.gauge(
+            "firenado_ioloop_lag_seconds",
+            "Delay of the IOLoop running a scheduled callback, the biggest "
+            "between workers.", aggregate="max")
+        self.ioloop_blocks = self.counter(
+            "firenado_ioloop_blocks_total",
+            "Callbacks blocking the IOLoop longer than the watchdog "
+            "threshold.")
+        self.collectors.append(self.collect_data_sources)
+
+    def counter(self, name, help_text, label_names=()):
+        return self.add_family(name, COUNTER, help_text, label_names)
+
+    def gauge(self, name, help_text, label_names=(), **kwargs):
+        return self.add_family(name, GAUGE, help_text, label_names, **kwargs)
+
+    def histogram(self, name, help_text, label_names=(), **kwargs):
+        return self.add_family(name, HISTOGRAM, help_text, label_names,
+                               **kwargs)
+
+    def add_family(self, name, kind, help_text, label_names=(), **kwargs):
+        """ Return the metric family by name, creating it if not registered.
+        Components use it to add their own metrics.
+        """
+        family = self.families.get(name)
+        if family is None:
+            family = MetricFamily(name, kind, help_text, label_names,
+                                  **kwargs)
+            self.families[name] = family
+        return family
+
+    @property
+    def forked(self):
+        from tornado.process import task_id
+        from .launcher import is_supervisor_worker
+        return task_id() is not None or is_supervisor_worker()
+
+    def start(self):
+        """ Start the dump callback of the current process, if forked.
+        Called at the first request handled by each process, as callbacks
+        started before the processes are forked would run in the parent.
+        """
+        pid = os.getpid()
+        if self._started_pid == pid:
+            return
+        self._started_pid = pid
+        if self.forked:
+            from tornado.ioloop import PeriodicCallback
+            self._flush_callback = PeriodicCallback(
+                self.flush, self.flush_interval * 1000)
+            self._flush_callback.start()
+
+    def stop(self):
+        if self._flush_callback is not None:
+            self._flush_callback.stop()
+        if self.forked:
+            self.flush()
+
+    def observe_ioloop_lag(self, lag):
+        """ IOLoop watchdog lag observer. """
+        self.ioloop_lag.set(value=lag)
+
+    def observe_ioloop_block(self, blocked):
+        """ IOLoop watchdog block observer. """
+        self.ioloop_blocks.inc()
+
+    def request_started(self, request):
+        self.start()
+        self.in_flight.inc()
+        request.metrics_in_flight = True
+
+    def request_ended(self, request):
+        """ Remove the request from the requests in flight, once, when it is
+        finished or its connection is closed before.
+
+        :param request: The request
+        """
+        if getattr(request, "metrics_in_flight", False):
+            request.metrics_in_flight = False
+            self.in_flight.dec()
+
+    def observe_request(self, handler, route):
+        """ Count the request finished by the handler and observe its
+        latency.
+
+        :param handler: The request handler
+        :param str route: The handler route
+        """
+        self.request_ended(handler.request)
+        labels = (route, handler.request.method, handler.get_status())
+        self.requests.inc(labels)
+        self.request_duration.observe(labels,
+                                      handler.request.request_time())
+
+    def observe_session(self, operation, seconds):
+        self.session_duration.observe((operation,), seconds)
+
+    def observe_job(self, job_id, seconds, error=False):
+        self.job_runs.inc((job_id, "error" if error else "ok"))
+        self.job_duration.observe((job_id,), seconds)
+
+    def collect_data_sources(self):
+        data_sources = getattr(self.application, "data_sources", None) or {}
+        for name, data_source in data_sources.items():
+            get_pool_usage = getattr(data_source, "get_pool_usage", None)
+            usage = None if get_pool_usage is None else get_pool_usage()
+            if usage is not None:
+                for state, value in usage.items():
+                    self.data_source_connections.set((name, state), value)
+
+    def dump(self):
+        """ Run the collectors and return the metric families as a json
+        serializable dict.
+        """
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as error:
+                logger.warning("Failed to collect metrics from %s: %s",
+                               collector, error)
+        return {name: family.dump() for name, family in self.families.items()}
+
+    def dump_path(self, pid=None):
+        """ Return the path of the process dump at the metrics directory.
+
+        :param int pid: The process id, default is the current process
+        :return str: The dump path
+        """
+        if pid is None:
+            pid = os.getpid()
+        return os.path.join(self.directory, "%s-%s.json" % (current_run(),
+                                                            pid))
+
+    def flush(self):
+        """ Dump the metrics into the process file at the metrics
+        directory. """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.dump_path()
+        temporary_path = "%s.tmp" % path
+        with open(temporary_path, "w") as metrics_file:
+            json.dump(self.dump(), metrics_file)
+        os.replace(temporary_path, path)
+
+    def clear(self):
+        """ Remove the metrics dumped by previous runs, keeping the ones
+        dumped by the workers of the current run.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        prefix = "%s-" % current_run()
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".json") and not filename.startswith(prefix):
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+
+    def collect(self):
+        """ Return the metric families aggregated from every worker, or the
+        current process metrics if not forked.
+
+        :return list: The metric families
+        """
+        if not self.forked:
+            return self.aggregate([(self.dump(), True)])
+        self.flush()
+        return self.aggregate(self.read_dumps())
+
+    def read_dumps(self):
+        """ Return the metrics dumped by the workers of the current run in
+        the metrics directory with a flag telling if the worker is alive.
+
+        :return list: The dumps and alive flags
+        """
+        dumps = []
+        prefix = "%s-" % current_run()
+        for filename in os.listdir(self.directory):
+            if not (filename.endswith(".json") and
+                    filename.startswith(prefix)):
+                continue
+            try:
+                with open(os.path.join(self.directory,
+                                       filename)) as metrics_file:
+                    data = json.load(metrics_file)
+            except (OSError, ValueError) as error:
+                logger.warning("Failed to read the metrics file %s: %s",
+                               filename, error)
+                continue
+            dumps.append((data, is_process_alive(int(
+                filename[len(prefix):-5]))))
+        return dumps
+
+    @staticmethod
+    def aggregate(dumps):
+        """ Merge the metrics dumps into metric families.
+
+        :param list dumps: The dumps and if the process dumping it is alive
+        :return list: The metric families sorted by name
+        """
+        families = {}
+        for data, live in dumps:
+            for name, family_data in data.items():
+                family = families.get(name)
+                if family is None:
+                    family = MetricFamily.load(name, family_data)
+                    families[name] = family
+                family.merge(family_data, live)
+        return [families[name] for name in sorted(families)]
+
+    def render(self):
+        """ Return the aggregated metrics in the Prometheus text format. """
+        start = time.perf_counter()
+        text = render(self.collect())
+        logger.debug("Metrics rendered in %.2fms.",
+                     (time.perf_counter() - start) * 1000)
+        return text
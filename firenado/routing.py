@@ -0,0 +1,180 @@
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from heapq import merge
+import logging
+import re
+from tornado.routing import AnyMatches, PathMatches, Rule
+from tornado.web import _ApplicationRouter
+
+logger = logging.getLogger(__name__)
+
+ROUTER_TORNADO = "tornado"
+ROUTER_TRIE = "trie"
+ROUTERS = (ROUTER_TORNADO, ROUTER_TRIE)
+
+_REGEX_SPECIAL = frozenset(".^$*+?{}[]|()")
+_REGEX_QUANTIFIERS = frozenset("*+?{")
+
+
+def _has_top_level_alternation(pattern):
+    depth = 0
+    escaped = False
+    in_set = False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif in_set:
+            in_set = char != "]"
+        elif char == "[":
+            in_set = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return True
+    return False
+
+
+def literal_prefix(regex):
+    """ Return the literal text every path matched by the regex starts with.
+    Regexes with flags changing the matched text, like IGNORECASE, or with
+    a top level alternation have an empty prefix.
+
+    :param re.Pattern regex: The compiled path regex
+    :return str: The literal prefix
+    """
+    if regex.flags & (re.IGNORECASE | re.VERBOSE):
+        return ""
+    pattern = regex.pattern
+    if _has_top_level_alternation(pattern):
+        return ""
+    if pattern.startswith("^"):
+        pattern = pattern[1:]
+    prefix = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            if i + 1 >= len(pattern) or pattern[i + 1].isalnum():
+                break
+            char = pattern[i + 1]
+            i += 2
+        elif char in _REGEX_SPECIAL:
+            break
+        else:
+            i += 1
+        if i < len(pattern) and pattern[i] in _REGEX_QUANTIFIERS:
+            # The quantifier makes the last literal optional or repeated
+            break
+        prefix.append(char)
+    return "".join(prefix)
+
+
+class PrefixTrieRouter(_ApplicationRouter):
+    """ Application router placing rules in a trie by the literal prefix of
+    their path regexes. To find a handler only the rules along the request
+    path branch are matched, in the order they were added, so dispatch
+    resolves to the same handler Tornado's router would.
+
+    Rules added directly to the rules list, like Application.add_handlers
+    does, are indexed at the next dispatch.
+    """
+
+    def __init__(self, application, rules=None):
+        self._trie = None
+        self._indexed_rules = 0
+        super().__init__(application, rules)
+
+    def add_rules(self, rules):
+        super().add_rules(rules)
+        self._trie = None
+
+    def build_trie(self):
+        """ Index the router rules by the literal prefix of their paths.
+        Rules not matching paths are indexed at the root, being candidates
+        to every request.
+        """
+        trie = ([], {})
+        for index, rule in enumerate(self.rules):
+            prefix = ""
+            if isinstance(rule.matcher, PathMatches):
+                prefix = literal_prefix(rule.matcher.regex)
+            node = trie
+            for char in prefix:
+                children = node[1]
+                if char not in children:
+                    children[char] = ([], {})
+                node = children[char]
+            node[0].append(index)
+        self._trie = trie
+        self._indexed_rules = len(self.rules)
+        return trie
+
+    def candidate_rules(self, path):
+        """ Return the indexes of the rules with a prefix of the path, in
+        the order they were added.
+
+        :param str path: The request path
+        :return list: The candidate rule indexes
+        """
+        node = self._trie
+        if node is None or self._indexed_rules != len(self.rules):
+            node = self.build_trie()
+        branches = [node[0]]
+        for char in path:
+            node = node[1].get(char)
+            if node is None:
+                break
+            if node[0]:
+                branches.append(node[0])
+        if len(branches) == 1:
+            return branches[0]
+        return merge(*branches)
+
+    def find_handler(self, request, **kwargs):
+        rules = self.rules
+        for index in self.candidate_rules(request.path):
+            rule = rules[index]
+            target_params = rule.matcher.match(request)
+            if target_params is not None:
+                if rule.target_kwargs:
+                    target_params['target_kwargs'] = rule.target_kwargs
+                delegate = self.get_target_delegate(
+                    rule.target, request, **target_params)
+                if delegate is not None:
+                    return delegate
+        return None
+
+
+def install_router(application, router):
+    """ Replace the application wildcard router, the one resolving the
+    handlers of every host, by the router set in the app config.
+
+    :param tornado.web.Application application: The application
+    :param str router: The router name
+    """
+    if router is None or router == ROUTER_TORNADO:
+        return
+    if router != ROUTER_TRIE:
+        raise ValueError("Invalid router %s, expected one of: %s." % (
+            router, ", ".join(ROUTERS)))
+    logger.debug("Dispatching requests with the prefix trie router.")
+    application.wildcard_router = PrefixTrieRouter(
+        application, application.wildcard_router.rules)
+    application.default_router = _ApplicationRouter(
+        application, [Rule(AnyMatches(), application.wildcard_router)])
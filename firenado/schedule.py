@@ -15,8 +15,11 @@
 from .tornadoweb import TornadoComponent
 from cartola import config, exception, sysexits
 from datetime import datetime, timedelta
+import heapq
+import itertools
 import logging
 import sys
+import time
 import tornado.ioloop
 
 logger = logging.getLogger(__name__)
@@ -39,14 +42,17 @@ except ImportError:
     sys.exit(sysexits.EX_FATAL_ERROR)
 
 
-def next_from_cron(cron: str) -> datetime:
+def next_from_cron(cron: str, start: datetime = None) -> datetime:
     """ Return a datatetime object with the next execution based on the
-    informed cron string and the current time.
+    informed cron string and the start time, by default the current time.
 
     :param str cron: The cron string
+    :param datetime start: The time to start from
     :return datetime: A datetime object with the next execution
     """
-    iterator = croniter(cron, datetime.now())
+    if start is None:
+        start = datetime.now()
+    iterator = croniter(cron, start)
     return iterator.get_next(datetime)
 
 
@@ -57,10 +63,15 @@ class Scheduler(object):
         Scheduler constructor. It will receive a scheduled component and
         loop interval as parameters.
 
+        Jobs are kept in a heap by their next run time and a single IOLoop
+        timeout is set to the earliest one, so the scheduler does no work
+        between job runs. Jobs are scheduled again when their run ends.
+
         :param ScheduledTornadoComponent component: The scheduled component
         that owns the scheduler
         owns the scheduler.
-        :param int interval:
+        :param int interval: Kept for compatibility, jobs aren't polled
+        anymore.
         """
         self._can_run = False
         self._id = None
@@ -68,7 +79,14 @@ class Scheduler(object):
         self._interval = kwargs.get("interval", 1000)
         self._name = None
         self.component = component
-        self._periodic_callback = None
+        # Heap entries are [deadline, sequence, job], removed entries have
+        # the job set to None and are dropped when they reach the top
+        self._heap = []
+        self._entries = {}
+        self._sequence = itertools.count()
+        self._io_loop = None
+        self._timeout = None
+        self._timeout_deadline = None
 
     @property
     def app_component(self) -> TornadoComponent:
@@ -96,10 +114,19 @@ class Scheduler(object):
         """
         return self._can_run
 
+    @property
+    def running(self) -> bool:
+        return self._io_loop is not None
+
     def add_job(self, job):
         logger.debug("Adding job %s into the scheduler [id: %s, name: %s].",
                      job.id, self.id, self.name)
+        previous_job = self._jobs.get(job.id)
+        if previous_job is not None:
+            self.unschedule_job(previous_job)
         self._jobs[job.id] = job
+        if self.running:
+            self.schedule_job(job)
 
     def get_job(self, job_id):
         return self._jobs.get(job_id)
@@ -120,41 +147,95 @@ class Scheduler(object):
         if job is None:
             return None
         del self._jobs[job_id]
+        self.unschedule_job(job)
         return job.id
 
     def run(self):
         self.load_jobs()
-        logger.debug("Scheduler [id: %s, name: %s] interval set to %sms.",
-                     self.id, self.name, self._interval)
-        self._periodic_callback = tornado.ioloop.PeriodicCallback(
-            self._manage_jobs, self._interval)
-        self._periodic_callback.start()
-
-    def _manage_jobs(self):
-        logger.debug("Scheduler [id: %s, name: %s] managing jobs.", self.id,
-                     self.name)
-        logger.debug("Scheduler [id: %s, name: %s] stopping periodic "
-                     "callback.", self.id, self.name)
-        self._periodic_callback.stop()
+        self._io_loop = tornado.ioloop.IOLoop.current()
         for job in self.jobs:
-            if not job.already_scheduled:
-                logger.debug("Job %s from Scheduler [id: %s, name: %s] isn't "
-                             "scheduled yet.", job.hard_id, self.id, self.name)
-                if job.must_schedule:
-                    logger.debug("Job %s from Scheduler [id: %s, name: %s] "
-                                 "must be scheduled to run at %s.",
-                                 job.hard_id, self.id, self.name, job.next_run)
-                    job.schedule()
-            else:
-                logger.debug("Job %s from Scheduler [id: %s, name: %s] "
-                             "already scheduled.", job.hard_id, self.id,
-                             self.name)
-
-        logger.debug("Scheduler [id: %s, name: %s] ending of managing jobs.",
-                     self.id, self.name)
-        logger.debug("Scheduler [id: %s, name: %s] starting periodic "
-                     "callback.", self.id, self.name)
-        self._periodic_callback.start()
+            self.schedule_job(job)
+
+    def stop(self):
+        """ Stop running the jobs. Jobs running are not interrupted but
+        aren't scheduled again.
+        """
+        if self._timeout is not None:
+            self._io_loop.remove_timeout(self._timeout)
+        self._timeout = None
+        self._timeout_deadline = None
+        self._heap = []
+        self._entries = {}
+        self._io_loop = None
+
+    def schedule_job(self, job):
+        """ Push the job into the heap by its next run time, setting the
+        timeout if the job is the earliest one. Jobs without a next run in
+        the future aren't scheduled.
+
+        :param ScheduledJob job: The job to be scheduled
+        """
+        if job.id in self._entries:
+            return
+        planned_run = job.next_run
+        next_interval = (planned_run - datetime.now()).total_seconds()
+        if next_interval <= 0:
+            return
+        job._planned_run = planned_run
+        logger.debug("Job %s from Scheduler [id: %s, name: %s] scheduled to "
+                     "run at next interval of %sms.", job.hard_id, self.id,
+                     self.name, next_interval * 1000)
+        entry = [self._io_loop.time() + next_interval, next(self._sequence),
+                 job]
+        self._entries[job.id] = entry
+        heapq.heappush(self._heap, entry)
+        self._set_timeout()
+
+    def unschedule_job(self, job):
+        """ Remove the job from the heap. The entry is marked as removed and
+        dropped once it reaches the top of the heap.
+
+        :param ScheduledJob job: The job to be removed
+        """
+        entry = self._entries.get(job.id)
+        if entry is not None and entry[2] is job:
+            del self._entries[job.id]
+            entry[2] = None
+
+    def _set_timeout(self):
+        heap = self._heap
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+        if not heap:
+            return
+        deadline = heap[0][0]
+        if (self._timeout is not None and
+                self._timeout_deadline <= deadline):
+            return
+        if self._timeout is not None:
+            self._io_loop.remove_timeout(self._timeout)
+        self._timeout_deadline = deadline
+        self._timeout = self._io_loop.call_at(deadline, self._run_jobs)
+
+    def _run_jobs(self):
+        """ Run the jobs due, called by the scheduler timeout. """
+        self._timeout = None
+        self._timeout_deadline = None
+        now = self._io_loop.time()
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, _, job = heapq.heappop(heap)
+            if job is None:
+                continue
+            del self._entries[job.id]
+            self._io_loop.add_callback(self._run_job, job)
+        self._set_timeout()
+
+    async def _run_job(self, job):
+        await job._run_job()
+        # Scheduled again unless removed or the scheduler stopped
+        if self.running and self._jobs.get(job.id) is job:
+            self.schedule_job(job)
 
 
 class ConfScheduler(Scheduler):
@@ -244,7 +325,9 @@ class ScheduledJob(object):
         self._date = kwargs.get('date')
         self._cron = kwargs.get('cron')
         self._interval = kwargs.get('interval')
-        self._periodic_callback = None
+        # When the job was planned to run last time it was scheduled
+        self._planned_run = None
+        self._running = False
 
     @property
     def component(self) -> "ScheduledTornadoComponent":
@@ -276,14 +359,18 @@ class ScheduledJob(object):
 
     @property
     def already_scheduled(self):
-        return self._periodic_callback is not None
+        return self._running or self.id in self._scheduler._entries
 
     @property
     def next_run(self):
         if self._interval:
             return datetime.now() + timedelta(milliseconds=self._interval)
         if self._cron:
-            return next_from_cron(self.cron)
+            start = datetime.now()
+            # A job ending before its planned time must not run twice
+            if self._planned_run is not None and self._planned_run > start:
+                start = self._planned_run
+            return next_from_cron(self.cron, start)
         # TODO: run if date is defined
         return datetime.now() + timedelta(days=-356)
 
@@ -298,22 +385,17 @@ class ScheduledJob(object):
         return self.next_interval > 0
 
     def schedule(self):
-        next_interval = self.next_interval
-        logger.debug("Job %s from Scheduler [id: %s, name: %s] scheduled to "
-                     "run at next interval of %sms.", self.hard_id,
-                     self._scheduler.id, self._scheduler.name,
-                     self.next_interval)
-        self._periodic_callback = tornado.ioloop.PeriodicCallback(
-            self._run_job, next_interval)
-        self._periodic_callback.start()
+        self._scheduler.schedule_job(self)
 
     async def _run_job(self):
         """ Run the job
         :return None:
         """
-        self._periodic_callback.stop()
+        self._running = True
         logger.debug("Running job %s from Scheduler [id: %s, name: %s].",
                      self.hard_id, self._scheduler.id, self._scheduler.name)
+        start = time.perf_counter()
+        error = False
         try:
             future = self.run()
             if future:
@@ -322,14 +404,19 @@ class ScheduledJob(object):
                              self._scheduler.id, self._scheduler.name)
                 await future
         except:
+            error = True
             logger.error("A non handled exception was cough while running the "
                          "job %s:", self.hard_id,
                          exc_info=exception.full_exc_info())
             logger.error("Please handle the exception to fix the job "
                          "execution and avoid breaking the scheduler.")
-        logger.debug("Job %s removed from Scheduler [id: %s, name: %s]",
+        metrics = getattr(self.component.application, "metrics", None)
+        if metrics is not None:
+            metrics.observe_job("%s.%s" % (self._scheduler.id, self.id),
+                                time.perf_counter() - start, error)
+        logger.debug("Job %s ran from Scheduler [id: %s, name: %s]",
                      self.hard_id, self._scheduler.id, self._scheduler.name)
-        self._periodic_callback = None
+        self._running = False
         return
 
     def run(self):
@@ -388,6 +475,10 @@ class ScheduledTornadoComponent(TornadoComponent):
     def schedule_conf(self):
         return self.conf
 
+    def shutdown(self):
+        for scheduler in self.schedulers:
+            scheduler.stop()
+
     def initialize(self):
         if self.has_conf:
             logger.debug("Configuration file found. Starting scheduled "
@@ -249,6 +249,7 @@ def authenticated(method):
                 self.session.set('next_url', self.request.uri)
             kwargs['url'] = url
             return authenticate(self, *args, **kwargs)
+        wrapper._firenado_authenticated = True
         return wrapper
     else:
         def f_wrapper(par_method):
@@ -261,6 +262,7 @@ def authenticated(method):
                 kwargs['wrapped_method'] = par_method
                 kwargs['url'] = url
                 return authenticate(self, *args, **kwargs)
+            parametrized_wrapper._firenado_authenticated = True
             return parametrized_wrapper
         return f_wrapper
 
@@ -18,10 +18,26 @@ from .sqlalchemy import with_session
 import functools
 import importlib
 import logging
+import threading
 
 
 logger = logging.getLogger(__name__)
 
+# Service scopes used by with_service to decide where a service instance is
+# kept. A request scoped service is created for each consumer(usually a
+# handler, so once per request), an application scoped service is created
+# once and stored on the data connected instance(the TornadoApplication) and
+# a component scoped service is created once per TornadoComponent.
+SCOPE_APPLICATION = "application"
+SCOPE_COMPONENT = "component"
+SCOPE_REQUEST = "request"
+
+SCOPES = (SCOPE_APPLICATION, SCOPE_COMPONENT, SCOPE_REQUEST)
+
+# Guards the creation of shared(application and component scoped) services
+# when consumers are running outside the ioloop thread, like in executors.
+_scoped_services_lock = threading.Lock()
+
 
 class FirenadoService:
     """ Base class to handle services. A Firenado service is usually connected
@@ -29,8 +45,16 @@ class FirenadoService:
     The developer can add extra configuration using the configuration_service
     method and can get a data source from the data connected instance using
     either get_data_sources or get_data_source methods.
+
+    The scope class attribute defines how with_service will keep instances
+    of the service. See SCOPE_APPLICATION, SCOPE_COMPONENT and SCOPE_REQUEST.
+    Application and component scoped services are shared between consumers,
+    so they must not keep request state and must be safe to be used by
+    concurrent coroutines.
     """
 
+    scope = SCOPE_REQUEST
+
     def __init__(self, consumer, data_source=None):
         self.consumer = consumer
         self.data_source = data_source
@@ -64,15 +88,137 @@ class FirenadoService:
 
         :return: The data connected object in the top of the hierarchy.
         """
-        if self.consumer is None:
-            return None
-        from firenado.data import DataConnectedMixin
-        if isinstance(self.consumer, DataConnectedMixin):
-            return self.consumer
-        invert_op = getattr(self.consumer, "get_data_connected", None)
-        if callable(invert_op):
-            return self.consumer.get_data_connected()
-        return self.consumer.data_connected
+        return get_data_connected(self.consumer)
+
+
+def get_data_connected(consumer):
+    """ Resolve the data connected instance of a service consumer. If the
+    consumer has no data connected instance returns None.
+
+    :param consumer: A service consumer
+    :return: The data connected object in the top of the hierarchy.
+    """
+    if consumer is None:
+        return None
+    from firenado.data import DataConnectedMixin
+    if isinstance(consumer, DataConnectedMixin):
+        return consumer
+    invert_op = getattr(consumer, "get_data_connected", None)
+    if callable(invert_op):
+        return consumer.get_data_connected()
+    return getattr(consumer, "data_connected", None)
+
+
+def get_component(consumer):
+    """ Resolve the component of a service consumer walking up the consumer
+    hierarchy. If no component is found returns None.
+
+    :param consumer: A service consumer
+    :return: The TornadoComponent related to the consumer
+    """
+    from firenado.tornadoweb import TornadoComponent
+    while consumer is not None:
+        if isinstance(consumer, TornadoComponent):
+            return consumer
+        component = getattr(consumer, "component", None)
+        if component is not None:
+            return component
+        consumer = getattr(consumer, "consumer", None)
+    return None
+
+
+def get_service_holder(consumer, scope):
+    """ Return the object that holds service instances for the given scope.
+    The consumer itself is the holder for request scoped services.
+    Application scoped services are held by the data connected instance and
+    component scoped services by the consumer's component. If the holder
+    cannot be resolved the consumer is returned.
+
+    :param consumer: A service consumer
+    :param str scope: The service scope
+    :return: The object holding the service instance
+    """
+    if scope not in SCOPES:
+        raise ValueError("Invalid service scope \"%s\". Valid scopes are: "
+                         "%s." % (scope, ", ".join(SCOPES)))
+    holder = None
+    if scope == SCOPE_APPLICATION:
+        holder = get_data_connected(consumer)
+    elif scope == SCOPE_COMPONENT:
+        holder = get_component(consumer)
+    if holder is None:
+        if scope != SCOPE_REQUEST:
+            logger.debug("It was not possible to resolve the %s holding %s "
+                         "scoped services. Using the consumer %s instead.",
+                         scope, scope, consumer)
+        return consumer
+    return holder
+
+
+def get_scoped_services(holder):
+    """ Return the dict of shared service instances held by an object, keyed
+    by service class.
+
+    :param holder: The object holding shared services
+    :return dict: Service instances held by the object
+    """
+    if not hasattr(holder, "__scoped_services"):
+        setattr(holder, "__scoped_services", {})
+    return getattr(holder, "__scoped_services")
+
+
+def get_service_instance(service_class, consumer, scope=None):
+    """ Return an instance of the service class for the consumer. A request
+    scoped service is always a new instance, application and component scoped
+    services are created once and reused by all consumers sharing the same
+    holder.
+
+    :param service_class: The service class
+    :param consumer: The service consumer
+    :param str scope: The service scope. If None the service class scope is
+    used.
+    :return FirenadoService: The service instance
+    """
+    if scope is None:
+        scope = getattr(service_class, "scope", SCOPE_REQUEST)
+    holder = get_service_holder(consumer, scope)
+    if holder is consumer:
+        return service_class(consumer)
+    services = get_scoped_services(holder)
+    service_instance = services.get(service_class)
+    if service_instance is None:
+        with _scoped_services_lock:
+            service_instance = services.get(service_class)
+            if service_instance is None:
+                logger.debug("Creating %s scoped service %s.%s.", scope,
+                             service_class.__module__,
+                             service_class.__name__)
+                service_instance = service_class(holder)
+                services[service_class] = service_instance
+    return service_instance
+
+
+def service_attribute_name(service_name):
+    """ Convert a service class name to the snake cased attribute name used
+    by with_service.
+
+    :param str service_name: The service class name
+    :return str: The attribute name
+    """
+    service_attribute = ''
+    first = True
+    for s in service_name:
+        if s.isupper():
+            if first:
+                service_attribute = ''.join([
+                    service_attribute, s.lower()])
+            else:
+                service_attribute = ''.join([
+                    service_attribute, '_', s.lower()])
+        else:
+            service_attribute = ''.join([service_attribute, s])
+        first = False
+    return service_attribute
 
 
 def served_by(service, attribute_name=None):
@@ -84,13 +230,26 @@ def served_by(service, attribute_name=None):
     return with_service(service, attribute_name)
 
 
-def with_service(service, attribute_name=None):
+def with_service(service, attribute_name=None, scope=None):
     """ Decorator that connects a service to a service consumer.
+
+    The service instance is resolved according to the scope. If scope isn't
+    informed the scope defined in the service class is used, that is request
+    by default, meaning a new instance per consumer.
+
+    :param service: The service class or its full name as string
+    :param str attribute_name: The consumer attribute to set the service to.
+    Default is the snake cased service class name.
+    :param str scope: One of SCOPE_APPLICATION, SCOPE_COMPONENT or
+    SCOPE_REQUEST
     """
+    if scope is not None and scope not in SCOPES:
+        raise ValueError("Invalid service scope \"%s\". Valid scopes are: "
+                         "%s." % (scope, ", ".join(SCOPES)))
+    resolved = {}
 
-    def f_wrapper(method):
-        @functools.wraps(method)
-        def wrapper(self, *args, **kwargs):
+    def resolve_service():
+        if not resolved:
             if isinstance(service, str):
                 service_x = service.split('.')
                 service_module = importlib.import_module(
@@ -100,30 +259,21 @@ def with_service(service, attribute_name=None):
             else:
                 service_class = service
                 service_name = service.__name__
-            service_attribute = ''
             if attribute_name is None:
-                first = True
-                for s in service_name:
-                    if s.isupper():
-                        if first:
-                            service_attribute = ''.join([
-                                service_attribute, s.lower()])
-                        else:
-                            service_attribute = ''.join([
-                                service_attribute, '_', s.lower()])
-                    else:
-                        service_attribute = ''.join([service_attribute, s])
-                    first = False
+                service_attribute = service_attribute_name(service_name)
             else:
                 service_attribute = attribute_name
-            must_set_service = False
-            if not hasattr(self, service_attribute):
-                must_set_service = True
-            else:
-                if getattr(self, service_attribute) is None:
-                    must_set_service = True
-            if must_set_service:
-                setattr(self, service_attribute, service_class(self))
+            resolved['class'] = service_class
+            resolved['attribute'] = service_attribute
+        return resolved['class'], resolved['attribute']
+
+    def f_wrapper(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            service_class, service_attribute = resolve_service()
+            if getattr(self, service_attribute, None) is None:
+                setattr(self, service_attribute, get_service_instance(
+                    service_class, self, scope))
             return method(self, *args, **kwargs)
 
         return wrapper
@@ -17,6 +17,7 @@
 import functools
 import logging
 import os
+import time
 
 import tornado
 import tornado.ioloop
@@ -80,7 +81,14 @@ class SessionEngine(object):
     async def get_session(self, request_handler):
         """Returns a valid session object. This session is handler by the
         session handler defined on the application configuration. """
+        return self.load_session(request_handler)
+
+    def load_session(self, request_handler):
+        """Reads the session from the session handler, renewing it if the
+        request has no valid session id. Used by get_session and by the
+        LazySession at the first access."""
         if firenado.conf.session['enabled']:
+            start = time.perf_counter()
             session = Session(self)
             cookie_created_on_request = False
             session_id = SessionHandler.get_session_id_cookie(request_handler)
@@ -100,12 +108,17 @@ class SessionEngine(object):
                 session_data = self.decode_session_data(
                     self.session_handler.read_stored_session(session_id))
                 session = Session(self, session_data, session_id)
+            self.observe_backend("read", start)
             return session
 
     async def store_session(self, request_handler):
         """Sends the session data to be stored by the session handler defined
         on the application configuration. """
         if firenado.conf.session['enabled']:
+            # A lazy session never accessed has nothing to be stored
+            if (isinstance(request_handler.session, LazySession) and
+                    not request_handler.session.loaded):
+                return
             session_id = request_handler.session.id
             # If session was destroyed than we're going to handle it
             # differently
@@ -117,16 +130,31 @@ class SessionEngine(object):
                         request_handler.session.get_data())
                     params = request_handler.session.get_params()
                     if request_handler.session.is_changed():
+                        start = time.perf_counter()
                         self.session_handler.write_stored_session(
                             session_id,
                             encoded_session_data,
                             **params
                         )
+                        self.observe_backend("write", start)
                 else:
                     # Generating a new session
                     logger.debug("Dispatching session %s destruction to the "
                                  "session handler.", session_id)
+                    start = time.perf_counter()
                     self.session_handler.destroy_stored_session(session_id)
+                    self.observe_backend("destroy", start)
+
+    def observe_backend(self, operation, start):
+        """ Observe the session backend operation latency in the session
+        aware instance metrics, if any.
+
+        :param str operation: The backend operation
+        :param float start: The operation start from time.perf_counter
+        """
+        metrics = getattr(self.session_aware_instance, "metrics", None)
+        if metrics is not None:
+            metrics.observe_session(operation, time.perf_counter() - start)
 
     def encode_session_data(self, data):
         return self.session_encoder.encode(data)
@@ -249,6 +277,49 @@ class Session(object):
         self.__changed = True
 
 
+class LazySession:
+    """ Session proxy reading the session from the session engine only when
+    one of its attributes is accessed for the first time. A session never
+    accessed during the request is not stored.
+
+    If the request has no session cookie the session is created at the first
+    access. Accessing it for the first time after the response headers were
+    sent will create a session the client won't get the cookie of.
+    """
+
+    def __init__(self, engine, request_handler):
+        self._engine = engine
+        self._request_handler = request_handler
+        self._session = None
+
+    @property
+    def loaded(self):
+        """ Returns if the session was read from the session engine """
+        return self._session is not None
+
+    def load(self):
+        """ Returns the proxied session, reading it from the session engine
+        if not loaded yet. """
+        if self._session is None:
+            from .instrumentation import timing_span
+            with timing_span(self._request_handler, "session_read"):
+                self._session = self._engine.load_session(
+                    self._request_handler)
+            logger.debug("Lazily reading session %s.", self._session.id)
+        return self._session
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            super().__setattr__(name, value)
+        else:
+            setattr(self.load(), name, value)
+
+
 class SessionDestroyedError(tornado.web.HTTPError):
 
     def __init__(self, status_code=500, log_message=None, *args, **kwargs):
@@ -352,13 +423,56 @@ def create_session_engine(obj, session_engine_attribute, session_engine_class):
     return getattr(obj, session_engine_attribute)
 
 
+def skip(method):
+    """ Decorate a handler method to handle its requests without reading or
+    writing the session. The handler session will be None.
+
+    To skip the session for every method of a handler set its
+    session_enabled attribute to False.
+    """
+    method._firenado_session = False
+    return method
+
+
+def is_session_used(handler):
+    """ Returns if the session is read and written for the request being
+    handled, what is true unless the handler or the requested method opted
+    out of the session.
+
+    :param handler: The request handler
+    :return bool: True if the handler uses the session
+    """
+    if not getattr(handler, "session_enabled", True):
+        return False
+    method = getattr(handler, handler.request.method.lower(), None)
+    return getattr(method, "_firenado_session", True)
+
+
+def is_session_lazy(handler):
+    """ Returns if the handler session is a LazySession. The handler
+    session_lazy attribute, if not None, overrides the session lazy conf.
+
+    :param handler: The request handler
+    :return bool: True if the session is read at the first access
+    """
+    lazy = getattr(handler, "session_lazy", None)
+    if lazy is None:
+        return firenado.conf.session['lazy']
+    return lazy
+
+
 def read(method):
     @functools.wraps(method)
     async def wrapper(self, *args, **kwargs):
-        if firenado.conf.session['enabled']:
-            session = await self.application.session_engine.get_session(self)
-            self.session = session
-            logging.debug("Reading session %s." % self.session.id)
+        if firenado.conf.session['enabled'] and is_session_used(self):
+            engine = self.application.session_engine
+            if is_session_lazy(self):
+                self.session = LazySession(engine, self)
+            else:
+                from .instrumentation import timing_span
+                with timing_span(self, "session_read"):
+                    self.session = await engine.get_session(self)
+                logging.debug("Reading session %s." % self.session.id)
         return method(self, *args, **kwargs)
     return wrapper
 
@@ -368,16 +482,31 @@ def write(method):
     def wrapper(self, *args, **kwargs):
         async def write_session_callback():
             logging.debug("Writing session %s." % self.session.id)
-            await self.application.session_engine.store_session(self)
+            timing = getattr(self, "request_timing", None)
+            if timing is None:
+                await self.application.session_engine.store_session(self)
+                return
+            # The timing is recorded after the session is written
+            try:
+                with timing.span("session_write"):
+                    await self.application.session_engine.store_session(
+                        self)
+            finally:
+                timing.release()
 
         retval = method(self, *args, **kwargs)
-        if firenado.conf.session['enabled']:
-            if self.session is None:
+        if firenado.conf.session['enabled'] and is_session_used(self):
+            if (isinstance(self.session, LazySession) and
+                    not self.session.loaded):
+                logging.debug("Session not accessed, skipping the write.")
+            elif self.session is None:
                 logging.error("The handler session is None. Something wrong"
                               " happened during the handler execution. The"
                               " current handler status is: %s." %
                               self.get_status())
             else:
+                if getattr(self, "request_timing", None) is not None:
+                    self.request_timing.hold()
                 tornado.ioloop.IOLoop.current().add_callback(
                     callback=write_session_callback
                 )
@@ -12,14 +12,55 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import base64
+import binascii
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
 import functools
 from inspect import isfunction, ismethod
+from itertools import islice
+import json
 import logging
-from sqlalchemy import inspect, func, text
+from operator import attrgetter, itemgetter
+import os
+import re
+from sqlalchemy import (and_, false, inspect, insert, func, literal, or_,
+                        select, text, tuple_, Row, Table)
+from sqlalchemy.orm.exc import UnmappedColumnError
+from sqlalchemy.sql import operators
+import threading
+import time
+from uuid import UUID
 
 logger = logging.getLogger(__name__)
 
 
+# Bounded, as callers may build the columns informed dynamically
+@functools.lru_cache(maxsize=256)
+def _column_keys(mapped_class, columns):
+    column_attrs = inspect(mapped_class).column_attrs
+    if columns is None:
+        return tuple(c.key for c in column_attrs)
+    columns = frozenset(columns)
+    return tuple(c.key for c in column_attrs if c.key in columns)
+
+
+def column_keys(mapped_class, columns=None):
+    """ Return the column attribute keys of a mapped class in the mapper
+    order. If columns is provided only the keys in columns are returned.
+    Results are cached per mapped class and columns, up to the 256 most
+    recently used, so the mapper isn't inspected on every call.
+
+    :param mapped_class: A class inherited from Base
+    :param columns: Columns to be returned
+    :return tuple: The column attribute keys
+    """
+    if columns is not None:
+        columns = tuple(columns)
+    return _column_keys(mapped_class, columns)
+
+
 def base_to_dict(base, columns=None):
     """ Returns a dict inherited from Base. If keys is provided it will only
     add to the dict the columns provided.
@@ -27,66 +68,834 @@ def base_to_dict(base, columns=None):
     :param columns: Columns to be added to the dict
     :return dict: A dictionary representing the Base object.
     """
+    return {key: getattr(base, key)
+            for key in column_keys(type(base), columns)}
+
+
+def _object_converter(mapped_class, columns):
+    keys = column_keys(mapped_class, columns)
+    if not keys:
+        return lambda obj: {}
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda obj: {key: getattr(obj, key)}
+    getter = attrgetter(*keys)
+    return lambda obj: dict(zip(keys, getter(obj)))
+
+
+def _row_converter(row, columns):
+    """ Return a function converting rows like the one provided to dicts.
+    Rows with only a mapped object, returned by orm selects, are converted
+    using the object columns.
+    """
+    if len(row) == 1 and inspect(row[0], raiseerr=False) is not None:
+        convert = _object_converter(type(row[0]), columns)
+        return lambda _row: convert(_row[0])
+    fields = row._fields
     if columns is None:
-        return {c.key: getattr(base, c.key)
-                for c in inspect(base).mapper.column_attrs}
-    return {c.key: getattr(base, c.key)
-            for c in inspect(base).mapper.column_attrs if c.key in columns}
+        return lambda _row: dict(zip(fields, _row))
+    columns = frozenset(columns)
+    indexes = [i for i, field in enumerate(fields) if field in columns]
+    fields = tuple(fields[i] for i in indexes)
+    if not fields:
+        return lambda _row: {}
+    if len(fields) == 1:
+        field, index = fields[0], indexes[0]
+        return lambda _row: {field: _row[index]}
+    getter = itemgetter(*indexes)
+    return lambda _row: dict(zip(fields, getter(_row)))
+
+
+def _iter_rows_to_dicts(rows, columns):
+    converters = {}
+    for row in rows:
+        row_type = type(row)
+        convert = converters.get(row_type)
+        if convert is None:
+            if isinstance(row, Row):
+                convert = _row_converter(row, columns)
+            else:
+                convert = _object_converter(row_type, columns)
+            converters[row_type] = convert
+        yield convert(row)
+
+
+def rows_to_dicts(rows, columns=None, **kwargs):
+    """ Convert orm objects inherited from Base or core rows to dicts. The
+    attribute getters are resolved once per row type instead of once per row,
+    making it faster than calling base_to_dict for each object of a result.
+
+    Rows can be any iterable of orm objects or rows, like a list, a
+    sqlalchemy Result or a ScalarResult. Rows containing only an orm object
+    are converted using the object columns.
+
+    :param rows: An iterable of orm objects or rows
+    :param columns: Columns to be added to the dicts
+    :key bool generator: If True return a generator yielding dicts instead of
+    a list, so the converted rows aren't held in memory. Default is False.
+    :return list: A list(or generator) of dicts
+    """
+    dicts = _iter_rows_to_dicts(rows, columns)
+    if kwargs.get("generator", False):
+        return dicts
+    return list(dicts)
+
+
+def _resolve_table(entity):
+    """ Return the table of a mapped class or the entity itself if it is
+    already a table.
+    """
+    mapper = inspect(entity, raiseerr=False)
+    if mapper is not None and hasattr(mapper, "local_table"):
+        return mapper.local_table
+    return entity
+
+
+def _row_to_values(row):
+    """ Return the values to be inserted from a dict or a mapped object.
+    Only attributes set in a mapped object will be returned, so server
+    defaults and autoincrement columns are left to the database.
+    """
+    if isinstance(row, dict):
+        return row
+    state = inspect(row)
+    values = {}
+    for attr in state.mapper.column_attrs:
+        if attr.key in state.dict:
+            values[attr.columns[0].key] = state.dict[attr.key]
+    return values
+
+
+def _chunks(rows, chunk_size):
+    iterator = iter(rows)
+    while True:
+        chunk = [_row_to_values(row) for row in islice(iterator, chunk_size)]
+        if not chunk:
+            return
+        yield chunk
+
+
+def _execute_chunks(session, table, rows, build_statement, **kwargs):
+    """ Execute a statement for each chunk of rows in its own transaction.
+    The statement is built by build_statement from the first row of the
+    first chunk and reused by the following chunks.
+
+    As the session is committed after each chunk, changes already pending in
+    the session would be committed with the first chunk or rolled back with
+    a failing chunk, so the session must have no pending changes.
+    """
+    if session.new or session.dirty or session.deleted:
+        raise ValueError("The session has pending changes, commit or roll "
+                         "them back before writing rows into %s in "
+                         "chunks." % table.name)
+    chunk_size = max(kwargs.get("chunk_size", 1000), 1)
+    handle_progress = kwargs.get("handle_progress")
+    statement = None
+    total = 0
+    start = time.perf_counter()
+    for chunk in _chunks(rows, chunk_size):
+        if statement is None:
+            statement = build_statement(chunk[0])
+        try:
+            session.execute(statement, chunk)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        total += len(chunk)
+        elapsed = time.perf_counter() - start
+        logger.debug("%s rows written into %s in %.3fs.", total, table.name,
+                     elapsed)
+        if handle_progress is not None:
+            handle_progress(total, elapsed)
+    elapsed = time.perf_counter() - start
+    logger.debug("Wrote %s rows into %s in %.3fs (%.0f rows/s).", total,
+                 table.name, elapsed, total / elapsed if elapsed else 0)
+    return total
+
+
+def bulk_insert(session, entity, rows, **kwargs):
+    """ Insert rows into a table using executemany style inserts. Rows are
+    inserted in chunks, each chunk is committed in its own transaction.
+
+    All rows must have the same keys. When rows are mapped objects, only
+    attributes set in the objects will be inserted.
+
+    The session is committed after each chunk, so it must have no pending
+    changes, otherwise they'd be committed with the rows.
+
+    :param session: A sqlalchemy session
+    :param entity: A mapped class or a table
+    :param rows: An iterable of dicts or mapped objects
+    :key int chunk_size: Rows inserted per transaction. Default is 1000.
+    :key handle_progress: Function called after each chunk is committed with
+    the number of rows written and the elapsed time in seconds.
+    :return int: The number of rows inserted
+    :raise ValueError: If the session has pending changes
+    """
+    table = _resolve_table(entity)
+    return _execute_chunks(session, table, rows,
+                           lambda first_row: insert(table), **kwargs)
+
+
+def bulk_upsert(session, entity, rows, index_elements, update_columns=None,
+                **kwargs):
+    """ Insert rows into a table updating the ones conflicting with existing
+    rows. Rows are written in chunks, each chunk is committed in its own
+    transaction.
+
+    PostgreSQL and SQLite use ON CONFLICT and MySQL/MariaDB use ON DUPLICATE
+    KEY UPDATE. If update_columns is an empty list conflicting rows will be
+    ignored instead. As in bulk_insert, the session must have no pending
+    changes.
+
+    :param session: A sqlalchemy session
+    :param entity: A mapped class or a table
+    :param rows: An iterable of dicts or mapped objects
+    :param list index_elements: Columns identifying a conflict. Ignored by
+    MySQL, that uses the table unique keys.
+    :param list update_columns: Columns to be updated on conflict. Default
+    is all columns informed in the rows except index_elements.
+    :key int chunk_size: Rows written per transaction. Default is 1000.
+    :key handle_progress: See bulk_insert.
+    :return int: The number of rows written
+    :raise ValueError: If the session dialect doesn't support upserts or
+    the session has pending changes
+    """
+    table = _resolve_table(entity)
+    dialect = session.get_bind().dialect.name
+    if dialect not in ("postgresql", "sqlite", "mysql", "mariadb"):
+        raise ValueError("Upsert isn't supported by the %s dialect, expected "
+                         "one of: postgresql, sqlite, mysql, mariadb." %
+                         dialect)
+
+    def build_statement(first_row):
+        columns = update_columns
+        if columns is None:
+            columns = [key for key in first_row if key not in index_elements]
+        if dialect in ("postgresql", "sqlite"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert as d_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as d_insert
+            statement = d_insert(table)
+            if not columns:
+                return statement.on_conflict_do_nothing(
+                    index_elements=index_elements)
+            return statement.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={column: statement.excluded[column]
+                      for column in columns})
+        from sqlalchemy.dialects.mysql import insert as d_insert
+        statement = d_insert(table)
+        if not columns:
+            return statement.prefix_with("IGNORE")
+        return statement.on_duplicate_key_update(
+            {column: statement.inserted[column] for column in columns})
+
+    return _execute_chunks(session, table, rows, build_statement, **kwargs)
 
 
-def fast_count(query):
+class CountCache:
+    """ In process cache of counts keyed by the database url, the compiled
+    count statement and its parameters. Counts expire after ttl seconds and
+    the least recently used counts are discarded when the cache reaches
+    max_size.
     """
+
+    def __init__(self, ttl=60, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+    def get(self, key):
+        """ Return the count cached with the key or None if the count isn't
+        cached or is expired.
+        """
+        with self._lock:
+            cached = self._counts.get(key)
+            if cached is None:
+                return None
+            count, expires = cached
+            if expires <= time.monotonic():
+                del self._counts[key]
+                return None
+            self._counts.move_to_end(key)
+            return count
+
+    def set(self, key, count):
+        with self._lock:
+            self._counts[key] = (count, time.monotonic() + self.ttl)
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.max_size:
+                self._counts.popitem(last=False)
+
+    @staticmethod
+    def statement_key(statement, bind):
+        """ Return a cache key for a statement executed by the bind, so data
+        sources of different databases running the same statement don't
+        share counts.
+
+        :param statement: The statement
+        :param bind: The engine or connection executing the statement
+        :return tuple: The cache key
+        """
+        compiled = statement.compile(dialect=bind.dialect)
+        return (bind.engine.url.render_as_string(hide_password=True),
+                str(compiled), repr(sorted(compiled.params.items())))
+
+
+# Count cache used by fast_count when cache is True
+count_cache = CountCache()
+
+
+def estimated_count(session, table):
+    """ Return the row count estimated by the database statistics for a
+    table. Supported by PostgreSQL(pg_class.reltuples) and MySQL/MariaDB
+    (information_schema.tables.table_rows). Returns None if the dialect
+    isn't supported or the table has no statistics.
+
+    :param session: A sqlalchemy session
+    :param table: A table or mapped class
+    :return int: The estimated row count
+    """
+    table = _resolve_table(table)
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        name = table.name if table.schema is None else "%s.%s" % (
+            table.schema, table.name)
+        estimate = session.execute(text(
+            "SELECT reltuples::bigint FROM pg_class "
+            "WHERE oid = to_regclass(:name)"), {'name': name}).scalar()
+    elif dialect in ("mysql", "mariadb"):
+        schema_filter = "table_schema = DATABASE()"
+        parameters = {'name': table.name}
+        if table.schema is not None:
+            schema_filter = "table_schema = :schema"
+            parameters['schema'] = table.schema
+        estimate = session.execute(text(
+            "SELECT table_rows FROM information_schema.tables "
+            "WHERE %s AND table_name = :name" % schema_filter),
+            parameters).scalar()
+    else:
+        return None
+    # PostgreSQL returns -1 for tables never analyzed
+    if estimate is None or estimate < 0:
+        return None
+    return int(estimate)
+
+
+def _is_plain_select(statement):
+    """ Returns if the statement rows map to the rows of its froms, without
+    grouping, distinct, limit or offset.
+    """
+    return not (getattr(statement, "_group_by_clauses", None) or
+                getattr(statement, "_having_criteria", None) or
+                getattr(statement, "_distinct", False) or
+                getattr(statement, "_limit_clause", None) is not None or
+                getattr(statement, "_offset_clause", None) is not None)
+
+
+def fast_count(query, **kwargs):
+    """ Count the rows returned by a query without loading them, removing
+    the columns and ordering from the query statement. Statements with
+    grouping, distinct, limit or offset are counted from a subquery.
+
+    Counts can be cached by the database, statement and parameters. For
+    unfiltered queries on a single table, the database statistics can be
+    used instead of a table scan if the estimated count is bigger than
+    estimate_threshold.
+
     based on https://gist.github.com/hest/8798884
-    :return:
+
+    :param query: A sqlalchemy query or a select statement
+    :key session: The session to execute a select statement. Not needed if
+    query is a sqlalchemy query.
+    :key cache: A CountCache or True to use the module count cache. Default
+    is None, no cache.
+    :key int estimate_threshold: Estimated counts bigger than this value are
+    returned instead of an exact count. Default is None, no estimation.
+    :return int: The query count
     """
-    count_statement = query.statement.with_only_columns(
-        [func.count()]).order_by(None)
-    count = query.session.execute(count_statement).scalar()
+    session = kwargs.get("session")
+    cache = kwargs.get("cache")
+    estimate_threshold = kwargs.get("estimate_threshold")
+    statement = query
+    if hasattr(query, "statement"):
+        statement = query.statement
+        if session is None:
+            session = query.session
+    if cache is True:
+        cache = count_cache
+    plain = _is_plain_select(statement)
+    if plain:
+        count_statement = statement.with_only_columns(
+            func.count(), maintain_column_froms=True).order_by(None)
+    else:
+        count_statement = select(func.count()).select_from(
+            statement.order_by(None).subquery())
+    key = None
+    if cache:
+        key = CountCache.statement_key(count_statement, session.get_bind())
+        count = cache.get(key)
+        if count is not None:
+            return count
+    count = None
+    if (estimate_threshold is not None and plain and
+            statement.whereclause is None):
+        froms = statement.get_final_froms()
+        if len(froms) == 1 and isinstance(froms[0], Table):
+            count = estimated_count(session, froms[0])
+            if count is not None and count <= estimate_threshold:
+                count = None
+    if count is None:
+        count = session.execute(count_statement).scalar()
+    if cache:
+        cache.set(key, count)
     return count
 
 
-def run_script(script_path, session, handle_command=None, handle_line=None):
+def _encode_cursor_value(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'$d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'$dec': str(value)}
+    if isinstance(value, UUID):
+        return {'$uuid': str(value)}
+    return value
+
+
+def _decode_cursor_value(value):
+    if isinstance(value, dict):
+        if '$dt' in value:
+            return datetime.fromisoformat(value['$dt'])
+        if '$d' in value:
+            return date.fromisoformat(value['$d'])
+        if '$dec' in value:
+            return Decimal(value['$dec'])
+        if '$uuid' in value:
+            return UUID(value['$uuid'])
+    return value
+
+
+def encode_cursor(values, backwards=False):
+    """ Encode the ordering values of a row as an opaque url safe cursor.
+
+    :param values: The row values of the keyset ordering columns
+    :param bool backwards: If True the cursor points to rows before the row
+    :return str: The cursor
+    """
+    data = {'v': [_encode_cursor_value(value) for value in values],
+            'b': backwards}
+    return base64.urlsafe_b64encode(json.dumps(
+        data, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """ Decode a cursor created by encode_cursor.
+
+    :param str cursor: The cursor
+    :return tuple: The row values and if the cursor points backwards
+    :raise ValueError: If the cursor is invalid
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(
+            ("%s%s" % (cursor, padding)).encode()))
+        return ([_decode_cursor_value(value) for value in data['v']],
+                bool(data['b']))
+    except (binascii.Error, KeyError, TypeError, ValueError) as error:
+        raise ValueError("Invalid cursor %s." % cursor) from error
+
+
+class KeysetPage:
+    """ A page returned by keyset_paginate. Cursors are None if there is no
+    next or previous page.
+    """
+
+    def __init__(self, items, per_page, next_cursor=None,
+                 previous_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _keyset_predicate(columns, descending, nulls_last, values, backwards):
+    """ Return the where clause selecting rows after(or before if backwards)
+    the row with the values provided, according to the ordering. The
+    nulls_last items are None for columns without nulls, otherwise they tell
+    if nulls are ordered after the values.
+    """
+    def compare(column, is_descending, is_nulls_last, value):
+        if is_nulls_last is not None:
+            nulls_after = is_nulls_last != backwards
+            if value is None:
+                return false() if nulls_after else column.is_not(None)
+        if is_descending != backwards:
+            clause = column < value
+        else:
+            clause = column > value
+        if is_nulls_last is not None and nulls_after:
+            return or_(clause, column.is_(None))
+        return clause
+
+    def equals(column, value):
+        return column.is_(None) if value is None else column == value
+
+    if len(set(descending)) == 1 and set(nulls_last) == {None}:
+        literals = [literal(value, column.type) for column, value in
+                    zip(columns, values)]
+        return compare(tuple_(*columns), descending[0], None,
+                       tuple_(*literals))
+    clauses = []
+    for i, column in enumerate(columns):
+        clauses.append(and_(
+            *[equals(columns[j], values[j]) for j in range(i)],
+            compare(column, descending[i], nulls_last[i], values[i])))
+    return or_(*clauses)
+
+
+def keyset_paginate(query, order_by, per_page=10, cursor=None, **kwargs):
+    """ Return a page of a query using keyset(seek) pagination. Instead of
+    skipping rows with an offset, the page starts after the row encoded in
+    the cursor, so every page costs the same as the first one if there is an
+    index covering the ordering.
+
+    The ordering columns must identify a row uniquely, include the primary
+    key as the last column if needed. Columns ordered descending are informed
+    with desc, i.e. Item.created.desc().
+
+    Nullable columns must be informed with nulls_first or nulls_last, i.e.
+    Item.price.desc().nulls_last(), as databases order nulls differently.
+    Core columns are nullable unless created with nullable=False, the same
+    for mapped columns not annotated with a required type.
+
+    When the query returns mapped objects, the cursor values are read from
+    the attributes mapped to the ordering columns.
+
+    :param query: A sqlalchemy query or a select statement
+    :param list order_by: The ordering columns
+    :param int per_page: Rows per page. Default is 10.
+    :param str cursor: A cursor from a previous page. Default is None, the
+    first page.
+    :key session: The session to execute a select statement. Not needed if
+    query is a sqlalchemy query.
+    :return KeysetPage: The page
+    :raise ValueError: If the cursor is invalid, a nullable ordering column
+    has no nulls ordering or an ordering column isn't mapped by the objects
+    returned
+    """
+    session = kwargs.get("session")
+    statement = query
+    if hasattr(query, "statement"):
+        statement = query.statement
+        if session is None:
+            session = query.session
+    columns = []
+    descending = []
+    nulls_last = []
+    for column in order_by:
+        is_descending = False
+        is_nulls_last = None
+        modifier = getattr(column, "modifier", None)
+        while modifier in (operators.desc_op, operators.asc_op,
+                           operators.nulls_first_op, operators.nulls_last_op):
+            if modifier in (operators.desc_op, operators.asc_op):
+                is_descending = modifier is operators.desc_op
+            else:
+                is_nulls_last = modifier is operators.nulls_last_op
+            column = column.element
+            modifier = getattr(column, "modifier", None)
+        if hasattr(column, "__clause_element__"):
+            column = column.__clause_element__()
+        if not getattr(column, "nullable", False):
+            is_nulls_last = None
+        elif is_nulls_last is None:
+            raise ValueError("The ordering column %s is nullable, inform it "
+                             "with nulls_first or nulls_last." % column)
+        descending.append(is_descending)
+        nulls_last.append(is_nulls_last)
+        columns.append(column)
+    backwards = False
+    if cursor is not None:
+        values, backwards = decode_cursor(cursor)
+        if len(values) != len(columns):
+            raise ValueError("Invalid cursor %s." % cursor)
+        statement = statement.where(_keyset_predicate(
+            columns, descending, nulls_last, values, backwards))
+    ordering = []
+    for column, is_descending, is_nulls_last in zip(
+            columns, descending, nulls_last):
+        clause = (column.desc() if is_descending != backwards else
+                  column.asc())
+        if is_nulls_last is not None:
+            clause = (clause.nulls_last() if is_nulls_last != backwards else
+                      clause.nulls_first())
+        ordering.append(clause)
+    statement = statement.order_by(None).order_by(*ordering).limit(
+        per_page + 1)
+    rows = session.execute(statement).all()
+    if rows and len(rows[0]) == 1 and inspect(
+            rows[0][0], raiseerr=False) is not None:
+        items = [row[0] for row in rows]
+    else:
+        items = rows
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    if backwards:
+        items.reverse()
+
+    keys = None
+    if items and not isinstance(items[0], Row):
+        mapper = inspect(items[0]).mapper
+        try:
+            keys = [mapper.get_property_by_column(column).key
+                    for column in columns]
+        except UnmappedColumnError as error:
+            raise ValueError("The ordering columns must be mapped by %s." %
+                             mapper.class_.__name__) from error
+
+    def cursor_for(item, cursor_backwards):
+        if keys is None:
+            values = [item._mapping[column] for column in columns]
+        else:
+            values = [getattr(item, key) for key in keys]
+        return encode_cursor(values, cursor_backwards)
+
+    next_cursor = None
+    previous_cursor = None
+    if items:
+        if has_more or backwards:
+            next_cursor = cursor_for(items[-1], False)
+        if (has_more and backwards) or (cursor is not None and
+                                        not backwards):
+            previous_cursor = cursor_for(items[0], True)
+    return KeysetPage(items, per_page, next_cursor, previous_cursor)
+
+
+# Tokens changing the tokenizer state outside quoted strings and comments.
+# Dollar quoting tags are $$ or $tag$ where tag is an identifier, so
+# positional parameters like $1 aren't matched. Identifiers may contain $,
+# a tag preceded by an identifier character is part of the identifier.
+_SQL_TOKENS = re.compile(
+    r"--|/\*|[;'\"`]|(?<![\w$])\$(?:[A-Za-z_][A-Za-z_0-9]*)?\$")
+
+# Dialects accepting more than one statement per execute call. Statements
+# from scripts running on those dialects will be sent in batches, others will
+# run one statement per execute call.
+MULTI_STATEMENT_DIALECTS = ["postgresql"]
+
+
+def _find_closing_quote(line, quote, pos, backslash_escapes):
+    """ Find the position of the quote closing a string started before pos.
+    Doubled quotes are escapes and, if backslash_escapes is True, quotes
+    preceded by an odd number of backslashes are escapes too.
+
+    :return int: The closing quote position or -1 if the string continues in
+    the next line.
+    """
+    while True:
+        end = line.find(quote, pos)
+        if end == -1:
+            return -1
+        if backslash_escapes:
+            backslashes = 0
+            while end - backslashes - 1 >= pos and \
+                    line[end - backslashes - 1] == "\\":
+                backslashes += 1
+            if backslashes % 2:
+                pos = end + 1
+                continue
+        if line.startswith(quote, end + 1):
+            pos = end + 2
+            continue
+        return end
+
+
+def iter_statements(lines, **kwargs):
+    """ Return a generator of sql statements read from an iterable of lines,
+    like an opened file. Statements are yielded as soon they're complete, so
+    a script is never fully loaded in memory.
+
+    Statements are split by semicolons outside quoted strings, quoted
+    identifiers, dollar quoted strings and comments. Line comments and block
+    comments are removed from the statements, except MySQL's executable
+    comments(/*! ... */). The yielded statements have no semicolon at the end.
+
+    :param lines: An iterable of strings
+    :key bool backslash_escapes: If True backslashes escape quotes inside
+    strings, like in MySQL. Default is False.
+    :return: A generator of sql statements
+    """
+    backslash_escapes = kwargs.get("backslash_escapes", False)
+    parts = []
+    # The token closing the quoted string or comment being read
+    closing = None
+    is_comment = False
+    for line in lines:
+        pos = 0
+        length = len(line)
+        while pos < length:
+            if closing is not None:
+                if closing in ("'", '"'):
+                    end = _find_closing_quote(line, closing, pos,
+                                              backslash_escapes)
+                elif closing == "`":
+                    end = _find_closing_quote(line, closing, pos, False)
+                else:
+                    end = line.find(closing, pos)
+                if end == -1:
+                    if not is_comment:
+                        parts.append(line[pos:])
+                    break
+                end += len(closing)
+                if is_comment:
+                    parts.append(" ")
+                else:
+                    parts.append(line[pos:end])
+                pos = end
+                closing = None
+                is_comment = False
+                continue
+            match = _SQL_TOKENS.search(line, pos)
+            if match is None:
+                parts.append(line[pos:])
+                break
+            token = match.group()
+            parts.append(line[pos:match.start()])
+            pos = match.end()
+            if token == ";":
+                statement = "".join(parts).strip()
+                parts = []
+                if statement:
+                    yield statement
+            elif token == "--":
+                if line.endswith("\n"):
+                    parts.append("\n")
+                break
+            elif token == "/*":
+                closing = "*/"
+                if line.startswith("!", pos):
+                    parts.append(token)
+                else:
+                    is_comment = True
+            else:
+                parts.append(token)
+                closing = token
+    statement = "".join(parts).strip()
+    if statement:
+        yield statement
+
+
+def run_script(script_path, session, handle_command=None, handle_line=None,
+               **kwargs):
     """ Run a script file using a valid sqlalchemy session.
 
+    The script is read as a stream and split into statements by
+    iter_statements, so big scripts won't be loaded in memory. All statements
+    run in one transaction, committed at the end of the script or rolled back
+    if any statement fails.
+
     Based on https://bit.ly/2CToAhY.
     See also sqlalchemy transaction control: https://bit.ly/2yKso0A
 
     :param script_path: The path where the script is located
     :param session: A sqlalchemy session to execute the sql commands from the
     script
-    :param handle_command: Function to handle a valid command
+    :param handle_command: Function to handle a valid command. Commands are
+    the statements yielded by iter_statements, without the semicolon at the
+    end and keeping the line breaks inside the statement.
     :param handle_line: Function to handle a valid line
-    :return:
+    :key int batch_size: Statements to be sent per execute call if the
+    session dialect is in MULTI_STATEMENT_DIALECTS. Default is 1.
+    :key bool backslash_escapes: See iter_statements. Default is False.
+    :key str encoding: The script encoding. Default is utf-8.
+    :key handle_progress: Function called after each batch is executed with
+    the number of statements executed, bytes read and the script size in
+    bytes.
+    :return int: The number of statements executed
     """
+    batch_size = max(kwargs.get("batch_size", 1), 1)
+    encoding = kwargs.get("encoding", "utf-8")
+    handle_progress = kwargs.get("handle_progress")
+    multi_statement = False
+    if batch_size > 1:
+        try:
+            multi_statement = (session.get_bind().dialect.name in
+                               MULTI_STATEMENT_DIALECTS)
+        except Exception:
+            logger.debug("Unable to resolve the session dialect. Running one "
+                         "statement per execute call.")
+    script_size = os.path.getsize(script_path)
+    progress = {'read': 0, 'executed': 0}
+
+    def read_lines(stream):
+        for raw_line in stream:
+            progress['read'] += len(raw_line)
+            line = raw_line.decode(encoding)
+            if handle_line is not None and not line.startswith("--") and \
+                    line.strip("\n"):
+                logger.debug("Calling the handle line function for: %s.",
+                             line)
+                line = handle_line(line)
+            yield line
+
+    def execute(batch):
+        if multi_statement and len(batch) > 1:
+            session.execute(text(";\n".join(batch)))
+        else:
+            for statement in batch:
+                session.execute(text(statement))
+        progress['executed'] += len(batch)
+        logger.debug("Executed %s statements from %s. %s of %s bytes read.",
+                     progress['executed'], script_path, progress['read'],
+                     script_size)
+        if handle_progress is not None:
+            handle_progress(progress['executed'], progress['read'],
+                            script_size)
+
     logger.debug("Opening script %s.", script_path)
-    with open(script_path, "r") as stream:
-        sql_command = ""
-        for line in stream:
-            # Ignore commented lines
-            if not line.startswith("--") and line.strip("\n"):
-                # Append line to the command string
-                if handle_line is not None:
-                    logger.debug("Calling the handle line function for: %s.",
-                                 line)
-                    line = handle_line(line)
-                sql_command = "%s%s" % (sql_command, line.strip("\n"))
-                # If the command string ends with ";", it is a full statement
-                if sql_command.endswith(";"):
-                    # Try to execute statement and commit it
-                    try:
-                        if handle_command is not None:
-                            logger.debug("Calling the handle command function "
-                                         "for: %s.", sql_command)
-                            sql_command = handle_command(sql_command)
-                        session.execute(text(sql_command))
-                    # Assert in case of error
-                    except Exception as e:
-                        session.rollback()
-                        raise e
-                    # Finally, clear command string
-                    finally:
-                        sql_command = ""
+    with open(script_path, "rb") as stream:
+        batch = []
+        try:
+            for statement in iter_statements(read_lines(stream), **kwargs):
+                if handle_command is not None:
+                    logger.debug("Calling the handle command function "
+                                 "for: %s.", statement)
+                    statement = handle_command(statement)
+                batch.append(statement)
+                if len(batch) == batch_size:
+                    execute(batch)
+                    batch = []
+            if batch:
+                execute(batch)
+        except Exception as e:
+            session.rollback()
+            raise e
     session.commit()
+    return progress['executed']
 
 
 def with_session(*args, **kwargs):
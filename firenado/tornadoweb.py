@@ -14,21 +14,34 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from . import cache
 from . import data
+from . import instrumentation
 from . import session
 from . import uimodules
 from .config import get_class_from_config
 from cartola import fs
 from cartola.config import load_yaml_file
+from collections import OrderedDict
 import firenado.conf
+import functools
+import hashlib
 import inspect
 import logging
+import marshal
 import os
+import stat
+import sys
+import threading
+import time
+import tornado
 from tornado.httpclient import HTTPRequest
-from tornado.template import Loader
+from tornado.template import Loader, Template
 import tornado.web
 import tornado.websocket
+import types
 from typing import Any
+import weakref
 
 logger = logging.getLogger(__name__)
 
@@ -87,6 +100,94 @@ class TornadoErrorHandler:
         request.write_error(status_code, **kwargs)
 
 
+def is_firenado_handler(handler_class):
+    """ Return if the handler class is a firenado handler, meaning it
+    expects a component to be set.
+    """
+    return isinstance(handler_class, type) and issubclass(
+        handler_class, (TornadoHandler, TornadoWebSocketHandler))
+
+
+def build_route_table(components, url_root_path=None):
+    """ Build the application route table from the components handlers in a
+    single pass. Firenado handlers without arguments receive the component
+    they belong to as argument and patterns are rooted at url_root_path.
+
+    :param dict components: Application components by name
+    :param str url_root_path: The application url root path
+    :return list: The route table
+    """
+    from .util.url_util import rooted_path
+    routes = []
+    add_route = routes.append
+    for component in components.values():
+        for handler in component.get_handlers():
+            pattern, handler_class = handler[0], handler[1]
+            if url_root_path is not None:
+                pattern = rooted_path(url_root_path, pattern)
+            if is_firenado_handler(handler_class):
+                if len(handler) < 3:
+                    add_route((pattern, handler_class,
+                               {'component': component}))
+                    continue
+                handler_class.component = component
+            if url_root_path is None:
+                add_route(handler)
+            else:
+                add_route((pattern,) + tuple(handler[1:]))
+    return routes
+
+
+def load_ui_modules(modules, ui_modules=None, loaded=None):
+    """ Resolve ui modules provided as a module, a list or a dict into a
+    name to class map, the way Tornado does, visiting each module or
+    collection once even if referenced many times.
+
+    :param modules: Module, list or dict of ui modules
+    :param dict ui_modules: The map to add the ui modules to
+    :param dict loaded: Modules and collections already visited by their
+    ids. They are kept referenced so ids are not reused while loading.
+    :return dict: The ui modules map
+    """
+    if ui_modules is None:
+        ui_modules = {}
+    if loaded is None:
+        loaded = {}
+    if id(modules) in loaded:
+        return ui_modules
+    loaded[id(modules)] = modules
+    if isinstance(modules, types.ModuleType):
+        modules = {name: getattr(modules, name) for name in dir(modules)}
+    elif isinstance(modules, (list, tuple)):
+        for module in modules:
+            load_ui_modules(module, ui_modules, loaded)
+        return ui_modules
+    for name, cls in modules.items():
+        if isinstance(cls, type) and issubclass(cls, tornado.web.UIModule):
+            if ui_modules.get(name, cls) is not cls:
+                logger.debug("The ui module %s is being replaced by %s.%s.",
+                             name, cls.__module__, cls.__qualname__)
+            ui_modules[name] = cls
+    return ui_modules
+
+
+def build_ui_modules(components):
+    """ Build the application ui modules map from firenado's ui modules and
+    the ui modules provided by each component. Components providing the
+    same module have it resolved once.
+
+    :param dict components: Application components by name
+    :return dict: The ui modules map
+    """
+    loaded = {}
+    ui_modules = load_ui_modules(uimodules, loaded=loaded)
+    for component in components.values():
+        component_ui_modules = component.get_ui_modules()
+        if component_ui_modules:
+            load_ui_modules(component_ui_modules, ui_modules, loaded)
+    return ui_modules
+
+
 class TornadoApplication(tornado.web.Application, data.DataConnectedMixin,
                          session.SessionEnginedMixin):
     """ Firenado basic Tornado application.
@@ -97,31 +198,25 @@ class TornadoApplication(tornado.web.Application, data.DataConnectedMixin,
                      firenado.conf.APP_ROOT_PATH)
         self.components = {}
         settings.update(firenado.conf.app['settings'])
-        handlers = []
-        ui_modules = []
         data.configure_data_sources(firenado.conf.app['data']['sources'], self)
+        self.query_instrumentations = [
+            data_source.instrumentation
+            for data_source in self.data_sources.values()
+            if getattr(data_source, "instrumentation", None) is not None
+        ]
+        self.timing = instrumentation.TimingRegistry(
+            self, **firenado.conf.app['timing'])
+        # Set by the metrics component, if enabled
+        self.metrics = None
+        # Requests being handled and websockets open, drained at shutdown
+        self.draining = False
+        self.active_requests = weakref.WeakSet()
+        self.server_connections = weakref.WeakSet()
+        self.request_count = 0
+        self.websockets = set()
         self.__load_components()
-        for key, component in self.components.items():
-            component_handlers = component.get_handlers()
-            for i in range(0, len(component_handlers)):
-                if issubclass(
-                    component_handlers[i][1], TornadoHandler
-                ) or issubclass(
-                    component_handlers[i][1], TornadoWebSocketHandler
-                ):
-                    if len(component_handlers[i]) < 3:
-                        component_handlers[i] = (
-                            component_handlers[i][0],
-                            component_handlers[i][1],
-                            {'component': component}
-                        )
-                    else:
-                        component_handlers[i][1].component = component
-            handlers = handlers + component_handlers
-            # Adding component ui modules to the application ui modules list
-            ui_modules.append(uimodules)
-            if component.get_ui_modules():
-                ui_modules.append(component.get_ui_modules())
+        handlers = self.__load_route_table()
+        ui_modules = build_ui_modules(self.components)
         if firenado.conf.app['component']:
             if firenado.conf.app['static_path']:
                 if os.path.isabs(firenado.conf.app['static_path']):
@@ -145,15 +240,13 @@ class TornadoApplication(tornado.web.Application, data.DataConnectedMixin,
         settings['static_url_prefix'] = static_url_prefix
         if len(ui_modules) > 0:
             settings['ui_modules'] = ui_modules
-        if firenado.conf.app['url_root_path'] is not None:
-            from .util.url_util import rooted_path
-            for idx, handler in enumerate(handlers):
-                handler_list = list(handler)
-                handler_list[0] = rooted_path(
-                    firenado.conf.app['url_root_path'], handler_list[0])
-                handlers[idx] = tuple(handler_list)
         super().__init__(handlers=handlers, default_host=default_host,
                          transforms=transforms, **settings)
+        # Receives the responses before they are compressed
+        self.transforms.insert(0, cache.ResponseCacheTransform)
+        if firenado.conf.app['router'] is not None:
+            from .routing import install_router
+            install_router(self, firenado.conf.app['router'])
         logger.debug("Checking if session is enabled.")
         if firenado.conf.session['enabled']:
             logger.debug("Session is enabled. Starting session engine.")
@@ -162,6 +255,17 @@ class TornadoApplication(tornado.web.Application, data.DataConnectedMixin,
             assert self.session_engine is not None
         else:
             logger.debug("Session is disabled.")
+        template_cache.max_size = firenado.conf.app['templates'][
+            'cache_size']
+        template_cache.directory = firenado.conf.app['templates'][
+            'cache_path']
+        if (template_cache.directory is not None and
+                not os.path.isabs(template_cache.directory)):
+            template_cache.directory = os.path.join(
+                firenado.conf.APP_ROOT_PATH, template_cache.directory)
+        if (firenado.conf.app['templates']['precompile'] and
+                self.settings.get("compiled_template_cache", True)):
+            self.precompile_templates()
 
     def get_app_component(self) -> "TornadoComponent":
         """ Return the component set as the application component at the
@@ -171,6 +275,112 @@ class TornadoApplication(tornado.web.Application, data.DataConnectedMixin,
         """
         return self.components[firenado.conf.app['component']]
 
+    def start_request(self, server_conn, request_conn):
+        # Called by the http server for every request a connection reads,
+        # tracking the connections to be closed while draining
+        self.server_connections.add(server_conn)
+        return super().start_request(server_conn, request_conn)
+
+    def find_handler(self, request, **kwargs):
+        if not cache.is_refresh(request):
+            self.active_requests.add(request)
+            self.request_count += 1
+            if self.metrics is not None:
+                self.metrics.request_started(request)
+        return super().find_handler(request, **kwargs)
+
+    def log_request(self, handler):
+        self.active_requests.discard(handler.request)
+        super().log_request(handler)
+        if self.metrics is not None and not cache.is_refresh(handler.request):
+            self.metrics.observe_request(handler, self.timing.route(handler))
+
+    def active_streams(self):
+        """ Return the streams of the connections with a request being
+        handled. Requests from connections closed by the client before the
+        response is finished are dropped.
+
+        :return set: The active request streams
+        """
+        streams = set()
+        for request in list(self.active_requests):
+            stream = getattr(request.connection, "stream", None)
+            if stream is None:
+                continue
+            if stream.closed():
+                self.active_requests.discard(request)
+                continue
+            streams.add(stream)
+        return streams
+
+    def pending(self):
+        """ Return the count of requests being handled and websockets
+        open.
+
+        :return int: The pending requests and websockets
+        """
+        return len(self.active_streams()) + len(self.websockets)
+
+    def drain(self):
+        """ Start draining the application. Connections are closed once
+        their responses are sent, with the Connection header set to close
+        when possible, and websockets are closed with the going away code.
+        """
+        self.draining = True
+        for websocket in list(self.websockets):
+            websocket.close(1001, "Server shutting down")
+
+    def precompile_templates(self):
+        """ Compile the templates of every component into the shared template
+        cache, so the first request to each page doesn't pay the compile
+        cost. Templates failing to compile are logged and skipped.
+        If the template cache directory is set, compiled templates are also
+        stored there to be loaded by other processes.
+
+        :return int: Number of templates compiled
+        """
+        extensions = tuple(firenado.conf.app['templates']['extensions'])
+        kwargs = {}
+        if 'autoescape' in self.settings:
+            kwargs['autoescape'] = self.settings['autoescape']
+        compiled = 0
+        start = time.perf_counter()
+        for component in self.components.values():
+            template_path = component.get_template_path()
+            if not os.path.isdir(template_path):
+                continue
+            with tornado.web.RequestHandler._template_loader_lock:
+                loader = tornado.web.RequestHandler._template_loaders.get(
+                    template_path)
+                if loader is None:
+                    loader = FirenadoComponentLoader(
+                        template_path, component=component, **kwargs)
+                    tornado.web.RequestHandler._template_loaders[
+                        template_path] = loader
+            for root, _, files in os.walk(template_path):
+                for filename in files:
+                    if not filename.endswith(extensions):
+                        continue
+                    name = os.path.relpath(os.path.join(root, filename),
+                                           template_path)
+                    name = name.replace(os.sep, "/")
+                    try:
+                        loader.load(name)
+                        compiled += 1
+                    except Exception as error:
+                        logger.warning("Failed to precompile the template %s "
+                                       "from the component %s: %s", name,
+                                       component.name, error)
+        logger.debug("Precompiled %s templates in %.2fms.", compiled,
+                     (time.perf_counter() - start) * 1000)
+        return compiled
+
+    def __load_route_table(self):
+        """ Build the route table from the components handlers.
+        """
+        return build_route_table(self.components,
+                                 firenado.conf.app['url_root_path'])
+
     def __load_components(self):
         """ Loads all enabled components registered from the components
         config section.
@@ -222,6 +432,12 @@ class TornadoComponent:
         """
         pass
 
+    def get_data_connected(self):
+        """ Return the application as the data connected instance, so
+        services served to the component can reach the data sources.
+        """
+        return self.application
+
     def get_error_handler(self) -> TornadoErrorHandler:
         """Return a `TornadoErrorHandler` here to provide a different error
         handling than the tornado's default. If the error handler is
@@ -327,8 +543,17 @@ class TornadoComponent:
 class SessionHandler:
     """ Set the stage for a handler with session. The session per-se will be
     managed by the ComponentHandler that extends SessionHandler.
+
+    Set session_enabled to False in handlers not using the session, like
+    apis and health checks, to skip reading and writing it, or decorate
+    single methods with firenado.session.skip. With session_lazy set to True
+    the session is read only when accessed. The default None follows the
+    session lazy conf.
     """
 
+    session_enabled = True
+    session_lazy = None
+
     def __init__(self):
         self.session = None
         self.skip_auth = False
@@ -353,6 +578,9 @@ class ComponentHandler(SessionHandler):
     def __init__(self, **kwargs):
         super().__init__()
         self.component = None
+        self.query_stats = None
+        self.request_timing = None
+        self.response_cache_hit = False
 
     def initialize(self, component):
         self.component = component
@@ -375,18 +603,73 @@ class ComponentHandler(SessionHandler):
         else:
             error_handler.handle_error(self, status_code, **kwargs)
 
+    @instrumentation.timed
+    @cache.serve
     @session.read
     def prepare(self):
+        instrumentations = getattr(self.application,
+                                   "query_instrumentations", None)
+        if instrumentations:
+            from .instrumentation import start_request_query_stats
+            self.query_stats = start_request_query_stats(self,
+                                                         instrumentations)
         if hasattr(self, "authenticate"):
             if self.authenticate and hasattr(self.authenticate, '__call__'):
-                self.authenticate()
-        self.component.before_request(self)
-        self.before_request()
+                with instrumentation.timing_span(self, "authenticate"):
+                    self.authenticate()
+        with instrumentation.timing_span(self, "before_request"):
+            self.component.before_request(self)
+            self.before_request()
+
+    def finish(self, chunk=None):
+        if self.request_timing is not None:
+            self.request_timing.finish_handler()
+            if (self.request_timing.registry.server_timing and
+                    not self._headers_written):
+                self.set_header(instrumentation.SERVER_TIMING_HEADER,
+                                self.request_timing.header_value())
+        if (self.query_stats is not None and
+                self.query_stats.response_header and
+                not self._headers_written):
+            from .instrumentation import QUERY_STATS_HEADER
+            self.set_header(QUERY_STATS_HEADER,
+                            self.query_stats.header_value())
+        draining = getattr(self.application, "draining", False)
+        if draining and not self._headers_written:
+            self.set_header("Connection", "close")
+        future = super().finish(chunk)
+        connection = self.request.connection
+        if draining and hasattr(connection, "close"):
+            # The Connection header doesn't close the connection, it is
+            # closed once the response is sent
+            future.add_done_callback(lambda _: connection.close())
+        return future
+
+    def on_connection_close(self):
+        metrics = getattr(self.application, "metrics", None)
+        if metrics is not None:
+            metrics.request_ended(self.request)
+        super().on_connection_close()
 
-    @session.write
     def on_finish(self):
-        self.after_request()
-        self.component.after_request(self)
+        # Responses served from the response cache skip the prepare, there
+        # is no session to be written or before_request to be matched.
+        if not self.response_cache_hit:
+            self.finish_request()
+        if self.request_timing is not None:
+            self.request_timing.close()
+
+    @session.write
+    def finish_request(self):
+        """ Called by on_finish, with a valid session, to run the handler and
+        component after_request methods.
+        """
+        with instrumentation.timing_span(self, "after_request"):
+            self.after_request()
+            self.component.after_request(self)
+        if self.query_stats is not None:
+            from .instrumentation import finish_request_query_stats
+            finish_request_query_stats(self.query_stats)
 
     def after_request(self):
         """Called after the end of a request.
@@ -448,6 +731,9 @@ class TemplateHandler:
 
     def __init__(self):
         self.__template_variables = dict()
+        self.__template_namespace = None
+        self.__render_variables = None
+        self.__rendering = False
 
     @property
     def template_variables(self):
@@ -458,17 +744,51 @@ class TemplateHandler:
         the render or render_string execution.
         """
         self.__template_variables[name] = variable
+        self.__render_variables = None
+
+    def get_render_variables(self):
+        """ Return the variables added to every render_string call, built
+        once per request and rebuilt if a variable is added to the template.
+
+        :return dict: The user agent, credential and template variables
+        """
+        if self.__render_variables is None:
+            variables = {
+                'user_agent': getattr(self, "user_agent", None),
+                'credential': getattr(self, "credential", None),
+            }
+            variables.update(self.__template_variables)
+            self.__render_variables = variables
+        return self.__render_variables
+
+    def get_template_namespace(self):
+        """ Return the Tornado template namespace, built once per request and
+        copied for each render, as Tornado updates it with the render
+        arguments. The current user is refreshed as it may be set during the
+        request.
+        """
+        if self.__template_namespace is None:
+            self.__template_namespace = super().get_template_namespace()
+        namespace = dict(self.__template_namespace)
+        namespace['current_user'] = self.current_user
+        return namespace
 
     def render_string(self, template_name, **kwargs):
-        kwargs['user_agent'] = self.user_agent if hasattr(
-            self, 'user_agent') else None
-        kwargs['credential'] = self.credential if hasattr(
-            self, 'credential') else None
-        for name, variable in self.template_variables.items():
-            kwargs[name] = variable
         if self.ui:
-            return super(TemplateHandler, self).render_string(
-                template_name, **kwargs)
+            kwargs.update(self.get_render_variables())
+            timing = getattr(self, "request_timing", None)
+            if timing is None or self.__rendering:
+                return super(TemplateHandler, self).render_string(
+                    template_name, **kwargs)
+            # Only the outermost render is timed, ui modules rendered inside
+            # the template are part of it.
+            self.__rendering = True
+            try:
+                with timing.span("render"):
+                    return super(TemplateHandler, self).render_string(
+                        template_name, **kwargs)
+            finally:
+                self.__rendering = False
         else:
             # TODO: After a redirect I'm still hitting here.
             # Need to figure out what is going on.
@@ -536,17 +856,329 @@ class TornadoWebSocketHandler(ComponentHandler, TemplateHandler,
         tornado.websocket.WebSocketHandler.__init__(
             self, application, request, **kwargs)
 
+    async def get(self, *args, **kwargs):
+        # The websocket get only returns when the connection is closed
+        websockets = getattr(self.application, "websockets", None)
+        if websockets is None:
+            return await super().get(*args, **kwargs)
+        websockets.add(self)
+        try:
+            return await super().get(*args, **kwargs)
+        finally:
+            websockets.discard(self)
+
+
+class TemplateCache:
+    """ Process wide cache of compiled templates shared by every firenado
+    component loader. Templates are keyed by the loader cache key, template
+    name and parent template path, so a cached template is returned without
+    resolving its path again. The least recently used templates are
+    discarded when the cache reaches max_size.
+
+    Hits are counted without locking and may be slightly undercounted when
+    handlers run in threads.
+    """
+
+    def __init__(self, max_size=1000):
+        self.templates = OrderedDict()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        # Directory where compiled templates are stored, set from the
+        # app.templates.cache_path config
+        self.directory = None
+        self.lock = threading.RLock()
+
+    def get(self, key):
+        """ Return the cached template, marking it as recently used.
+
+        :param tuple key: The template key
+        :return: The template or None if not cached
+        """
+        template = self.templates.get(key)
+        if template is not None:
+            self.hits += 1
+            try:
+                self.templates.move_to_end(key)
+            except KeyError:
+                # Discarded by another thread in the meantime
+                pass
+        return template
+
+    def set(self, key, template):
+        """ Cache the template, discarding the least recently used templates
+        if the cache is full.
+
+        :param tuple key: The template key
+        :param template: The template
+        """
+        with self.lock:
+            self.templates[key] = template
+            self.templates.move_to_end(key)
+            while len(self.templates) > self.max_size:
+                self.templates.popitem(last=False)
+
+    def clear(self, loader_key=None):
+        """ Discard the cached templates. If loader_key is informed, only the
+        templates loaded by loaders with this cache key are discarded.
+
+        :param tuple loader_key: The loader cache key
+        """
+        with self.lock:
+            if loader_key is None:
+                self.templates = OrderedDict()
+                return
+            for key in [key for key in self.templates
+                        if key[0] == loader_key]:
+                del self.templates[key]
+
+    def stats(self):
+        """ Return the cache hits, misses and size.
+
+        :return dict: The cache statistics
+        """
+        return {
+            'disk_hits': self.disk_hits,
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.templates),
+        }
+
+
+template_cache = TemplateCache()
+
+# Files read while compiling templates in the current thread. Each template
+# being compiled has a set in the stack receiving the files it depends on.
+_compiling = threading.local()
+
+COMPILED_TEMPLATE_VERSION = 2
+
+
+def trusted_cache_path(path, path_stat=None):
+    """ Returns if the compiled template cache directory or file is owned by
+    the process user and isn't writable by the group or others. Compiled
+    templates are code executed by the application and can't be loaded from
+    paths other users can write.
+
+    :param str path: The directory or file path
+    :param os.stat_result path_stat: The path stat, if already known
+    :return bool: True if the path is trusted
+    """
+    if path_stat is None:
+        path_stat = os.stat(path)
+    if hasattr(os, "getuid") and path_stat.st_uid != os.getuid():
+        return False
+    return not path_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+@functools.lru_cache(maxsize=None)
+def compiled_templates_supported():
+    """ Returns if the installed Tornado templates hold the same attributes
+    set by CompiledTemplate. Compiled templates aren't stored or loaded if a
+    Tornado version changes them.
+
+    :return bool: True if compiled templates can be used
+    """
+    attributes = set(vars(Template("", name="<compiled template check>")))
+    if attributes != set(CompiledTemplate.TEMPLATE_ATTRIBUTES):
+        logger.warning("The Tornado %s template attributes %s don't match "
+                       "the compiled template attributes. Compiled "
+                       "templates won't be stored or loaded.",
+                       tornado.version, sorted(attributes))
+        return False
+    return True
+
+
+class CompiledTemplate(Template):
+    """ A template loaded from the compiled template cache directory. The
+    template source is only parsed if another template being compiled
+    extends or includes it.
+    """
+
+    # Attributes Tornado sets in Template.__init__ and uses to generate and
+    # extend templates, set here without parsing the template source.
+    TEMPLATE_ATTRIBUTES = ("autoescape", "code", "compiled", "file",
+                           "loader", "name", "namespace")
+
+    def __init__(self, name, loader, code, compiled):
+        self.name = name
+        self.loader = loader
+        self.autoescape = loader.autoescape
+        self.namespace = loader.namespace
+        self.code = code
+        self.compiled = compiled
+        self._file = None
+
+    @property
+    def file(self):
+        if self._file is None:
+            with open(os.path.join(self.loader.root, self.name), "rb") as f:
+                self._file = Template(f.read(), name=self.name,
+                                      loader=self.loader).file
+        return self._file
+
 
 class FirenadoComponentLoader(Loader):
     """ A template loader that loads from a single root directory.
+    Compiled templates are kept only in the shared template cache.
     """
 
     def __init__(self, root_directory, component=None, **kwargs):
         # TODO: Check if we should alter/use the root_directory value
         # here or on the resolve_path method.
         self.component = component
+        self.cache_key = (None if component is None else component.name,
+                          root_directory)
         super(FirenadoComponentLoader, self).__init__(root_directory, **kwargs)
 
+    def load(self, name, parent_path=None):
+        key = (self.cache_key, name, parent_path)
+        template = template_cache.get(key)
+        if template is None:
+            with template_cache.lock:
+                template = template_cache.get(key)
+                if template is None:
+                    template_cache.misses += 1
+                    # Not using the Tornado loader templates dict, that would
+                    # keep every template loaded regardless of the cache size
+                    template = self._create_template(
+                        self.resolve_path(name, parent_path=parent_path))
+                    template_cache.set(key, template)
+        compiling = getattr(_compiling, "stack", None)
+        if compiling:
+            dependencies = getattr(template, "dependencies", None)
+            for compiling_dependencies in compiling:
+                if dependencies is None:
+                    compiling_dependencies.add(
+                        os.path.join(self.root, template.name))
+                else:
+                    compiling_dependencies.update(dependencies)
+        return template
+
+    def reset(self):
+        super().reset()
+        template_cache.clear(self.cache_key)
+
+    def _create_template(self, name):
+        path = os.path.join(self.root, name)
+        use_directory = (template_cache.directory is not None and
+                         compiled_templates_supported())
+        if use_directory:
+            template = self.load_compiled_template(name, path)
+            if template is not None:
+                template_cache.disk_hits += 1
+                return template
+        mtime = os.stat(path).st_mtime_ns
+        dependencies = {path}
+        if not hasattr(_compiling, "stack"):
+            _compiling.stack = []
+        _compiling.stack.append(dependencies)
+        try:
+            template = super()._create_template(name)
+        finally:
+            _compiling.stack.pop()
+        template.dependencies = dependencies
+        if use_directory:
+            self.store_compiled_template(template, path, mtime)
+        return template
+
+    def compiled_template_path(self, path):
+        """ Return the file in the template cache directory storing the
+        compiled template. The file name changes with the template path,
+        loader options, Tornado and Python versions.
+
+        :param str path: The template source path
+        :return str: The compiled template file path
+        """
+        key = hashlib.sha1(repr((
+            path, self.autoescape, self.whitespace, sorted(self.namespace),
+            tornado.version)).encode()).hexdigest()
+        return os.path.join(template_cache.directory, "%s.%s.tpl" % (
+            key, sys.implementation.cache_tag))
+
+    def load_compiled_template(self, name, path):
+        """ Load the compiled template from the cache directory if the
+        template and the templates it extends or includes were not modified
+        after it was compiled, and it was compiled by the same Tornado
+        version. The directory and the file must be owned by the process
+        user and not writable by the group or others.
+
+        :param str name: The resolved template name
+        :param str path: The template source path
+        :return CompiledTemplate: The template or None if not cached or
+        outdated
+        """
+        try:
+            if not trusted_cache_path(template_cache.directory):
+                logger.warning("Ignoring the compiled templates at %s, the "
+                               "directory must be owned by the process user "
+                               "and not writable by the group or others.",
+                               template_cache.directory)
+                return None
+            with open(self.compiled_template_path(path), "rb") as f:
+                if not trusted_cache_path(f.name, os.fstat(f.fileno())):
+                    logger.warning("Ignoring the compiled template %s, the "
+                                   "file must be owned by the process user "
+                                   "and not writable by the group or "
+                                   "others.", f.name)
+                    return None
+                (version, tornado_version, code, compiled,
+                 dependencies) = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if (version != COMPILED_TEMPLATE_VERSION or
+                tornado_version != tornado.version):
+            return None
+        for dependency, mtime in dependencies.items():
+            try:
+                if os.stat(dependency).st_mtime_ns != mtime:
+                    return None
+            except OSError:
+                return None
+        template = CompiledTemplate(name, self, code, compiled)
+        template.dependencies = set(dependencies)
+        return template
+
+    def store_compiled_template(self, template, path, mtime):
+        """ Write the template generated code and bytecode, with the
+        modification times of the files it depends on, to the cache
+        directory.
+
+        :param Template template: The compiled template
+        :param str path: The template source path
+        :param int mtime: The template source modification time before it
+        was compiled
+        """
+        dependencies = {}
+        try:
+            for dependency in template.dependencies:
+                dependencies[dependency] = os.stat(dependency).st_mtime_ns
+            dependencies[path] = mtime
+            os.makedirs(template_cache.directory, mode=0o700, exist_ok=True)
+            if not trusted_cache_path(template_cache.directory):
+                logger.warning("Not storing the compiled template %s, the "
+                               "directory %s must be owned by the process "
+                               "user and not writable by the group or "
+                               "others.", path, template_cache.directory)
+                return
+            compiled_path = self.compiled_template_path(path)
+            temporary_path = "%s.%s.tmp" % (compiled_path, os.getpid())
+            try:
+                os.unlink(temporary_path)
+            except FileNotFoundError:
+                pass
+            fd = os.open(temporary_path,
+                         os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump((COMPILED_TEMPLATE_VERSION, tornado.version,
+                              template.code, template.compiled,
+                              dependencies), f)
+            os.replace(temporary_path, compiled_path)
+        except OSError as error:
+            logger.warning("Failed to store the compiled template %s at %s: "
+                           "%s", path, template_cache.directory, error)
+
     def resolve_path(self, name, parent_path=None):
         """ When a template name comes with a ':' it means a template from
         another component is being referenced. The component template will be
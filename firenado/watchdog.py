@@ -0,0 +1,132 @@
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import sys
+import threading
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+
+class IOLoopWatchdog:
+    """ Measures the IOLoop scheduling lag with a periodic callback and
+    detects callbacks blocking the IOLoop.
+
+    Each tick of the periodic callback records a heartbeat and the lag
+    between the time it was expected and the time it ran. A helper thread
+    checks the heartbeat and, when the IOLoop doesn't run a tick for more
+    than the threshold, logs the stack of the IOLoop thread, showing the
+    blocking call while it still blocks. When nothing is slow the overhead is
+    a tick per interval and a thread wake up per half threshold.
+
+    Lag observers are called at each tick with the lag in seconds and block
+    observers are called with the blocked time in seconds, once the IOLoop
+    is back.
+
+    :key int interval: Milliseconds between each tick. Default 100.
+    :key int threshold: Milliseconds the IOLoop must be blocked to log its
+    stack. Default 500.
+    """
+
+    def __init__(self, **kwargs):
+        self.interval = kwargs.get("interval", 100)
+        self.threshold = kwargs.get("threshold", 500)
+        self.lag = 0
+        self.max_lag = 0
+        self.blocks = 0
+        self.lag_observers = []
+        self.block_observers = []
+        self._io_loop = None
+        self._callback = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._io_loop_thread_id = None
+        self._expected = None
+        self._heartbeat = None
+        self._reported_heartbeat = None
+
+    @property
+    def running(self):
+        return self._callback is not None
+
+    def start(self, io_loop=None):
+        """ Start the watchdog at the IOLoop, from the IOLoop thread.
+
+        :param tornado.ioloop.IOLoop io_loop: The IOLoop watched. Default is
+        the current IOLoop.
+        """
+        from tornado.ioloop import IOLoop, PeriodicCallback
+        if self.running:
+            return
+        self._io_loop = IOLoop.current() if io_loop is None else io_loop
+        self._io_loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._expected = self._heartbeat + self.interval / 1000
+        self._callback = PeriodicCallback(self.tick, self.interval)
+        self._callback.start()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self.watch,
+                                        name="firenado-ioloop-watchdog",
+                                        daemon=True)
+        self._thread.start()
+        logger.debug("IOLoop watchdog started with interval of %sms and "
+                     "threshold of %sms.", self.interval, self.threshold)
+
+    def stop(self):
+        if not self.running:
+            return
+        self._callback.stop()
+        self._callback = None
+        self._stopped.set()
+        self._thread = None
+
+    def tick(self):
+        now = time.monotonic()
+        lag = now - self._expected
+        if lag < 0:
+            lag = 0
+        self._expected = now + self.interval / 1000
+        self._heartbeat = now
+        self.lag = lag
+        if lag > self.max_lag:
+            self.max_lag = lag
+        for observer in self.lag_observers:
+            observer(lag)
+        if lag * 1000 >= self.threshold:
+            self.blocks += 1
+            logger.warning("IOLoop blocked for %.2fms.", lag * 1000)
+            for observer in self.block_observers:
+                observer(lag)
+
+    def watch(self):
+        """ Helper thread loop checking the IOLoop heartbeat. """
+        wait = self.threshold / 2000
+        while not self._stopped.wait(wait):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval / 1000
+            if (blocked * 1000 >= self.threshold and
+                    heartbeat != self._reported_heartbeat):
+                self._reported_heartbeat = heartbeat
+                self.log_stack(blocked)
+
+    def log_stack(self, blocked):
+        """ Log the current stack of the IOLoop thread. """
+        frame = sys._current_frames().get(self._io_loop_thread_id)
+        if frame is None:
+            return
+        logger.warning("IOLoop blocked for more than %.2fms, at:\n%s",
+                       blocked * 1000,
+                       "".join(traceback.format_stack(frame)).rstrip())
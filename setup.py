@@ -66,6 +66,7 @@ setup(
         'pexpect': resolve_requires("requirements/pexpect.txt"),
         'schedule': resolve_requires("requirements/schedule.txt"),
         'sqlalchemy': resolve_requires("requirements/sqlalchemy.txt"),
+        'uvloop': resolve_requires("requirements/uvloop.txt"),
     },
     url="https://github.com/candango/firenado",
     packages=find_packages(),
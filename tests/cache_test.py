@@ -0,0 +1,221 @@
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from firenado import cache, security
+from firenado.tornadoweb import (TornadoApplication, TornadoComponent,
+                                 TornadoHandler)
+from tests import chdir_app
+from tornado import gen
+from tornado.httputil import HTTPServerRequest
+from tornado.testing import AsyncHTTPTestCase, gen_test
+import tornado.web
+import unittest
+
+
+class CachedHandler(TornadoHandler):
+
+    executions = 0
+    credentials = []
+
+    @cache.cached(ttl=60, vary_headers=["Accept-Language"])
+    def get(self):
+        CachedHandler.executions += 1
+        CachedHandler.credentials.append((
+            self.request.headers.get("Cookie"),
+            self.request.headers.get("Authorization")))
+        self.set_header("Content-Type", "text/plain")
+        self.write("executed %s" % CachedHandler.executions)
+
+
+class AuthenticatedHandler(TornadoHandler):
+
+    executions = 0
+
+    def get_current_user(self):
+        return self.request.headers.get("X-User")
+
+    @cache.cached(ttl=60)
+    @tornado.web.authenticated
+    def get(self):
+        AuthenticatedHandler.executions += 1
+        self.write("%s %s" % (self.current_user,
+                              AuthenticatedHandler.executions))
+
+
+class SecuredHandler(TornadoHandler):
+
+    @security.authenticated
+    @cache.cached(ttl=60)
+    def get(self):
+        pass
+
+
+class Counter(tornado.web.UIModule):
+
+    renders = 0
+
+    @cache.fragment(ttl=60)
+    def render(self, name):
+        Counter.renders += 1
+        return "%s %s" % (name, Counter.renders)
+
+
+class FragmentHandler(TornadoHandler):
+
+    def get(self):
+        self.write(self.ui['_tt_modules'].Counter("a"))
+
+
+class CacheComponent(TornadoComponent):
+
+    def __init__(self, name, application):
+        super().__init__(name, application)
+        self.conf = {'cache': {'stale_while_revalidate': 60}}
+
+
+class CacheEntryTestCase(unittest.TestCase):
+
+    def test_dump_and_load(self):
+        entry = cache.CacheEntry(b"\x00body", 10, 5, status=200,
+                                 headers=[["Content-Type", "text/plain"]],
+                                 etag='"a"')
+        loaded = cache.CacheEntry.load(entry.dump())
+        self.assertEqual(b"\x00body", loaded.value)
+        self.assertEqual(15, loaded.expire)
+        self.assertEqual(entry.created, loaded.created)
+        self.assertEqual([["Content-Type", "text/plain"]], loaded.headers)
+
+    def test_fresh_and_stale(self):
+        entry = cache.CacheEntry("fragment", 10, 5, created=100)
+        self.assertTrue(entry.is_fresh(109))
+        self.assertFalse(entry.is_fresh(110))
+        self.assertTrue(entry.is_usable(114))
+        self.assertFalse(entry.is_usable(115))
+
+    def test_lru_backend(self):
+        backend = cache.LruCacheBackend(max_size=2)
+        for key in ("a", "b", "c"):
+            backend.set(key, cache.CacheEntry(key, 10))
+        self.assertIsNone(backend.get("a"))
+        self.assertEqual("c", backend.get("c").value)
+        self.assertTrue(backend.acquire("c", 10))
+        self.assertFalse(backend.acquire("c", 10))
+        backend.release("c")
+        self.assertTrue(backend.acquire("c", 10))
+
+
+class ResponseCacheTestCase(AsyncHTTPTestCase):
+
+    def get_app(self):
+        chdir_app("tornadoweb")
+        application = tornado.web.Application(
+            transforms=[cache.ResponseCacheTransform], ui_modules={
+                'Counter': Counter}, login_url="/login")
+        self.component = CacheComponent("cache", application)
+        application.add_handlers(r".*", [
+            (r"/cached", CachedHandler, {'component': self.component}),
+            (r"/fragment", FragmentHandler, {'component': self.component}),
+            (r"/authenticated", AuthenticatedHandler,
+             {'component': self.component}),
+        ])
+        return application
+
+    def setUp(self):
+        super().setUp()
+        CachedHandler.executions = 0
+        CachedHandler.credentials = []
+        AuthenticatedHandler.executions = 0
+        Counter.renders = 0
+
+    def test_miss_and_hit(self):
+        response = self.fetch("/cached")
+        self.assertEqual("MISS", response.headers[cache.CACHE_STATUS_HEADER])
+        response = self.fetch("/cached")
+        self.assertEqual("HIT", response.headers[cache.CACHE_STATUS_HEADER])
+        self.assertEqual(b"executed 1", response.body)
+        self.assertEqual("text/plain", response.headers['Content-Type'])
+        self.assertEqual(1, CachedHandler.executions)
+
+    def test_vary(self):
+        self.fetch("/cached")
+        self.assertEqual(b"executed 2", self.fetch("/cached?a=1").body)
+        self.assertEqual(b"executed 3", self.fetch(
+            "/cached", headers={'Accept-Language': "pt"}).body)
+        self.assertEqual(b"executed 1", self.fetch("/cached").body)
+
+    def test_not_modified(self):
+        etag = self.fetch("/cached").headers['Etag']
+        response = self.fetch("/cached", headers={'If-None-Match': etag})
+        self.assertEqual(304, response.code)
+        self.assertEqual(1, CachedHandler.executions)
+
+    @gen_test
+    async def test_stale_while_revalidate(self):
+        url = self.get_url("/cached")
+        await self.http_client.fetch(url)
+        backend = cache.get_backend(self.component)
+        for entry in backend.entries.values():
+            entry.created -= entry.ttl
+        response = await self.http_client.fetch(url, headers={
+            'Cookie': "user=a", 'Authorization': "Basic YTph"})
+        self.assertEqual("STALE",
+                         response.headers[cache.CACHE_STATUS_HEADER])
+        self.assertEqual(b"executed 1", response.body)
+        for _ in range(100):
+            if CachedHandler.executions == 2:
+                break
+            await gen.sleep(0.01)
+        response = await self.http_client.fetch(url)
+        self.assertEqual("HIT", response.headers[cache.CACHE_STATUS_HEADER])
+        self.assertEqual(b"executed 2", response.body)
+        # The refresh doesn't carry the credentials of the stale request
+        self.assertEqual((None, None), CachedHandler.credentials[-1])
+
+    def test_authenticated_not_cached(self):
+        """ Authenticated methods not varying by session aren't cached """
+        response = self.fetch("/authenticated", headers={'X-User': "a"})
+        self.assertEqual(b"a 1", response.body)
+        self.assertNotIn(cache.CACHE_STATUS_HEADER, response.headers)
+        response = self.fetch("/authenticated", follow_redirects=False)
+        self.assertEqual(302, response.code)
+        response = self.fetch("/authenticated", headers={'X-User': "b"})
+        self.assertEqual(b"b 2", response.body)
+
+    def test_requires_authentication(self):
+        self.assertTrue(cache.requires_authentication(
+            None, AuthenticatedHandler.get))
+        self.assertTrue(cache.requires_authentication(
+            None, SecuredHandler.get))
+        self.assertFalse(cache.requires_authentication(
+            None, CachedHandler.get))
+
+    def test_fragment(self):
+        self.assertEqual(b"a 1", self.fetch("/fragment").body)
+        self.assertEqual(b"a 1", self.fetch("/fragment").body)
+        self.assertEqual(1, Counter.renders)
+
+
+class RefreshRequestTestCase(unittest.TestCase):
+
+    def test_refresh_not_counted(self):
+        chdir_app("tornadoweb")
+        application = TornadoApplication()
+        request = HTTPServerRequest(
+            uri="/", connection=cache.RefreshConnection())
+        self.assertTrue(cache.is_refresh(request))
+        application.find_handler(request)
+        self.assertEqual(0, application.request_count)
+        self.assertEqual(0, len(application.active_requests))
+        self.assertIs(cache.ResponseCacheTransform,
+                      application.transforms[0])
@@ -0,0 +1,13 @@
+from firenado import tornadoweb
+import os
+import time
+
+# Workers load the handlers after being forked, this tells the generation
+# apart
+LOADED_AT = time.time()
+
+
+class IndexHandler(tornadoweb.TornadoHandler):
+
+    def get(self):
+        self.write(f"{os.getpid()} {LOADED_AT}")
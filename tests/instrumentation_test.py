@@ -0,0 +1,204 @@
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from firenado import data
+from firenado.instrumentation import (current_query_stats,
+                                      finish_request_query_stats, fingerprint,
+                                      Histogram, NPlusOneQueryError,
+                                      RequestQueryStats, SERVER_TIMING_HEADER,
+                                      TimingRegistry)
+from firenado.tornadoweb import TornadoComponent, TornadoHandler
+from sqlalchemy import text
+from tests import chdir_app
+from tests.data_test import MockDataConnected
+from tornado.testing import AsyncHTTPTestCase
+import tornado.web
+import unittest
+
+
+class TimedHandler(TornadoHandler):
+
+    def get(self, item_id):
+        with self.application.timing.span("lookup"):
+            self.write(item_id)
+
+
+class FingerprintTestCase(unittest.TestCase):
+
+    def test_literals_replaced(self):
+        self.assertEqual(
+            "SELECT * FROM t WHERE id = ? AND name = ?",
+            fingerprint("SELECT *  FROM t\n WHERE id = 10 AND name = 'a''b'"))
+
+    def test_lists_collapsed(self):
+        self.assertEqual(fingerprint("SELECT * FROM t WHERE id IN (1, 2)"),
+                         fingerprint("SELECT * FROM t WHERE id IN (?,?,?)"))
+        self.assertEqual(
+            "INSERT INTO t (a, b) VALUES (?+)+",
+            fingerprint("INSERT INTO t (a, b) VALUES (1, 'x'), (2, 'y')"))
+
+
+class HistogramTestCase(unittest.TestCase):
+
+    def test_observe(self):
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 20):
+            histogram.observe(value)
+        self.assertEqual([2, 1, 1], histogram.counts)
+        self.assertEqual(4, histogram.count)
+        self.assertEqual(26.5, histogram.sum)
+
+
+class SqlalchemyInstrumentationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.data_source = data.config_to_data_source(
+            "instrumented", {
+                'connector': "sqlalchemy",
+                'url': "sqlite://",
+                'instrumentation': {
+                    'enabled': True,
+                    'slow_query_threshold': 0,
+                }
+            }, MockDataConnected())
+        self.instrumentation = self.data_source.instrumentation
+        self.instrumentation.reset()
+
+    def test_not_enabled(self):
+        data_source = data.config_to_data_source(
+            "not_instrumented", {'connector': "sqlalchemy",
+                                 'url': "sqlite://"}, MockDataConnected())
+        self.assertIsNone(data_source.instrumentation)
+
+    def test_statements_recorded(self):
+        with self.assertLogs("firenado.instrumentation", "WARNING") as logs:
+            with self.data_source.engine.connect() as conn:
+                for value in range(3):
+                    conn.execute(text("SELECT %s + 1" % value))
+        self.assertEqual(
+            3, self.instrumentation.statements["SELECT ? + ?"].count)
+        self.assertIn("no request", logs.output[-1])
+
+    def test_request_stats(self):
+        stats = RequestQueryStats("GET / (tests.Handler)", True)
+        with self.data_source.engine.connect() as conn:
+            token = current_query_stats.set(stats)
+            try:
+                with self.assertLogs("firenado.instrumentation",
+                                     "WARNING") as logs:
+                    conn.execute(text("SELECT 1"))
+                    conn.execute(text("SELECT 2"))
+            finally:
+                current_query_stats.reset(token)
+        self.assertEqual(2, stats.queries)
+        self.assertTrue(stats.header_value().startswith("2 queries, "))
+        self.assertIn("GET / (tests.Handler)", logs.output[0])
+
+    def test_errors_recorded(self):
+        with self.assertLogs("firenado.instrumentation", "WARNING"):
+            with self.data_source.engine.connect() as conn:
+                with self.assertRaises(Exception):
+                    conn.execute(text("SELECT * FROM not_a_table"))
+        stats = self.instrumentation.statements["SELECT * FROM not_a_table"]
+        self.assertEqual(1, stats.errors)
+
+
+class NPlusOneTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.data_source = data.config_to_data_source(
+            "n_plus_one", {
+                'connector': "sqlalchemy",
+                'url': "sqlite://",
+                'instrumentation': {
+                    'enabled': True,
+                    'n_plus_one_threshold': 2,
+                }
+            }, MockDataConnected())
+        self.stats = RequestQueryStats("GET / (tests.Handler)")
+
+    def execute(self, times):
+        with self.data_source.engine.connect() as conn:
+            token = current_query_stats.set(self.stats)
+            try:
+                for value in range(times):
+                    conn.execute(text("SELECT %s" % value))
+            finally:
+                current_query_stats.reset(token)
+
+    def test_under_threshold(self):
+        self.execute(2)
+        with self.assertNoLogs("firenado.instrumentation", "WARNING"):
+            finish_request_query_stats(self.stats)
+
+    def test_over_threshold_logged(self):
+        self.execute(5)
+        with self.assertLogs("firenado.instrumentation", "WARNING") as logs:
+            finish_request_query_stats(self.stats)
+        self.assertEqual(1, len(logs.records))
+        self.assertIn("executed 5 times", logs.output[0])
+        self.assertIn("instrumentation_test.py", logs.output[0])
+        self.assertIn("GET / (tests.Handler)", logs.output[0])
+
+    def test_over_threshold_raised(self):
+        self.data_source.instrumentation.n_plus_one_raise = True
+        with self.assertRaises(NPlusOneQueryError) as context:
+            self.execute(5)
+        self.assertIn("in execute", str(context.exception))
+        self.assertEqual(3, self.stats.queries)
+
+
+class RequestTimingTestCase(AsyncHTTPTestCase):
+
+    def get_app(self):
+        chdir_app("tornadoweb")
+        application = tornado.web.Application()
+        application.timing = TimingRegistry(application, enabled=True,
+                                            log=False)
+        component = TornadoComponent("timed", application)
+        application.add_handlers(r".*", [
+            (r"/items/([0-9]+)", TimedHandler, {'component': component}),
+        ])
+        return application
+
+    def test_server_timing_header(self):
+        response = self.fetch("/items/1")
+        self.assertEqual(b"1", response.body)
+        metrics = [metric.split(";")[0] for metric in
+                   response.headers[SERVER_TIMING_HEADER].split(", ")]
+        self.assertEqual(["before_request", "lookup", "handler", "total"],
+                         metrics)
+
+    def test_histograms_per_route(self):
+        self.fetch("/items/1")
+        self.fetch("/items/2")
+        stats = self._app.timing.stats()
+        self.assertEqual(["/items/([0-9]+)"], list(stats))
+        route_stats = stats["/items/([0-9]+)"]
+        for span in ("before_request", "lookup", "handler", "after_request",
+                     "total"):
+            self.assertEqual(2, route_stats[span]['count'])
+        self.assertEqual(2, sum(route_stats['total']['buckets'].values()))
+
+    def test_disabled(self):
+        self._app.timing.enabled = False
+        response = self.fetch("/items/1")
+        self.assertNotIn(SERVER_TIMING_HEADER, response.headers)
+        self.assertEqual({}, self._app.timing.stats())
+
+    def test_span_without_request(self):
+        with self._app.timing.span("outside"):
+            pass
+        self._app.timing.add_span("outside", 10)
+        self.assertEqual({}, self._app.timing.stats())
@@ -13,10 +13,27 @@
 # limitations under the License.
 
 import asyncio
-from tests import chdir_fixture_app, PROJECT_ROOT
-from firenado.launcher import ProcessLauncher
-from tornado.httpclient import AsyncHTTPClient
+import copy
+import firenado.conf
+from tests import chdir_app, chdir_fixture_app, PROJECT_ROOT
+from firenado.launcher import (install_event_loop, ProcessLauncher,
+                               SupervisorLauncher, TornadoLauncher, Worker)
+from firenado.management.tasks import get_app_type
+from firenado.tornadoweb import TornadoHandler, TornadoWebSocketHandler
+import os
+import signal
+import subprocess
+import sys
+import time
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+from tornado.httpserver import HTTPServer
+from tornado.iostream import StreamClosedError
+from tornado.tcpclient import TCPClient
 from tornado.testing import bind_unused_port, gen_test, AsyncTestCase
+from tornado.websocket import websocket_connect
+import unittest
+from unittest import mock
+from urllib.request import urlopen
 
 
 class ProcessLauncherTestCase(AsyncTestCase):
@@ -64,3 +81,409 @@ class ProcessLauncherTestCase(AsyncTestCase):
         except Exception as e:
             raise e
         self.assertEqual(response.body, b"Post output")
+
+
+class TornadoLauncherReusePortTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.process_conf = copy.deepcopy(firenado.conf.app['process'])
+        self.socket_conf = firenado.conf.app['socket']
+        firenado.conf.app['process']['num_processes'] = 2
+        firenado.conf.app['process']['reuse_port'] = True
+        firenado.conf.app['socket'] = None
+        self.launcher = TornadoLauncher()
+
+    def tearDown(self):
+        firenado.conf.app['process'] = self.process_conf
+        firenado.conf.app['socket'] = self.socket_conf
+
+    def test_reuse_port(self):
+        self.assertTrue(self.launcher.reuse_port)
+
+    def test_reuse_port_disabled(self):
+        firenado.conf.app['process']['reuse_port'] = False
+        self.assertFalse(self.launcher.reuse_port)
+
+    def test_reuse_port_without_processes(self):
+        firenado.conf.app['process']['num_processes'] = None
+        self.assertFalse(self.launcher.reuse_port)
+
+    def test_reuse_port_with_unix_socket(self):
+        self.launcher.socket = "/tmp/firenado.sock"
+        with self.assertLogs("firenado.launcher", "WARNING"):
+            self.assertFalse(self.launcher.reuse_port)
+
+
+class TornadoLauncherLoadTestCase(unittest.TestCase):
+
+    def setUp(self):
+        chdir_app("tornadoweb")
+        self.process_conf = copy.deepcopy(firenado.conf.app['process'])
+        self.launcher = TornadoLauncher()
+
+    def tearDown(self):
+        firenado.conf.app['process'] = self.process_conf
+
+    def test_load_creates_application(self):
+        firenado.conf.app['process']['num_processes'] = None
+        self.launcher.load()
+        self.assertIsNotNone(self.launcher.application)
+
+    def test_load_forking_defers_application(self):
+        """ Forked processes create the application after the fork """
+        firenado.conf.app['process']['num_processes'] = 2
+        self.launcher.load()
+        self.assertIsNone(self.launcher.application)
+        application = self.launcher.create_application()
+        self.assertIs(application, self.launcher.application)
+
+
+class SlowHandler(TornadoHandler):
+
+    async def get(self):
+        await asyncio.sleep(0.2)
+        self.write("Slow output")
+
+
+class EchoWebSocketHandler(TornadoWebSocketHandler):
+
+    def on_message(self, message):
+        self.write_message(message)
+
+
+class TornadoLauncherDrainTestCase(AsyncTestCase):
+
+    def setUp(self):
+        super().setUp()
+        chdir_app("tornadoweb")
+        self.launcher = TornadoLauncher()
+        self.launcher.load()
+        component = self.launcher.application.components['test']
+        self.launcher.application.add_handlers(r".*", [
+            (r"/slow", SlowHandler, {'component': component}),
+            (r"/websocket", EchoWebSocketHandler, {'component': component}),
+        ])
+        sock, self.port = bind_unused_port()
+        self.launcher.http_server = HTTPServer(self.launcher.application)
+        self.launcher.http_server.add_sockets([sock])
+
+    def tearDown(self):
+        self.launcher.http_server.stop()
+        super().tearDown()
+
+    @gen_test
+    async def test_drain_waits_in_flight_requests(self):
+        fetch = AsyncHTTPClient().fetch(f"http://localhost:{self.port}/slow")
+        while not self.launcher.application.pending():
+            await asyncio.sleep(0.01)
+        self.launcher.http_server.stop()
+        start = time.monotonic()
+        pending = await self.launcher.drain(5)
+        response = await fetch
+        self.assertEqual(0, pending)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(b"Slow output", response.body)
+        self.assertEqual("close", response.headers['Connection'])
+
+    @gen_test
+    async def test_drain_closes_idle_connections(self):
+        stream = await TCPClient().connect("localhost", self.port)
+        await stream.write(b"GET /slow HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        await stream.read_until(b"Slow output")
+        self.assertFalse(stream.closed())
+        pending = await self.launcher.drain(5)
+        self.assertEqual(0, pending)
+        with self.assertRaises(StreamClosedError):
+            await stream.read_bytes(1)
+
+    @gen_test
+    async def test_close_idle_connections(self):
+        idle_stream = await TCPClient().connect("localhost", self.port)
+        await idle_stream.write(
+            b"GET /slow HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        await idle_stream.read_until(b"Slow output")
+        fetch = AsyncHTTPClient().fetch(f"http://localhost:{self.port}/slow")
+        while not self.launcher.application.pending():
+            await asyncio.sleep(0.01)
+        self.assertEqual(1, await self.launcher.close_idle_connections())
+        with self.assertRaises(StreamClosedError):
+            await idle_stream.read_bytes(1)
+        response = await fetch
+        self.assertEqual(b"Slow output", response.body)
+
+    @gen_test
+    async def test_draining_closes_connection_after_response(self):
+        stream = await TCPClient().connect("localhost", self.port)
+        self.launcher.application.drain()
+        await stream.write(b"GET /slow HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        response = await stream.read_until(b"Slow output")
+        self.assertIn(b"Connection: close", response)
+        with self.assertRaises(StreamClosedError):
+            await stream.read_bytes(1)
+
+    @gen_test
+    async def test_drain_closes_websockets(self):
+        connection = await websocket_connect(
+            f"ws://localhost:{self.port}/websocket")
+        await connection.write_message("ping")
+        self.assertEqual("ping", await connection.read_message())
+        self.assertEqual(1, len(self.launcher.application.websockets))
+        pending = await self.launcher.drain(5)
+        self.assertEqual(0, pending)
+        self.assertIsNone(await connection.read_message())
+        self.assertEqual(1001, connection.close_code)
+        connection.close()
+
+    @gen_test
+    async def test_drain_timeout(self):
+        fetch = AsyncHTTPClient().fetch(f"http://localhost:{self.port}/slow")
+        while not self.launcher.application.pending():
+            await asyncio.sleep(0.01)
+        with self.assertLogs("firenado.launcher", "WARNING"):
+            pending = await self.launcher.drain(0.05)
+        self.assertEqual(1, pending)
+        with self.assertRaises(HTTPClientError):
+            await fetch
+        # Let the handler finish writing to the closed connection
+        await asyncio.sleep(0.2)
+
+
+class InstallEventLoopTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = asyncio.get_event_loop_policy()
+
+    def tearDown(self):
+        asyncio.set_event_loop_policy(self.policy)
+
+    def test_no_loop(self):
+        self.assertIsNone(install_event_loop(None))
+        self.assertIs(self.policy, asyncio.get_event_loop_policy())
+
+    def test_asyncio(self):
+        self.assertEqual("asyncio", install_event_loop("asyncio"))
+        self.assertIsInstance(asyncio.get_event_loop_policy(),
+                              asyncio.DefaultEventLoopPolicy)
+
+    def test_uvloop(self):
+        try:
+            import uvloop
+        except ImportError:
+            self.skipTest("uvloop isn't installed")
+        self.assertEqual("uvloop", install_event_loop("uvloop"))
+        self.assertIsInstance(asyncio.get_event_loop_policy(),
+                              uvloop.EventLoopPolicy)
+
+    def test_uvloop_not_installed(self):
+        with mock.patch.dict(sys.modules, {'uvloop': None}):
+            with self.assertLogs("firenado.launcher", "WARNING"):
+                self.assertEqual("asyncio", install_event_loop("uvloop"))
+
+    def test_invalid_loop(self):
+        with self.assertRaises(ValueError):
+            install_event_loop("trio")
+
+
+class SupervisorRecyclingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.process_conf = copy.deepcopy(firenado.conf.app['process'])
+        firenado.conf.app['process']['max_recycling'] = 1
+        firenado.conf.app['process']['max_requests'] = 100
+        firenado.conf.app['process']['max_rss'] = 256
+        firenado.conf.app['process']['ping_timeout'] = 10
+        self.launcher = SupervisorLauncher()
+        for pid in range(1, 4):
+            worker = Worker(pid, pid - 1, 0, None)
+            worker.ready = True
+            worker.max_requests = 100
+            self.launcher.workers[pid] = worker
+
+    def tearDown(self):
+        firenado.conf.app['process'] = self.process_conf
+
+    def test_recycle_reason(self):
+        worker = self.launcher.workers[1]
+        self.assertIsNone(self.launcher.recycle_reason(worker, 0))
+        worker.pong(300 * 1024 * 1024, 10)
+        self.assertIn("resident set size",
+                      self.launcher.recycle_reason(worker, 0))
+        worker.pong(1024, 100)
+        self.assertIn("requests", self.launcher.recycle_reason(worker, 0))
+        worker.pong(1024, 10)
+        worker.ping_sent_at = 0
+        self.assertIsNone(self.launcher.recycle_reason(worker, 5))
+        self.assertIn("pings", self.launcher.recycle_reason(worker, 11))
+
+    def test_max_recycling(self):
+        for worker in self.launcher.workers.values():
+            worker.pong(1024, 200)
+        to_recycle = self.launcher.workers_to_recycle(0)
+        self.assertEqual([self.launcher.workers[1]],
+                         [worker for worker, _ in to_recycle])
+        self.launcher.workers[1].recycling = True
+        self.assertEqual([], self.launcher.workers_to_recycle(0))
+        firenado.conf.app['process']['max_recycling'] = 3
+        to_recycle = self.launcher.workers_to_recycle(0)
+        self.assertEqual([self.launcher.workers[2], self.launcher.workers[3]],
+                         [worker for worker, _ in to_recycle])
+
+    def test_ping_not_blocking(self):
+        """ A worker not reading its control pipe doesn't block pings """
+        read_fd, write_fd = os.pipe()
+        os.set_blocking(write_fd, False)
+        worker = Worker(1, 0, 0, None, write_fd)
+        try:
+            worker.ping(0)
+            worker.ping(1)
+            self.assertEqual(b"ping\n", os.read(read_fd, 4096))
+            while True:
+                try:
+                    os.write(write_fd, b"x" * 4096)
+                except BlockingIOError:
+                    break
+            worker.pong(1024, 10)
+            worker.ping(2)
+            self.assertEqual(2, worker.ping_sent_at)
+        finally:
+            worker.close()
+            os.close(read_fd)
+
+    def test_no_recycling_while_reloading(self):
+        self.launcher.workers[1].pong(1024, 200)
+        self.launcher.next_generation = 1
+        self.assertEqual([], self.launcher.workers_to_recycle(0))
+
+
+class GetAppTypeTestCase(unittest.TestCase):
+
+    def test_get_app_type(self):
+        tests_dir = os.path.join(PROJECT_ROOT, "tests")
+        self.assertEqual("tornado_supervisor", get_app_type(
+            os.path.join(tests_dir, "fixtures", "supervisorapp"), "tornado"))
+        # The type isn't set at the tornadoweb app config
+        self.assertEqual("tornado", get_app_type(
+            os.path.join(tests_dir, "resources", "tornadoweb"), "tornado"))
+
+
+class SupervisorRestartTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.process_conf = copy.deepcopy(firenado.conf.app['process'])
+        firenado.conf.app['process']['max_restarts'] = 2
+        self.launcher = SupervisorLauncher()
+
+    def tearDown(self):
+        firenado.conf.app['process'] = self.process_conf
+
+    def crash(self, index, ready=True):
+        # Crashed workers are out of the supervisor workers
+        worker = Worker(999999999, index, 0, None)
+        if ready:
+            worker.ready = True
+            worker.ready_at = time.monotonic()
+        self.launcher.handle_exit(worker, 1)
+
+    def test_restart_backoff(self):
+        self.crash(0)
+        self.crash(0)
+        backoffs = [(index, round(restart_at - time.monotonic())) for
+                    restart_at, index, _ in self.launcher.pending_restarts]
+        self.assertEqual([(0, 1), (0, 2)], backoffs)
+        self.assertFalse(self.launcher.stopping)
+        # Over max_restarts the supervisor gives up
+        with self.assertLogs("firenado.launcher", "CRITICAL"):
+            self.crash(1)
+        self.assertEqual(2, self.launcher.restarts)
+        self.assertTrue(self.launcher.stopping)
+        self.assertEqual([], self.launcher.pending_restarts)
+
+    def test_restart_not_ready(self):
+        """ Workers crashing before being ready are replaced with backoff """
+        self.crash(0, ready=False)
+        self.crash(0, ready=False)
+        backoffs = [(index, round(restart_at - time.monotonic())) for
+                    restart_at, index, _ in self.launcher.pending_restarts]
+        self.assertEqual([(0, 1), (0, 2)], backoffs)
+        self.assertFalse(self.launcher.stopping)
+
+    def test_restart_other_generation(self):
+        self.crash(0)
+        self.launcher.generation = 1
+        self.launcher.restart_workers(time.monotonic() + 10)
+        self.assertEqual([], self.launcher.pending_restarts)
+
+
+class SupervisorLauncherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        sock, self.port = bind_unused_port()
+        sock.close()
+        firenado_script = os.path.join(firenado.conf.ROOT, "bin",
+                                       "firenado-cli.py")
+        application_dir = os.path.join(PROJECT_ROOT, "tests", "fixtures",
+                                       "supervisorapp")
+        env = dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+        self.process = subprocess.Popen(
+            [sys.executable, firenado_script, "app", "run",
+             f"--dir={application_dir}", f"--port={self.port}"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True)
+        self.wait_for(lambda: self.fetch() is not None)
+
+    def tearDown(self):
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            os.killpg(self.process.pid, signal.SIGKILL)
+            self.process.wait()
+
+    def fetch(self):
+        try:
+            with urlopen(f"http://localhost:{self.port}/", timeout=5) as (
+                    response):
+                pid, loaded_at = response.read().decode().split()
+                return int(pid), float(loaded_at)
+        except OSError:
+            return None
+
+    def wait_for(self, condition, timeout=20):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if condition():
+                return
+            time.sleep(0.05)
+        self.fail("Timed out waiting for the supervisor.")
+
+    def test_reload(self):
+        reloaded_at = time.time()
+        self.process.send_signal(signal.SIGHUP)
+        responses = []
+
+        def reloaded():
+            responses.append(self.fetch())
+            recent = responses[-10:]
+            return len(recent) == 10 and all(
+                response is not None and response[1] > reloaded_at
+                for response in recent)
+        self.wait_for(reloaded)
+        # No request failed while the workers were replaced
+        self.assertNotIn(None, responses)
+
+    def test_recycle_max_requests(self):
+        responses = []
+
+        def recycled():
+            responses.append(self.fetch())
+            time.sleep(0.01)
+            pids = set(response[0] for response in responses if response)
+            # Both workers were replaced
+            return len(pids) >= 4
+        self.wait_for(recycled)
+        self.assertNotIn(None, responses)
+
+    def test_stop(self):
+        self.process.send_signal(signal.SIGTERM)
+        self.assertEqual(0, self.process.wait(10))
+        self.assertIsNone(self.fetch())
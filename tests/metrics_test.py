@@ -0,0 +1,151 @@
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from firenado.components.metrics.component import MetricsComponent
+from firenado.components.metrics.handlers import MetricsHandler
+import firenado.conf
+from firenado.metrics import default_directory, MetricsRegistry, render
+from firenado.tornadoweb import TornadoApplication, TornadoHandler
+from tests import chdir_app
+from tornado.httputil import HTTPServerRequest
+from tornado.testing import AsyncHTTPTestCase
+import json
+import os
+import tempfile
+import unittest
+
+
+class ItemHandler(TornadoHandler):
+
+    def get(self, item_id):
+        if item_id == "0":
+            self.send_error(404)
+            return
+        self.write(item_id)
+
+
+class MetricsRegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.registry = MetricsRegistry(directory=self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_render(self):
+        self.registry.requests.inc(("/items/([0-9]+)", "GET", 200))
+        self.registry.request_duration.observe(("/", "GET", 200), 0.02)
+        dumps = [(self.registry.dump(), True)]
+        text = render(self.registry.aggregate(dumps))
+        self.assertIn('firenado_http_requests_total{route="/items/([0-9]+)",'
+                      'method="GET",status="200"} 1', text)
+        self.assertIn('firenado_http_request_duration_seconds_bucket{route='
+                      '"/",method="GET",status="200",le="0.01"} 0', text)
+        self.assertIn('firenado_http_request_duration_seconds_bucket{route='
+                      '"/",method="GET",status="200",le="0.025"} 1', text)
+        self.assertIn('firenado_http_request_duration_seconds_bucket{route='
+                      '"/",method="GET",status="200",le="+Inf"} 1', text)
+        self.assertIn('firenado_http_request_duration_seconds_count{route='
+                      '"/",method="GET",status="200"} 1', text)
+        self.assertIn("# TYPE firenado_http_requests_in_flight gauge", text)
+
+    def test_label_escaping(self):
+        self.registry.requests.inc(('a"b\\c\n', "GET", 200))
+        dumps = [(self.registry.dump(), True)]
+        text = render(self.registry.aggregate(dumps))
+        self.assertIn('route="a\\"b\\\\c\\n"', text)
+
+    def test_request_ended_once(self):
+        """ A request closed before finished leaves the requests in flight
+        once """
+        request = HTTPServerRequest(uri="/")
+        self.registry.request_started(request)
+        self.assertEqual(1, self.registry.in_flight.values[()])
+        self.registry.request_ended(request)
+        self.registry.request_ended(request)
+        self.assertEqual(0, self.registry.in_flight.values[()])
+
+    def test_default_directory(self):
+        app_id = firenado.conf.app['id']
+        try:
+            firenado.conf.app['id'] = "app1"
+            app1_directory = default_directory()
+            firenado.conf.app['id'] = "app2"
+            self.assertNotEqual(app1_directory, default_directory())
+        finally:
+            firenado.conf.app['id'] = app_id
+
+    def test_aggregate_workers(self):
+        self.registry.requests.inc(("/", "GET", 200), 2)
+        self.registry.in_flight.inc(value=3)
+        self.registry.ioloop_lag.set(value=0.5)
+        self.registry.request_duration.observe(("/", "GET", 200), 0.02)
+        self.registry.flush()
+        with open(self.registry.dump_path()) as metrics_file:
+            dump = json.load(metrics_file)
+        # A dead worker counts requests but not the gauges
+        dump['firenado_ioloop_lag_seconds']['values'] = [[[], 2]]
+        with open(self.registry.dump_path(999999999), "w") as metrics_file:
+            json.dump(dump, metrics_file)
+        # Dumps from previous runs aren't collected
+        with open(os.path.join(self.directory.name, "1-999999999.json"),
+                  "w") as metrics_file:
+            json.dump(dump, metrics_file)
+        families = {family.name: family for family in
+                    self.registry.aggregate(self.registry.read_dumps())}
+        self.assertEqual(4, families['firenado_http_requests_total'].values[
+            ("/", "GET", 200)])
+        self.assertEqual(3, families[
+            'firenado_http_requests_in_flight'].values[()])
+        self.assertEqual(0.5, families['firenado_ioloop_lag_seconds'].values[
+            ()])
+        histogram = families['firenado_http_request_duration_seconds'].values[
+            ("/", "GET", 200)]
+        self.assertEqual(2, histogram.count)
+        self.registry.clear()
+        self.assertEqual(sorted([os.path.basename(self.registry.dump_path()),
+                                 os.path.basename(self.registry.dump_path(
+                                     999999999))]),
+                         sorted(os.listdir(self.directory.name)))
+
+
+class MetricsComponentTestCase(AsyncHTTPTestCase):
+
+    def get_app(self):
+        chdir_app("tornadoweb")
+        application = TornadoApplication()
+        component = MetricsComponent("metrics", application)
+        component.initialize()
+        application.add_handlers(r".*", [
+            (r"/items/([0-9]+)", ItemHandler, {'component': component}),
+            (r"/metrics", MetricsHandler, {'component': component}),
+        ])
+        return application
+
+    def test_request_metrics(self):
+        self.fetch("/items/1")
+        self.fetch("/items/2")
+        self.fetch("/items/0")
+        response = self.fetch("/metrics")
+        self.assertEqual(200, response.code)
+        self.assertTrue(response.headers['Content-Type'].startswith(
+            "text/plain"))
+        text = response.body.decode()
+        self.assertIn('firenado_http_requests_total{route="/items/([0-9]+)",'
+                      'method="GET",status="200"} 2', text)
+        self.assertIn('firenado_http_requests_total{route="/items/([0-9]+)",'
+                      'method="GET",status="404"} 1', text)
+        # The metrics request is being handled
+        self.assertIn("firenado_http_requests_in_flight 1", text)
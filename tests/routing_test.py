@@ -0,0 +1,91 @@
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from firenado.routing import install_router, literal_prefix, PrefixTrieRouter
+import re
+from tornado.httputil import HTTPServerRequest
+import tornado.web
+import unittest
+
+
+class FirstHandler(tornado.web.RequestHandler):
+    pass
+
+
+class SecondHandler(tornado.web.RequestHandler):
+    pass
+
+
+class ThirdHandler(tornado.web.RequestHandler):
+    pass
+
+
+class LiteralPrefixTestCase(unittest.TestCase):
+
+    def test_literal_prefix(self):
+        self.assertEqual("/users/", literal_prefix(re.compile(
+            r"/users/(\d+)$")))
+        self.assertEqual("/static/", literal_prefix(re.compile(
+            re.escape("/static/") + r"(.*)")))
+        self.assertEqual("/favicon.ico", literal_prefix(re.compile(
+            r"/favicon\.ico$")))
+        self.assertEqual("/item", literal_prefix(re.compile(r"/items?$")))
+        self.assertEqual("/a/", literal_prefix(re.compile(r"/a/(b|c)$")))
+
+    def test_empty_prefix(self):
+        self.assertEqual("", literal_prefix(re.compile(r"/a|/b$")))
+        self.assertEqual("", literal_prefix(re.compile(r"/a$", re.I)))
+        self.assertEqual("", literal_prefix(re.compile(r".*$")))
+
+
+class PrefixTrieRouterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.application = tornado.web.Application([
+            (r"/users/(\d+)", FirstHandler, {}, "user"),
+            (r"/users/new", SecondHandler),
+            (r"/users/.*", ThirdHandler),
+            (r"/", SecondHandler),
+        ])
+        install_router(self.application, "trie")
+
+    def find_handler_class(self, path):
+        delegate = self.application.find_handler(
+            HTTPServerRequest(uri=path))
+        return delegate.handler_class
+
+    def test_installed(self):
+        self.assertIsInstance(self.application.wildcard_router,
+                              PrefixTrieRouter)
+
+    def test_dispatch_order(self):
+        self.assertIs(FirstHandler, self.find_handler_class("/users/10"))
+        self.assertIs(SecondHandler, self.find_handler_class("/users/new"))
+        self.assertIs(ThirdHandler, self.find_handler_class("/users/x"))
+        self.assertIs(SecondHandler, self.find_handler_class("/"))
+        self.assertIs(tornado.web.ErrorHandler,
+                      self.find_handler_class("/other"))
+
+    def test_reverse_url(self):
+        self.assertEqual("/users/10", self.application.reverse_url("user",
+                                                                   10))
+
+    def test_rules_added_later(self):
+        self.application.wildcard_router.add_rules([
+            (r"/other", FirstHandler)])
+        self.assertIs(FirstHandler, self.find_handler_class("/other"))
+
+    def test_invalid_router(self):
+        with self.assertRaises(ValueError):
+            install_router(self.application, "invalid")
@@ -15,26 +15,34 @@
 # limitations under the License.
 
 import unittest
-from tests import (components_test, conf_test, config_test, data_test,
-                   loader_test, security_test, service_test, session_test,
-                   sqlalchemy_test, testing_test, tornadoweb_test)
+from tests import (cache_test, components_test, conf_test, config_test,
+                   data_test, instrumentation_test, loader_test, metrics_test,
+                   routing_test, schedule_test, security_test, service_test,
+                   session_test, sqlalchemy_test, testing_test,
+                   tornadoweb_test, watchdog_test)
 from tests.util import url_util_test
 
 
 def suite():
     testLoader = unittest.TestLoader()
     alltests = unittest.TestSuite()
+    alltests.addTests(testLoader.loadTestsFromModule(cache_test))
     alltests.addTests(testLoader.loadTestsFromModule(components_test))
     alltests.addTests(testLoader.loadTestsFromModule(conf_test))
     alltests.addTests(testLoader.loadTestsFromModule(config_test))
     alltests.addTests(testLoader.loadTestsFromModule(data_test))
+    alltests.addTests(testLoader.loadTestsFromModule(instrumentation_test))
     alltests.addTests(testLoader.loadTestsFromModule(loader_test))
+    alltests.addTests(testLoader.loadTestsFromModule(metrics_test))
+    alltests.addTests(testLoader.loadTestsFromModule(routing_test))
+    alltests.addTests(testLoader.loadTestsFromModule(schedule_test))
     alltests.addTests(testLoader.loadTestsFromModule(security_test))
     alltests.addTests(testLoader.loadTestsFromModule(service_test))
     alltests.addTests(testLoader.loadTestsFromModule(session_test))
     alltests.addTests(testLoader.loadTestsFromModule(sqlalchemy_test))
     alltests.addTests(testLoader.loadTestsFromModule(testing_test))
     alltests.addTests(testLoader.loadTestsFromModule(tornadoweb_test))
+    alltests.addTests(testLoader.loadTestsFromModule(watchdog_test))
     alltests.addTests(testLoader.loadTestsFromModule(url_util_test))
     return alltests
 
@@ -0,0 +1,158 @@
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from datetime import datetime, timedelta
+from firenado.launcher import install_event_loop, LOOPS
+from firenado.schedule import ScheduledJob, Scheduler
+from tornado import gen
+from tornado.testing import AsyncTestCase, gen_test
+import unittest
+
+
+class FakeComponent:
+
+    application = None
+
+
+class ListScheduler(Scheduler):
+
+    def load_jobs(self):
+        pass
+
+
+class RecordJob(ScheduledJob):
+
+    def __init__(self, scheduler, **kwargs):
+        super().__init__(scheduler, **kwargs)
+        self.runs = kwargs.get("runs")
+
+    def run(self):
+        self.runs.append(self.id)
+
+
+class SchedulerTestCase(AsyncTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.runs = []
+        self.scheduler = ListScheduler(FakeComponent())
+
+    def tearDown(self):
+        self.scheduler.stop()
+        super().tearDown()
+
+    def add_job(self, job_id, interval):
+        job = RecordJob(self.scheduler, id=job_id, interval=interval,
+                        runs=self.runs)
+        self.scheduler.add_job(job)
+        return job
+
+    @gen_test
+    async def test_jobs_run_in_order(self):
+        self.add_job("third", 60)
+        self.add_job("first", 20)
+        self.add_job("second", 40)
+        self.scheduler.run()
+        await gen.sleep(0.08)
+        first_runs = sorted(set(self.runs), key=self.runs.index)
+        self.assertEqual(["first", "second", "third"], first_runs)
+
+    @gen_test
+    async def test_job_scheduled_again(self):
+        self.add_job("job", 20)
+        self.scheduler.run()
+        await gen.sleep(0.15)
+        self.assertGreaterEqual(len(self.runs), 3)
+
+    @gen_test
+    async def test_single_timeout(self):
+        for index in range(100):
+            self.add_job("job%s" % index, 1000 + index)
+        self.scheduler.run()
+        self.assertEqual(100, len(self.scheduler._heap))
+        self.assertIsNotNone(self.scheduler._timeout)
+        self.assertEqual(self.scheduler._heap[0][0],
+                         self.scheduler._timeout_deadline)
+        # An earlier job moves the timeout
+        self.add_job("earlier", 10)
+        self.assertEqual(self.scheduler._entries['earlier'][0],
+                         self.scheduler._timeout_deadline)
+        await gen.sleep(0.05)
+        self.assertEqual({"earlier"}, set(self.runs))
+
+    @gen_test
+    async def test_remove_job(self):
+        self.add_job("removed", 20)
+        self.add_job("kept", 30)
+        self.scheduler.run()
+        self.scheduler.remove_job("removed")
+        await gen.sleep(0.06)
+        self.assertNotIn("removed", self.runs)
+        self.assertIn("kept", self.runs)
+
+    @gen_test
+    async def test_add_job_while_running(self):
+        self.scheduler.run()
+        self.assertIsNone(self.scheduler._timeout)
+        job = self.add_job("added", 10)
+        self.assertTrue(job.already_scheduled)
+        await gen.sleep(0.05)
+        self.assertIn("added", self.runs)
+
+    @gen_test
+    async def test_stop(self):
+        self.add_job("job", 10)
+        self.scheduler.run()
+        self.scheduler.stop()
+        await gen.sleep(0.03)
+        self.assertEqual([], self.runs)
+
+
+class SchedulerEventLoopTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = asyncio.get_event_loop_policy()
+
+    def tearDown(self):
+        asyncio.set_event_loop_policy(self.policy)
+
+    def test_jobs_run_with_loop_setting(self):
+        """ Jobs run at the loop installed by the app.loop setting """
+        for loop in LOOPS:
+            install_event_loop(loop)
+            runs = []
+
+            async def run_scheduler():
+                scheduler = ListScheduler(FakeComponent())
+                scheduler.add_job(RecordJob(scheduler, id=loop, interval=10,
+                                            runs=runs))
+                scheduler.run()
+                await asyncio.sleep(0.05)
+                scheduler.stop()
+            asyncio.run(run_scheduler())
+            self.assertIn(loop, runs)
+
+
+class ScheduledJobTestCase(unittest.TestCase):
+
+    def test_cron_next_run_after_planned_run(self):
+        job = ScheduledJob(ListScheduler(FakeComponent()), id="job",
+                           cron="* * * * *")
+        planned_run = (datetime.now() + timedelta(minutes=1)).replace(
+            second=0, microsecond=0)
+        # The job ended before its planned run, the next run is the next
+        # minute after the planned one
+        job._planned_run = planned_run
+        self.assertEqual(planned_run + timedelta(minutes=1), job.next_run)
@@ -13,7 +13,8 @@
 # limitations under the License.
 
 from firenado.data import DataConnectedMixin
-from firenado.service import with_service, FirenadoService
+from firenado.service import (with_service, FirenadoService,
+                              SCOPE_APPLICATION, SCOPE_COMPONENT)
 import unittest
 
 
@@ -162,6 +163,59 @@ class ServedByInstance(object):
         return self.data_connected
 
 
+class ApplicationScopedService(FirenadoService):
+    """ Service shared by all consumers of the same data connected instance.
+    """
+
+    scope = SCOPE_APPLICATION
+    configured = 0
+
+    def configure_service(self):
+        ApplicationScopedService.configured += 1
+
+
+class ComponentScopedService(FirenadoService):
+    """ Service to be shared by consumers of the same component.
+    """
+    pass
+
+
+class TestableComponent(object):
+    """ Component like object holding component scoped services.
+    """
+
+    def __init__(self, data_connected):
+        self.data_connected = data_connected
+
+
+class ScopedConsumer(object):
+    """ Handler like consumer, one instance is created per request.
+    """
+
+    application_scoped_service: ApplicationScopedService
+    component_scoped_service: ComponentScopedService
+    testable_service: TestableService
+
+    def __init__(self, data_connected, component=None):
+        self.data_connected = data_connected
+        self.component = component
+
+    @with_service(ApplicationScopedService)
+    def get_application_scoped_service(self):
+        return self.application_scoped_service
+
+    @with_service(ComponentScopedService, scope=SCOPE_COMPONENT)
+    def get_component_scoped_service(self):
+        return self.component_scoped_service
+
+    @with_service(TestableService)
+    def get_request_scoped_service(self):
+        return self.testable_service
+
+    def get_data_connected(self):
+        return self.data_connected
+
+
 class ServiceTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -225,3 +279,59 @@ class ServiceTestCase(unittest.TestCase):
         service = TestableService(None)
         data_sources = service.get_data_sources()
         self.assertIsNone(data_sources)
+
+
+class ServiceScopeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.data_connected_instance = TestableDataConnected()
+        ApplicationScopedService.configured = 0
+
+    def test_request_scope(self):
+        """ Request scoped services are created for each consumer """
+        consumer1 = ScopedConsumer(self.data_connected_instance)
+        consumer2 = ScopedConsumer(self.data_connected_instance)
+        service1 = consumer1.get_request_scoped_service()
+        self.assertIs(service1, consumer1.get_request_scoped_service())
+        self.assertIsNot(service1, consumer2.get_request_scoped_service())
+        self.assertIs(consumer1, service1.consumer)
+
+    def test_application_scope(self):
+        """ Application scoped services are created once per data connected
+        instance and are consumed by the data connected instance
+        """
+        consumer1 = ScopedConsumer(self.data_connected_instance)
+        consumer2 = ScopedConsumer(self.data_connected_instance)
+        service1 = consumer1.get_application_scoped_service()
+        service2 = consumer2.get_application_scoped_service()
+        self.assertIs(service1, service2)
+        self.assertEqual(1, ApplicationScopedService.configured)
+        self.assertIs(self.data_connected_instance, service1.consumer)
+        self.assertEqual(2, len(service1.get_data_sources()))
+        other_consumer = ScopedConsumer(TestableDataConnected())
+        self.assertIsNot(service1,
+                         other_consumer.get_application_scoped_service())
+        self.assertEqual(2, ApplicationScopedService.configured)
+
+    def test_component_scope(self):
+        """ Component scoped services are created once per component """
+        component1 = TestableComponent(self.data_connected_instance)
+        component2 = TestableComponent(self.data_connected_instance)
+        consumer1 = ScopedConsumer(self.data_connected_instance, component1)
+        consumer2 = ScopedConsumer(self.data_connected_instance, component1)
+        consumer3 = ScopedConsumer(self.data_connected_instance, component2)
+        service1 = consumer1.get_component_scoped_service()
+        self.assertIs(service1, consumer2.get_component_scoped_service())
+        self.assertIsNot(service1, consumer3.get_component_scoped_service())
+        self.assertIs(component1, service1.consumer)
+        self.assertIs(self.data_connected_instance, service1.data_connected)
+
+    def test_component_scope_without_component(self):
+        """ Without a component the consumer will hold the service """
+        consumer = ScopedConsumer(self.data_connected_instance)
+        service = consumer.get_component_scoped_service()
+        self.assertIs(consumer, service.consumer)
+
+    def test_invalid_scope(self):
+        with self.assertRaises(ValueError):
+            with_service(TestableService, scope="invalid")
@@ -15,13 +15,45 @@
 # limitations under the License.
 
 import firenado.conf
+from firenado import session
 from firenado.config import get_class_from_config
-from firenado.tornadoweb import TornadoApplication
+from firenado.tornadoweb import TornadoApplication, TornadoHandler
 from tests import chdir_app
+from tornado.testing import AsyncHTTPTestCase
 import unittest
 import warnings
 
 
+class SessionCounterHandler(TornadoHandler):
+
+    def get(self):
+        counter = (self.session.get("counter") or 0) + 1
+        self.session.set("counter", counter)
+        self.write(str(counter))
+
+    @session.skip
+    def post(self):
+        self.write("session is None" if self.session is None else "session")
+
+
+class LazySessionHandler(TornadoHandler):
+
+    session_lazy = True
+
+    def get(self):
+        if self.get_argument("touch", None):
+            self.session.set("touched", True)
+        self.write("loaded" if self.session.loaded else "not loaded")
+
+
+class NoSessionHandler(TornadoHandler):
+
+    session_enabled = False
+
+    def get(self):
+        self.write("session is None" if self.session is None else "session")
+
+
 class FileSessionTestCase(unittest.TestCase):
     """ Case that tests a Firenado application after being loaded from its
     configuration file.
@@ -135,3 +167,58 @@ class EncodersSessionTestCase(unittest.TestCase):
         self.assertEqual(decoded_data['value1'], my_dict['value1'])
         self.assertEqual(decoded_data['value2']['value3'],
                          my_dict['value2']['value3'])
+
+
+class SessionOptOutTestCase(AsyncHTTPTestCase):
+    """ Tests handlers skipping the session or reading it lazily. """
+
+    def get_app(self):
+        chdir_app("file", "session")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            application = TornadoApplication()
+        component = application.components['test']
+        application.add_handlers(r".*", [
+            (r"/counter", SessionCounterHandler, {'component': component}),
+            (r"/lazy", LazySessionHandler, {'component': component}),
+            (r"/none", NoSessionHandler, {'component': component}),
+        ])
+        engine = application.session_engine
+        self.loads = 0
+        load_session = engine.load_session
+
+        def counted_load_session(request_handler):
+            self.loads += 1
+            return load_session(request_handler)
+        engine.load_session = counted_load_session
+        return application
+
+    def test_session_read(self):
+        response = self.fetch("/counter")
+        self.assertEqual(b"1", response.body)
+        self.assertIn("Set-Cookie", response.headers)
+        self.assertEqual(1, self.loads)
+
+    def test_method_skipping_session(self):
+        response = self.fetch("/counter", method="POST", body="")
+        self.assertEqual(b"session is None", response.body)
+        self.assertNotIn("Set-Cookie", response.headers)
+        self.assertEqual(0, self.loads)
+
+    def test_handler_without_session(self):
+        response = self.fetch("/none")
+        self.assertEqual(b"session is None", response.body)
+        self.assertNotIn("Set-Cookie", response.headers)
+        self.assertEqual(0, self.loads)
+
+    def test_lazy_session_not_accessed(self):
+        response = self.fetch("/lazy")
+        self.assertEqual(b"not loaded", response.body)
+        self.assertNotIn("Set-Cookie", response.headers)
+        self.assertEqual(0, self.loads)
+
+    def test_lazy_session_accessed(self):
+        response = self.fetch("/lazy?touch=1")
+        self.assertEqual(b"loaded", response.body)
+        self.assertIn("Set-Cookie", response.headers)
+        self.assertEqual(1, self.loads)
@@ -12,14 +12,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal
 from tests.service_test import TestableDataConnected, ServedByInstance
-from firenado.sqlalchemy import base_to_dict, with_session
+from firenado.sqlalchemy import (base_to_dict, bulk_insert, bulk_upsert,
+                                 column_keys, CountCache, decode_cursor,
+                                 encode_cursor, estimated_count, fast_count,
+                                 iter_statements, keyset_paginate,
+                                 rows_to_dicts, run_script, with_session)
 from firenado.service import FirenadoService, with_service
-from sqlalchemy import String
+import os
+from sqlalchemy import (create_engine, create_mock_engine, func, select,
+                        String)
 from sqlalchemy.types import DateTime
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, Session
 from sqlalchemy.sql import text
+import tempfile
 import unittest
 
 
@@ -43,6 +51,23 @@ class TestBase(Base):
                                                server_default=text("now()"))
 
 
+class Item(Base):
+
+    __tablename__ = "item"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(50), nullable=False)
+    price: Mapped[int] = mapped_column(nullable=True)
+
+
+class Product(Base):
+
+    __tablename__ = "product"
+
+    product_id: Mapped[int] = mapped_column("id", primary_key=True)
+    category: Mapped[int] = mapped_column(nullable=False)
+
+
 class MockSessionedService(FirenadoService):
 
     @with_session
@@ -96,6 +121,444 @@ class BaseToDictTestCase(unittest.TestCase):
         self.assertTrue("modified" not in dict_from_base)
 
 
+class RowsToDictsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Item.__table__.create(self.engine)
+        self.session = Session(bind=self.engine)
+        bulk_insert(self.session, Item, [
+            {'id': i, 'name': "item%s" % i, 'price': i * 10}
+            for i in range(1, 4)])
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_column_keys_cached(self):
+        keys = column_keys(Item)
+        self.assertEqual(("id", "name", "price"), keys)
+        self.assertIs(keys, column_keys(Item))
+        self.assertEqual(("id", "price"), column_keys(Item, ["price", "id"]))
+        self.assertIs(column_keys(Item, ["price", "id"]),
+                      column_keys(Item, ("price", "id")))
+
+    def test_objects_to_dicts(self):
+        items = self.session.scalars(select(Item).order_by(Item.id)).all()
+        dicts = rows_to_dicts(items)
+        self.assertEqual({'id': 1, 'name': "item1", 'price': 10}, dicts[0])
+        self.assertEqual([base_to_dict(item) for item in items], dicts)
+        self.assertEqual([{'name': "item1"}, {'name': "item2"},
+                          {'name': "item3"}], rows_to_dicts(items, ["name"]))
+
+    def test_entity_rows_to_dicts(self):
+        result = self.session.execute(select(Item).order_by(Item.id))
+        dicts = rows_to_dicts(result, ["id", "price"])
+        self.assertEqual({'id': 3, 'price': 30}, dicts[-1])
+
+    def test_core_rows_to_dicts(self):
+        result = self.session.execute(
+            select(Item.id, Item.name).order_by(Item.id))
+        self.assertEqual([{'id': 1, 'name': "item1"},
+                          {'id': 2, 'name': "item2"},
+                          {'id': 3, 'name': "item3"}], rows_to_dicts(result))
+        result = self.session.execute(
+            select(Item.id, Item.name).order_by(Item.id))
+        self.assertEqual([{'name': "item1"}, {'name': "item2"},
+                          {'name': "item3"}], rows_to_dicts(result, ["name"]))
+
+    def test_generator(self):
+        result = self.session.execute(select(Item.id).order_by(Item.id))
+        dicts = rows_to_dicts(result, generator=True)
+        self.assertFalse(isinstance(dicts, list))
+        self.assertEqual({'id': 1}, next(dicts))
+        self.assertEqual([{'id': 2}, {'id': 3}], list(dicts))
+
+
+class FastCountTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Item.__table__.create(self.engine)
+        self.session = Session(bind=self.engine)
+        bulk_insert(self.session, Item, [
+            {'id': i, 'name': "item%s" % i, 'price': i} for i in range(10)])
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_fast_count(self):
+        self.assertEqual(10, fast_count(self.session.query(Item)))
+        self.assertEqual(5, fast_count(
+            self.session.query(Item).filter(Item.price >= 5).order_by(
+                Item.name)))
+        self.assertEqual(3, fast_count(select(Item).where(Item.id < 3),
+                                       session=self.session))
+
+    def test_fast_count_cache(self):
+        cache = CountCache(ttl=60)
+        query = self.session.query(Item).filter(Item.price >= 5)
+        self.assertEqual(5, fast_count(query, cache=cache))
+        bulk_insert(self.session, Item, [{'id': 10, 'name': "item10"}])
+        bulk_insert(self.session, Item, [{'id': 11, 'name': "item11",
+                                          'price': 11}])
+        self.assertEqual(5, fast_count(query, cache=cache))
+        other_query = self.session.query(Item).filter(Item.price >= 6)
+        self.assertEqual(5, fast_count(other_query, cache=cache))
+        cache.clear()
+        self.assertEqual(6, fast_count(query, cache=cache))
+        cache.ttl = 0
+        cache.clear()
+        self.assertEqual(6, fast_count(query, cache=cache))
+        bulk_insert(self.session, Item, [{'id': 12, 'name': "item12",
+                                          'price': 12}])
+        self.assertEqual(7, fast_count(query, cache=cache))
+
+    def test_fast_count_cache_per_database(self):
+        cache = CountCache(ttl=60)
+        with tempfile.TemporaryDirectory() as directory:
+            engines = [create_engine("sqlite:///%s" % os.path.join(
+                directory, "%s.db" % name)) for name in ("one", "other")]
+            for size, engine in zip((3, 4), engines):
+                Item.__table__.create(engine)
+                with Session(bind=engine) as session:
+                    bulk_insert(session, Item, [
+                        {'id': i, 'name': "item%s" % i}
+                        for i in range(size)])
+                    self.assertEqual(size, fast_count(
+                        session.query(Item), cache=cache))
+            for engine in engines:
+                engine.dispose()
+
+    def test_fast_count_not_plain(self):
+        bulk_insert(self.session, Item, [
+            {'id': i, 'name': "item", 'price': i % 2}
+            for i in range(10, 14)])
+        statements = (
+            (2, select(Item.price).where(Item.price < 2).group_by(
+                Item.price)),
+            (1, select(Item.price).group_by(Item.price).having(
+                Item.price >= 9)),
+            (11, select(Item.name).distinct()),
+            (3, select(Item).order_by(Item.id).limit(3)),
+            (4, select(Item).offset(10)),
+        )
+        for count, statement in statements:
+            self.assertEqual(count, fast_count(
+                statement, session=self.session, estimate_threshold=0))
+
+    def test_count_cache_max_size(self):
+        cache = CountCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(1, cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(3, cache.get("c"))
+
+    def test_estimated_count_not_supported(self):
+        """ SQLite has no statistics, the exact count will be used """
+        self.assertIsNone(estimated_count(self.session, Item))
+        self.assertEqual(10, fast_count(self.session.query(Item),
+                                        estimate_threshold=0))
+
+
+class KeysetPaginateTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Item.__table__.create(self.engine)
+        self.session = Session(bind=self.engine)
+        bulk_insert(self.session, Item, [
+            {'id': i, 'name': "item%02d" % i, 'price': i % 3}
+            for i in range(1, 26)])
+
+    def tearDown(self):
+        self.session.close()
+
+    def ids(self, page):
+        return [item.id for item in page]
+
+    def test_cursor(self):
+        values = [1, "a", datetime(2024, 1, 2, 3, 4, 5), date(2024, 1, 2),
+                  Decimal("1.10"), None]
+        cursor = encode_cursor(values, True)
+        self.assertEqual((values, True), decode_cursor(cursor))
+        with self.assertRaises(ValueError):
+            decode_cursor("invalid")
+
+    def test_paginate_forward_and_backwards(self):
+        query = select(Item)
+        page = keyset_paginate(query, [Item.id], 10, session=self.session)
+        self.assertEqual(list(range(1, 11)), self.ids(page))
+        self.assertFalse(page.has_previous)
+        page = keyset_paginate(query, [Item.id], 10, page.next_cursor,
+                               session=self.session)
+        self.assertEqual(list(range(11, 21)), self.ids(page))
+        self.assertTrue(page.has_previous)
+        page = keyset_paginate(query, [Item.id], 10, page.next_cursor,
+                               session=self.session)
+        self.assertEqual(list(range(21, 26)), self.ids(page))
+        self.assertFalse(page.has_next)
+        page = keyset_paginate(query, [Item.id], 10, page.previous_cursor,
+                               session=self.session)
+        self.assertEqual(list(range(11, 21)), self.ids(page))
+        self.assertTrue(page.has_next)
+        page = keyset_paginate(query, [Item.id], 10, page.previous_cursor,
+                               session=self.session)
+        self.assertEqual(list(range(1, 11)), self.ids(page))
+        self.assertFalse(page.has_previous)
+        self.assertTrue(page.has_next)
+
+    def test_paginate_mixed_directions(self):
+        """ Product ids are mapped to the product_id attribute, the cursor
+        values must be read through the mapper. """
+        Product.__table__.create(self.engine)
+        bulk_insert(self.session, Product, [
+            {'product_id': i, 'category': i % 3} for i in range(1, 26)])
+        query = self.session.query(Product).filter(Product.product_id > 5)
+        order_by = [Product.category.desc(), Product.product_id.nulls_last()]
+        expected = [product.product_id for product in query.order_by(
+            Product.category.desc(), Product.product_id)]
+        ids = []
+        cursor = None
+        while True:
+            page = keyset_paginate(query, order_by, 4, cursor)
+            ids.extend([product.product_id for product in page])
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(expected, ids)
+        page = keyset_paginate(query, order_by, 4, page.previous_cursor)
+        self.assertEqual(expected[-8:-4],
+                         [product.product_id for product in page])
+
+    def test_paginate_nullable_columns(self):
+        self.session.execute(Item.__table__.update().where(
+            Item.id % 4 == 0).values(price=None))
+        self.session.commit()
+        query = select(Item)
+        for order_by in ([Item.price.nulls_last(), Item.id],
+                         [Item.price.desc().nulls_first(), Item.id],
+                         [Item.price.desc().nulls_last(), Item.id.desc()],
+                         [Item.price.asc().nulls_first(), Item.id.desc()]):
+            expected = [item.id for item in self.session.scalars(
+                query.order_by(*order_by))]
+            page = keyset_paginate(query, order_by, 4, session=self.session)
+            pages = [self.ids(page)]
+            while page.has_next:
+                page = keyset_paginate(query, order_by, 4, page.next_cursor,
+                                       session=self.session)
+                pages.append(self.ids(page))
+            ids = [item_id for ids_page in pages for item_id in ids_page]
+            self.assertEqual(expected, ids)
+            while page.has_previous:
+                page = keyset_paginate(query, order_by, 4,
+                                       page.previous_cursor,
+                                       session=self.session)
+                pages.pop()
+                self.assertEqual(pages[-1], self.ids(page))
+
+    def test_paginate_invalid_ordering(self):
+        with self.assertRaises(ValueError):
+            keyset_paginate(select(Item), [Item.price, Item.id],
+                            session=self.session)
+        with self.assertRaises(ValueError):
+            keyset_paginate(select(Item), [func.length(Item.name), Item.id],
+                            session=self.session)
+
+    def test_paginate_rows(self):
+        statement = select(Item.id, Item.name).where(Item.price == 0)
+        page = keyset_paginate(statement, [Item.name.desc()], 3,
+                               session=self.session)
+        self.assertEqual([24, 21, 18], [row.id for row in page])
+        page = keyset_paginate(statement, [Item.name.desc()], 3,
+                               page.next_cursor, session=self.session)
+        self.assertEqual([15, 12, 9], [row.id for row in page])
+
+
+class IterStatementsTestCase(unittest.TestCase):
+
+    def statements(self, script, **kwargs):
+        return list(iter_statements(script.splitlines(True), **kwargs))
+
+    def test_split_statements(self):
+        statements = self.statements("SELECT 1; SELECT\n2;\nSELECT 3")
+        self.assertEqual(["SELECT 1", "SELECT\n2", "SELECT 3"], statements)
+
+    def test_semicolon_in_strings(self):
+        statements = self.statements(
+            "INSERT INTO t VALUES ('a;b''c;');\n"
+            "INSERT INTO t VALUES (\"x;\ny\");\n"
+            "SELECT `a;b` FROM t;")
+        self.assertEqual(["INSERT INTO t VALUES ('a;b''c;')",
+                          "INSERT INTO t VALUES (\"x;\ny\")",
+                          "SELECT `a;b` FROM t"], statements)
+
+    def test_backslash_escapes(self):
+        script = "SELECT 'it\\'s;';SELECT 2;"
+        self.assertEqual(["SELECT 'it\\'s;'", "SELECT 2"],
+                         self.statements(script, backslash_escapes=True))
+        self.assertNotEqual(["SELECT 'it\\'s;'", "SELECT 2"],
+                            self.statements(script))
+
+    def test_comments(self):
+        statements = self.statements(
+            "-- A comment; with semicolon\n"
+            "SELECT 1; -- trailing; comment\n"
+            "/* block;\n comment; */ SELECT 2;\n"
+            "/*!40101 SET NAMES utf8 */;")
+        self.assertEqual(["SELECT 1", "SELECT 2",
+                          "/*!40101 SET NAMES utf8 */"], statements)
+
+    def test_dollar_quoting(self):
+        statements = self.statements(
+            "CREATE FUNCTION f() RETURNS int AS $$\n"
+            "BEGIN RETURN 1; END;\n$$ LANGUAGE plpgsql;\n"
+            "CREATE FUNCTION g() RETURNS text AS $fn$ SELECT '$$;' $fn$;\n"
+            "SELECT $1;")
+        self.assertEqual(3, len(statements))
+        self.assertTrue(statements[0].endswith("$$ LANGUAGE plpgsql"))
+        self.assertEqual("CREATE FUNCTION g() RETURNS text AS "
+                         "$fn$ SELECT '$$;' $fn$", statements[1])
+        self.assertEqual("SELECT $1", statements[2])
+
+    def test_dollar_in_identifiers(self):
+        statements = self.statements(
+            "SELECT a$b$ FROM t$$;\n"
+            "SELECT $x$;$x$, c$d$;")
+        self.assertEqual(["SELECT a$b$ FROM t$$", "SELECT $x$;$x$, c$d$"],
+                         statements)
+
+
+class RunScriptTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        self.session = Session(bind=self.engine)
+        handle, self.script_path = tempfile.mkstemp(suffix=".sql")
+        with os.fdopen(handle, "w") as script:
+            script.write("-- Creating the table\n"
+                         "CREATE TABLE item (id INTEGER PRIMARY KEY,\n"
+                         "    name VARCHAR(50));\n")
+            for i in range(10):
+                script.write("INSERT INTO item VALUES (%s, 'item;%s');\n" %
+                             (i, i))
+
+    def tearDown(self):
+        self.session.close()
+        os.remove(self.script_path)
+
+    def test_run_script(self):
+        progress = []
+        executed = run_script(
+            self.script_path, self.session, batch_size=4,
+            handle_progress=lambda *args: progress.append(args))
+        self.assertEqual(11, executed)
+        self.assertEqual(10, self.session.execute(
+            text("SELECT count(*) FROM item")).scalar())
+        self.assertEqual("item;3", self.session.execute(
+            text("SELECT name FROM item WHERE id = 3")).scalar())
+        self.assertEqual([4, 8, 11], [item[0] for item in progress])
+        script_size = os.path.getsize(self.script_path)
+        self.assertEqual((11, script_size, script_size), progress[-1])
+
+    def test_run_script_handlers(self):
+        run_script(
+            self.script_path, self.session,
+            handle_line=lambda line: line.replace("item;", "line;"),
+            handle_command=lambda command: command.replace("item", "thing"))
+        self.assertEqual("line;3", self.session.execute(
+            text("SELECT name FROM thing WHERE id = 3")).scalar())
+
+    def test_run_script_rollback(self):
+        self.session.execute(text("CREATE TABLE thing (id INTEGER PRIMARY "
+                                  "KEY)"))
+        self.session.commit()
+        with open(self.script_path, "a") as script:
+            script.write("INSERT INTO thing VALUES (1);\n"
+                         "INSERT INTO thing VALUES (1);\n")
+        with self.assertRaises(Exception):
+            run_script(self.script_path, self.session)
+        self.assertEqual(0, self.session.execute(
+            text("SELECT count(*) FROM thing")).scalar())
+
+
+class BulkTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Item.__table__.create(self.engine)
+        self.session = Session(bind=self.engine)
+
+    def tearDown(self):
+        self.session.close()
+
+    def items(self):
+        return [(item.id, item.name, item.price) for item in
+                self.session.scalars(select(Item).order_by(Item.id))]
+
+    def test_bulk_insert_dicts(self):
+        progress = []
+        rows = ({'id': i, 'name': "item%s" % i, 'price': i} for i in
+                range(25))
+        inserted = bulk_insert(
+            self.session, Item, rows, chunk_size=10,
+            handle_progress=lambda total, elapsed: progress.append(total))
+        self.assertEqual(25, inserted)
+        self.assertEqual([10, 20, 25], progress)
+        self.assertEqual(25, len(self.items()))
+
+    def test_bulk_insert_objects(self):
+        rows = [Item(name="item%s" % i) for i in range(5)]
+        inserted = bulk_insert(self.session, Item.__table__, rows)
+        self.assertEqual(5, inserted)
+        self.assertEqual([(1, "item0", None), (5, "item4", None)],
+                         [self.items()[0], self.items()[-1]])
+
+    def test_bulk_upsert(self):
+        bulk_insert(self.session, Item, [
+            {'id': 1, 'name': "item1", 'price': 1},
+            {'id': 2, 'name': "item2", 'price': 2},
+        ])
+        written = bulk_upsert(self.session, Item, [
+            {'id': 2, 'name': "item2 updated", 'price': 20},
+            {'id': 3, 'name': "item3", 'price': 3},
+        ], ["id"], chunk_size=1)
+        self.assertEqual(2, written)
+        self.assertEqual([(1, "item1", 1), (2, "item2 updated", 20),
+                          (3, "item3", 3)], self.items())
+        bulk_upsert(self.session, Item, [
+            {'id': 3, 'name': "item3 updated", 'price': 30},
+        ], ["id"], update_columns=["price"])
+        self.assertEqual((3, "item3", 30), self.items()[-1])
+        bulk_upsert(self.session, Item, [
+            {'id': 1, 'name': "item1 ignored", 'price': 10},
+        ], ["id"], update_columns=[])
+        self.assertEqual((1, "item1", 1), self.items()[0])
+
+    def test_bulk_upsert_unsupported_dialect(self):
+        session = Session(bind=create_mock_engine("mssql://",
+                                                  lambda *args: None))
+        with self.assertRaises(ValueError):
+            bulk_upsert(session, Item, [{'id': 1, 'name': "item1"}], ["id"])
+
+    def test_bulk_insert_pending_changes(self):
+        self.session.add(Item(id=1, name="pending"))
+        with self.assertRaises(ValueError):
+            bulk_insert(self.session, Item, [{'id': 2, 'name': "item2"}])
+        self.session.rollback()
+        self.assertEqual([], self.items())
+
+    def test_bulk_insert_rollback(self):
+        rows = [{'id': 1, 'name': "item1", 'price': 1},
+                {'id': 2, 'name': "item2", 'price': 2},
+                {'id': 2, 'name': "item2", 'price': 2}]
+        with self.assertRaises(Exception):
+            bulk_insert(self.session, Item, rows, chunk_size=2)
+        self.assertEqual([(1, "item1", 1), (2, "item2", 2)], self.items())
+
+
 class SessionedTestCase(unittest.TestCase):
 
     mock_sessioned_service: MockSessionedService
@@ -15,12 +15,22 @@
 # limitations under the License.
 
 import firenado.conf
-from firenado.tornadoweb import get_request, TornadoApplication, TornadoHandler
+from firenado import uimodules
+from firenado.tornadoweb import (build_route_table, build_ui_modules,
+                                 get_request, compiled_templates_supported,
+                                 CompiledTemplate, FirenadoComponentLoader,
+                                 load_ui_modules, template_cache,
+                                 TornadoApplication, TornadoHandler)
+from firenado.components.toolbox.uimodules import Paginate
 from firenado.launcher import FirenadoLauncher, TornadoLauncher
 from firenado.tornadoweb import TornadoComponent
 import unittest
 from tests import chdir_app
+import marshal
 import os
+import tempfile
+import tornado.httputil
+import tornado.web
 
 
 class MainHandler(TornadoHandler):
@@ -92,6 +102,283 @@ class ApplicationComponentTestCase(unittest.TestCase):
         self.assertEqual(firenado.conf.app['static_path'], static_path_x[-1])
 
 
+class RouteTableTestCase(unittest.TestCase):
+
+    def setUp(self):
+        chdir_app("tornadoweb")
+        self.application = TornadoApplication()
+        self.components = self.application.components
+
+    def test_build_route_table(self):
+        routes = build_route_table(self.components)
+        self.assertEqual(('/', MainHandler,
+                          {'component': self.components['test']}),
+                         routes[0])
+        routes = build_route_table(self.components, "app")
+        self.assertEqual("/app", routes[0][0])
+
+    def test_application_routes(self):
+        request = tornado.httputil.HTTPServerRequest(uri="/")
+        handler_delegate = self.application.find_handler(request)
+        self.assertIs(MainHandler, handler_delegate.handler_class)
+        self.assertIs(self.components['test'],
+                      handler_delegate.handler_kwargs['component'])
+
+
+class ComponentUIModule(tornado.web.UIModule):
+
+    def render(self):
+        return "component"
+
+
+class UIModulesComponent(TornadoComponent):
+
+    def get_ui_modules(self):
+        return [uimodules, {'ComponentUIModule': ComponentUIModule}]
+
+
+class UIModulesTestCase(unittest.TestCase):
+
+    def test_load_ui_modules(self):
+        ui_modules = load_ui_modules([uimodules, [uimodules], {
+            'Component': ComponentUIModule, 'NotAModule': object}])
+        self.assertIs(uimodules.RootedPath, ui_modules['RootedPath'])
+        self.assertIs(ComponentUIModule, ui_modules['Component'])
+        self.assertNotIn('NotAModule', ui_modules)
+
+    def test_build_ui_modules(self):
+        components = {"component%s" % i: UIModulesComponent(
+            "component%s" % i, None) for i in range(3)}
+        ui_modules = build_ui_modules(components)
+        self.assertIs(uimodules.RootedPath, ui_modules['RootedPath'])
+        self.assertIs(ComponentUIModule, ui_modules['ComponentUIModule'])
+
+    def test_application_ui_modules(self):
+        chdir_app("tornadoweb")
+        application = TornadoApplication()
+        self.assertIsInstance(application.settings['ui_modules'], dict)
+        self.assertIs(uimodules.RootedPath,
+                      application.ui_modules['RootedPath'])
+
+
+class TemplateComponent(TornadoComponent):
+
+    template_path = None
+
+    def get_template_path(self):
+        return self.template_path
+
+
+class TemplateCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        chdir_app("tornadoweb")
+        self.application = TornadoApplication()
+        self.directory = tempfile.TemporaryDirectory()
+        os.mkdir(os.path.join(self.directory.name, "sub"))
+        for name, content in (("base.html", "[{% block b %}{% end %}]"),
+                              ("index.html", "{{ 1 + 1 }}"),
+                              ("sub/page.html", "{% extends '../base.html' %}"
+                                                "{% block b %}p{% end %}"),
+                              ("broken.html", "{% if %}"),
+                              ("notes.txt", "{{ 2 }}")):
+            with open(os.path.join(self.directory.name, name), "w") as f:
+                f.write(content)
+        self.component = TemplateComponent("templates", self.application)
+        self.component.template_path = self.directory.name
+        self.application.components['templates'] = self.component
+        template_cache.clear()
+
+    def tearDown(self):
+        del self.application.components['templates']
+        template_cache.clear()
+        self.directory.cleanup()
+
+    def test_shared_between_loaders(self):
+        loader = FirenadoComponentLoader(self.directory.name,
+                                         component=self.component)
+        template = loader.load("index.html")
+        misses = template_cache.misses
+        hits = template_cache.hits
+        other_loader = FirenadoComponentLoader(self.directory.name,
+                                               component=self.component)
+        self.assertIs(template, other_loader.load("index.html"))
+        self.assertEqual(b"2", template.generate())
+        self.assertEqual(misses, template_cache.misses)
+        self.assertEqual(hits + 1, template_cache.hits)
+
+    def test_reset_clears_cache(self):
+        loader = FirenadoComponentLoader(self.directory.name,
+                                         component=self.component)
+        loader.load("index.html")
+        other_loader = FirenadoComponentLoader(self.directory.name)
+        other_template = other_loader.load("index.html")
+        loader.reset()
+        self.assertEqual(1, template_cache.stats()['size'])
+        self.assertIs(other_template, other_loader.load("index.html"))
+
+    def test_max_size(self):
+        template_cache.max_size = 2
+        try:
+            loader = FirenadoComponentLoader(self.directory.name,
+                                             component=self.component)
+            index = loader.load("index.html")
+            loader.load("base.html")
+            loader.load("index.html")
+            loader.load("notes.txt")
+            self.assertEqual(2, template_cache.stats()['size'])
+            self.assertEqual({}, loader.templates)
+            self.assertIs(index, loader.load("index.html"))
+            misses = template_cache.misses
+            loader.load("base.html")
+            self.assertEqual(misses + 1, template_cache.misses)
+        finally:
+            template_cache.max_size = 1000
+
+    def test_precompile_templates(self):
+        with self.assertLogs("firenado.tornadoweb", "WARNING") as logs:
+            self.assertEqual(3, self.application.precompile_templates())
+        self.assertIn("broken.html", logs.output[0])
+        loader = FirenadoComponentLoader(self.directory.name,
+                                         component=self.component)
+        misses = template_cache.misses
+        self.assertEqual(b"[p]", loader.load("sub/page.html").generate())
+        self.assertEqual(misses, template_cache.misses)
+
+
+class CompiledTemplateCacheTestCase(TemplateCacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache_directory = tempfile.TemporaryDirectory()
+        template_cache.directory = self.cache_directory.name
+
+    def tearDown(self):
+        template_cache.directory = None
+        self.cache_directory.cleanup()
+        super().tearDown()
+
+    def new_loader(self):
+        template_cache.clear()
+        return FirenadoComponentLoader(self.directory.name,
+                                       component=self.component)
+
+    def test_load_from_disk(self):
+        self.new_loader().load("sub/page.html")
+        self.assertEqual(2, len(os.listdir(self.cache_directory.name)))
+        disk_hits = template_cache.disk_hits
+        template = self.new_loader().load("sub/page.html")
+        self.assertIsInstance(template, CompiledTemplate)
+        self.assertEqual(b"[p]", template.generate())
+        self.assertEqual(disk_hits + 1, template_cache.disk_hits)
+
+    def test_parent_modified(self):
+        self.new_loader().load("sub/page.html")
+        base = os.path.join(self.directory.name, "base.html")
+        with open(base, "w") as f:
+            f.write("<{% block b %}{% end %}>")
+        stat = os.stat(base)
+        os.utime(base, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+        template = self.new_loader().load("sub/page.html")
+        self.assertNotIsInstance(template, CompiledTemplate)
+        self.assertEqual(b"<p>", template.generate())
+
+    def test_untrusted_directory(self):
+        self.new_loader().load("index.html")
+        os.chmod(self.cache_directory.name, 0o770)
+        with self.assertLogs("firenado.tornadoweb", "WARNING"):
+            template = self.new_loader().load("index.html")
+        self.assertNotIsInstance(template, CompiledTemplate)
+        os.chmod(self.cache_directory.name, 0o700)
+        for name in os.listdir(self.cache_directory.name):
+            os.chmod(os.path.join(self.cache_directory.name, name), 0o666)
+        with self.assertLogs("firenado.tornadoweb", "WARNING"):
+            template = self.new_loader().load("index.html")
+        self.assertNotIsInstance(template, CompiledTemplate)
+
+    def test_other_tornado_version(self):
+        loader = self.new_loader()
+        loader.load("index.html")
+        compiled_path = loader.compiled_template_path(
+            os.path.join(self.directory.name, "index.html"))
+        with open(compiled_path, "rb") as f:
+            data = list(marshal.load(f))
+        data[1] = "0.0"
+        with open(compiled_path, "wb") as f:
+            marshal.dump(tuple(data), f)
+        template = self.new_loader().load("index.html")
+        self.assertNotIsInstance(template, CompiledTemplate)
+        self.assertTrue(compiled_templates_supported())
+
+    def test_extending_compiled_template(self):
+        self.new_loader().load("base.html")
+        with open(os.path.join(self.directory.name, "other.html"), "w") as f:
+            f.write("{% extends 'base.html' %}{% block b %}o{% end %}")
+        loader = self.new_loader()
+        self.assertIsInstance(loader.load("base.html"), CompiledTemplate)
+        self.assertEqual(b"[o]", loader.load("other.html").generate())
+
+
+class RenderStringTestCase(unittest.TestCase):
+
+    def setUp(self):
+        chdir_app("tornadoweb")
+        self.application = TornadoApplication()
+        self.directory = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.directory.name, "vars.html"), "w") as f:
+            f.write("{{ user_agent }}-{{ a }}-{{ current_user }}")
+        component = TemplateComponent("render", self.application)
+        component.template_path = self.directory.name
+        request = tornado.httputil.HTTPServerRequest(
+            uri="/", connection=FakeConnection())
+        self.handler = MainHandler(self.application, request,
+                                   component=component)
+
+    def tearDown(self):
+        template_cache.clear()
+        self.directory.cleanup()
+
+    def test_template_variables(self):
+        self.handler.add_variable_to_template("a", 1)
+        self.assertEqual(b"None-1-None",
+                         self.handler.render_string("vars.html"))
+        self.handler.add_variable_to_template("a", 2)
+        self.handler.current_user = "user"
+        self.assertEqual(b"None-2-user",
+                         self.handler.render_string("vars.html", a=3))
+
+    def test_namespace_built_once(self):
+        namespace = self.handler.get_template_namespace()
+        namespace['request'] = None
+        other_namespace = self.handler.get_template_namespace()
+        self.assertIs(self.handler.request, other_namespace['request'])
+        self.assertIs(namespace['reverse_url'],
+                      other_namespace['reverse_url'])
+
+
+class PaginateTestCase(unittest.TestCase):
+
+    def setUp(self):
+        chdir_app("tornadoweb")
+        self.application = TornadoApplication()
+
+    def paginate(self, uri):
+        request = tornado.httputil.HTTPServerRequest(
+            uri=uri, connection=FakeConnection())
+        handler = MainHandler(self.application, request,
+                              component=self.application.components['test'])
+        return Paginate(handler)
+
+    def test_cursor_url_keeps_arguments(self):
+        paginate = self.paginate("/items?q=a+b&cursor=old&tag=1&tag=2")
+        self.assertEqual("/items?q=a+b&tag=1&tag=2&cursor=new%3D",
+                         paginate.cursor_url("cursor", "new="))
+        self.assertEqual("/items?q=a+b&tag=1&tag=2",
+                         paginate.cursor_url("cursor"))
+        self.assertEqual("/items", self.paginate(
+            "/items?cursor=old").cursor_url("cursor"))
+
+
 class GetRequestTestCase(unittest.TestCase):
 
     def test_get_request_simple(self):
@@ -0,0 +1,59 @@
+# Copyright 2015-2024 Flavio Garcia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from firenado.watchdog import IOLoopWatchdog
+from tornado import gen
+from tornado.testing import AsyncTestCase, gen_test
+import time
+
+
+def blocking_callback():
+    time.sleep(0.2)
+
+
+class IOLoopWatchdogTestCase(AsyncTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.watchdog = IOLoopWatchdog(interval=10, threshold=80)
+        self.lags = []
+        self.blocked = []
+        self.watchdog.lag_observers.append(self.lags.append)
+        self.watchdog.block_observers.append(self.blocked.append)
+        self.watchdog.start(self.io_loop)
+
+    def tearDown(self):
+        self.watchdog.stop()
+        super().tearDown()
+
+    @gen_test
+    async def test_lag_observed(self):
+        await gen.sleep(0.1)
+        self.assertTrue(self.lags)
+        self.assertEqual(0, self.watchdog.blocks)
+        self.assertEqual([], self.blocked)
+
+    @gen_test
+    async def test_blocking_callback_stack_logged(self):
+        await gen.sleep(0.02)
+        with self.assertLogs("firenado.watchdog", "WARNING") as logs:
+            self.io_loop.add_callback(blocking_callback)
+            await gen.sleep(0.1)
+        self.assertGreaterEqual(self.watchdog.blocks, 1)
+        self.assertGreaterEqual(max(self.blocked), 0.08)
+        self.assertGreaterEqual(self.watchdog.max_lag, 0.08)
+        stacks = [output for output in logs.output
+                  if "blocking_callback" in output]
+        self.assertTrue(stacks)
+        self.assertIn("time.sleep", stacks[0])